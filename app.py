@@ -4,6 +4,7 @@ TechGear Pro: Monitors, Printers, Accessories, Networking
 """
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import streamlit as st
 from openai import OpenAI
@@ -27,6 +28,7 @@ OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 MODEL_NAME = "google/gemini-2.0-flash-001"
 MCP_SERVER_URL = "https://vipfapwm3x.us-east-1.awsapprunner.com/mcp"
 MCP_HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+TOOL_CONCURRENCY = int(os.environ.get("TOOL_CONCURRENCY", "4"))
 
 # System prompt
 SYSTEM_PROMPT = """You are a helpful customer support assistant for TechGear Pro, a company that sells computer products including monitors, printers, accessories, and networking equipment.
@@ -121,6 +123,15 @@ TOOLS = [
     }
 ]
 
+# Shared keep-alive HTTP session for MCP calls
+@st.cache_resource
+def get_mcp_session():
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 # MCP Client function
 def call_mcp_tool(tool_name: str, arguments: dict) -> str:
     """Call an MCP tool and return the result."""
@@ -131,7 +142,7 @@ def call_mcp_tool(tool_name: str, arguments: dict) -> str:
         "params": {"name": tool_name, "arguments": arguments}
     }
     try:
-        response = requests.post(MCP_SERVER_URL, json=payload, headers=MCP_HEADERS, timeout=15)
+        response = get_mcp_session().post(MCP_SERVER_URL, json=payload, headers=MCP_HEADERS, timeout=15)
         result = response.json()
         content = result.get("result", {}).get("content", [])
         if content:
@@ -175,8 +186,12 @@ def get_bot_response(user_message: str, chat_history: list) -> str:
             
             messages.append(msg)
             
-            for tc in msg.tool_calls:
-                result = call_mcp_tool(tc.function.name, json.loads(tc.function.arguments))
+            # Run independent tool calls concurrently, keep results in call order
+            calls = [(tc.function.name, json.loads(tc.function.arguments)) for tc in msg.tool_calls]
+            with ThreadPoolExecutor(max_workers=max(1, min(TOOL_CONCURRENCY, len(calls)))) as executor:
+                results = list(executor.map(lambda call: call_mcp_tool(*call), calls))
+            
+            for tc, result in zip(msg.tool_calls, results):
                 messages.append({
                     "role": "tool",
                     "tool_call_id": tc.id,
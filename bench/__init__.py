@@ -0,0 +1,3 @@
+"""
+Offline benchmark harness and local stand-ins for the MCP and LLM servers
+"""
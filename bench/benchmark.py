@@ -0,0 +1,210 @@
+"""
+Offline turn-latency benchmark
+Drives MCPClient and ChatEngine.get_bot_response against the local MCP and
+LLM stand-ins and reports latency percentiles, round trips and bytes.
+
+Usage: python -m bench.benchmark --turns 50 --mcp-latency 0.05 --llm-latency 0.2
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from openai import OpenAI
+
+from bench.llm_stub import LLMStubServer
+from bench.mcp_stub import MCPStubServer
+from src.cache import ToolCache
+from src.cassette import Cassette
+from src.engine import ChatEngine
+from src.mcp_client import MCPClient
+from src.prefetch import Prefetcher
+from src.router import FastPathRouter
+from src.tracing import tracer
+from src.transport import HTTPTransport
+from src.validation import ToolValidator
+
+
+def build_script(mcp: MCPStubServer) -> list:
+    """Scenarios shaped like real support traffic, using the stub's data."""
+    order = mcp.orders[0]
+    customer = mcp.customers[1]
+    return [
+        {
+            "match": "what monitors",
+            "steps": [
+                {"tool_calls": [{"name": "list_products", "arguments": {"category": "Monitors"}}]},
+                {"content": "We have several monitors in stock."},
+            ],
+        },
+        {
+            "match": "compare",
+            "steps": [
+                {"tool_calls": [
+                    {"name": "get_product", "arguments": {"sku": "MON-0001"}},
+                    {"name": "get_product", "arguments": {"sku": "MON-0002"}},
+                    {"name": "get_product", "arguments": {"sku": "MON-0003"}},
+                ]},
+                {"content": "Here is how those three monitors compare."},
+            ],
+        },
+        {
+            "match": "wireless keyboard",
+            "steps": [
+                {"tool_calls": [{"name": "search_products", "arguments": {"query": "accessory model"}}]},
+                {"content": "These keyboards fit your budget."},
+            ],
+        },
+        {
+            "match": "status of order",
+            "steps": [
+                {"tool_calls": [{"name": "get_order", "arguments": {"order_id": order["id"]}}]},
+                {"content": f"Your order is {order['status']}."},
+            ],
+        },
+        {
+            "match": "my orders",
+            "steps": [
+                {"tool_calls": [{"name": "verify_customer_pin", "arguments": {"email": customer["email"], "pin": customer["pin"]}}]},
+                {"tool_calls": [
+                    {"name": "get_customer", "arguments": {"customer_id": customer["id"]}},
+                    {"name": "list_orders", "arguments": {"customer_id": customer["id"]}},
+                ]},
+                {"content": "Here are your recent orders."},
+            ],
+        },
+    ]
+
+
+def build_messages(mcp: MCPStubServer) -> list:
+    customer = mcp.customers[1]
+    return [
+        "What monitors do you have?",
+        "Can you compare MON-0001, MON-0002 and MON-0003?",
+        "Show me wireless keyboards under $100",
+        f"What's the status of order {mcp.orders[0]['id']}?",
+        f"I'm {customer['email']}, PIN {customer['pin']}. Show my orders.",
+    ]
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def run(args) -> dict:
+    mcp = MCPStubServer(
+        latency=args.mcp_latency, jitter=args.mcp_jitter,
+        products_per_category=args.products, description_bytes=args.description_bytes,
+        accept_batches=not args.no_batches
+    ).start()
+    llm = LLMStubServer(build_script(mcp), latency=args.llm_latency, jitter=args.llm_jitter).start()
+
+    mcp_client = MCPClient(server_url=mcp.url, transport=HTTPTransport(), cache=None if args.no_cache else ToolCache())
+    llm_client = OpenAI(base_url=llm.base_url, api_key="bench", max_retries=0)
+    cassette = Cassette(args.record, mode="record") if args.record else None
+    if cassette:
+        mcp_client, llm_client = cassette.wrap_mcp(mcp_client), cassette.wrap_llm(llm_client)
+    prefetcher = Prefetcher(mcp_client) if args.prefetch else None
+    engine = ChatEngine(
+        mcp_client=mcp_client,
+        llm_client=llm_client,
+        fast_path_router=FastPathRouter() if args.fast_path else None,
+        prefetcher=prefetcher,
+        validator=ToolValidator()
+    )
+    messages = build_messages(mcp)
+
+    latencies, round_trips, rpc_calls, mcp_bytes, llm_calls = [], [], [], [], []
+    for turn in range(args.turns):
+        message = messages[turn % len(messages)]
+        mcp_before = dict(mcp.stats)
+        llm_before = dict(llm.stats)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine.get_bot_response(message, [])
+            elapsed = time.perf_counter() - start
+            # Log lines are printed by the trace sink thread; drain it while stdout is redirected
+            tracer.sink.flush()
+        latencies.append(elapsed)
+        round_trips.append(mcp.stats["http_requests"] - mcp_before["http_requests"])
+        rpc_calls.append(mcp.stats["rpc_calls"] - mcp_before["rpc_calls"])
+        mcp_bytes.append(
+            mcp.stats["bytes_in"] + mcp.stats["bytes_out"] - mcp_before["bytes_in"] - mcp_before["bytes_out"]
+        )
+        llm_calls.append(llm.stats["requests"] - llm_before["requests"])
+
+    mcp.stop()
+    llm.stop()
+    if cassette:
+        cassette.close()
+    turns = len(latencies)
+    return {
+        "turns": turns,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "mean": sum(latencies) / turns * 1000,
+        },
+        "mcp_round_trips_per_turn": sum(round_trips) / turns,
+        "mcp_rpc_calls_per_turn": sum(rpc_calls) / turns,
+        "llm_calls_per_turn": sum(llm_calls) / turns,
+        "mcp_bytes_per_turn": sum(mcp_bytes) / turns,
+        "llm_bytes_total": llm.stats["bytes_in"] + llm.stats["bytes_out"],
+        "prefetch": dict(prefetcher.stats, hit_rate=prefetcher.hit_rate) if prefetcher else None,
+        "tool_arguments": dict(engine.validator.stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline chatbot turn-latency benchmark")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--mcp-latency", type=float, default=0.02)
+    parser.add_argument("--mcp-jitter", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--products", type=int, default=25, help="products per category in the stub catalog")
+    parser.add_argument("--description-bytes", type=int, default=200)
+    parser.add_argument("--no-batches", action="store_true", help="stub rejects JSON-RPC batches")
+    parser.add_argument("--no-cache", action="store_true", help="disable the catalog cache")
+    parser.add_argument("--fast-path", action="store_true", help="enable the SKU / order-ID fast path")
+    parser.add_argument("--prefetch", action="store_true", help="enable speculative prefetch of order / product lookups")
+    parser.add_argument("--record", metavar="PATH", help="record the MCP and LLM traffic to a cassette (see bench.replay)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="exit non-zero if p95 turn latency exceeds this")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        latency = report["latency_ms"]
+        print(f"Turns:                 {report['turns']}")
+        print(f"Turn latency (ms):     p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  p99 {latency['p99']:.1f}")
+        print(f"MCP round trips/turn:  {report['mcp_round_trips_per_turn']:.2f} ({report['mcp_rpc_calls_per_turn']:.2f} JSON-RPC calls)")
+        print(f"LLM calls/turn:        {report['llm_calls_per_turn']:.2f}")
+        print(f"MCP bytes/turn:        {report['mcp_bytes_per_turn']:.0f}")
+        if report["prefetch"]:
+            prefetch = report["prefetch"]
+            print(f"Prefetch:              {prefetch['hits']} hits, {prefetch['wasted']} wasted ({prefetch['hit_rate']:.0%} hit rate)")
+        arguments = report["tool_arguments"]
+        print(f"Tool arguments:        {arguments['normalized']} normalized, {arguments['rejected']} rejected locally (MCP round trips saved)")
+
+    if args.max_p95_ms is not None and report["latency_ms"]["p95"] > args.max_p95_ms:
+        print(f"FAIL: p95 {report['latency_ms']['p95']:.1f} ms exceeds {args.max_p95_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
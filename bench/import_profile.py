@@ -0,0 +1,95 @@
+"""
+Import-time profile
+Imports the Streamlit app (or another module) in a fresh interpreter with
+`python -X importtime` and reports total and per-module import time. Meant
+for CI: exits non-zero when the import exceeds a budget or pulls in a
+module that should be loaded lazily.
+
+Usage: python -m bench.import_profile --max-ms 800 --forbid openai --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Modules that must stay off the startup path with FAST_STARTUP on
+DEFAULT_FORBIDDEN = ["openai", "requests"]
+
+
+def profile(module: str) -> list:
+    """[(module, depth, cumulative µs)] for a fresh import of `module`, as -X importtime reports them."""
+    env = dict(
+        os.environ,
+        # Import cost only: no background warm-up, no files or network at import
+        STARTUP_WARM_UP="false",
+        SEARCH_INDEX_ENABLED="false",
+        CONVERSATION_STORE="memory://",
+        METRICS_PORT="0",
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # One leading space, then two more per nesting level
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), depth, int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of the app")
+    parser.add_argument("--module", default="src.app")
+    parser.add_argument("--top", type=int, default=15, help="Slowest top-level imports to list")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if the import takes longer")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN, help="Fail if any of these is imported")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    rows = profile(args.module)
+    names = {name for name, _, _ in rows}
+    total_ms = next(cumulative for name, _, cumulative in rows if name == args.module) / 1000
+    # Modules imported directly by the target, with everything they import
+    direct = sorted(
+        ((name, cumulative / 1000) for name, depth, cumulative in rows if depth == 1),
+        key=lambda row: row[1], reverse=True
+    )
+    forbidden = [module for module in args.forbid if module in names]
+
+    print(f"Import of {args.module}: {total_ms:.1f} ms ({len(rows)} modules)")
+    print("Slowest direct imports:")
+    for name, ms in direct[:args.top]:
+        print(f"  {ms:>8.1f} ms  {name}")
+    if forbidden:
+        print(f"Imported at startup but should be lazy: {', '.join(forbidden)}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({
+                "module": args.module,
+                "total_ms": total_ms,
+                "modules": len(rows),
+                "direct": [{"module": name, "ms": ms} for name, ms in direct],
+                "forbidden": forbidden,
+            }, f, indent=2)
+
+    failed = bool(forbidden)
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"FAIL: {total_ms:.1f} ms exceeds the {args.max_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
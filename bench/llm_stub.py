@@ -0,0 +1,209 @@
+"""
+Fake OpenAI-compatible chat completions endpoint
+Plays back scripted tool-call sequences so get_bot_response runs offline.
+
+A script is a list of scenarios. Each scenario has a `match` substring
+(checked against the latest user message) and a list of `steps`. Step N
+answers the Nth LLM call after that user message and is either
+{"tool_calls": [{"name": ..., "arguments": {...}}, ...]} or {"content": "..."}.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Optional
+
+from bench.mcp_stub import StubHTTPServer
+
+DEFAULT_REPLY = "I'm a scripted assistant and have no answer for that."
+
+
+class LLMStubServer:
+    """Threaded HTTP server for POST /v1/chat/completions (plain and stream=True).
+
+    `latency` is the time to first byte; in streaming mode `token_delay` is
+    added between text chunks. `model_latency` overrides the latency for
+    the models it names, and models in `failing_models` answer with that
+    HTTP status instead, to exercise model failover.
+    """
+
+    def __init__(
+        self,
+        script: list,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        token_delay: float = 0.0,
+        model: str = "stub-model",
+        model_latency: Optional[dict] = None,
+        failing_models: Optional[dict] = None
+    ):
+        self.script = script
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self.model = model
+        self.model_latency = dict(model_latency or {})
+        self.failing_models = dict(failing_models or {})
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0, "models": {}}
+        self._server = StubHTTPServer((host, port), self._handler_class())
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0, "models": {}}
+
+    def start(self) -> "LLMStubServer":
+        threading.Thread(target=self._server.serve_forever, name="llm-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def next_step(self, messages: list) -> dict:
+        """The scripted step for the current position in the conversation."""
+        last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+        user_text = messages[last_user]["content"] if last_user >= 0 else ""
+        calls_so_far = sum(1 for m in messages[last_user + 1:] if m.get("role") == "assistant")
+        for scenario in self.script:
+            if scenario["match"].lower() in (user_text or "").lower():
+                steps = scenario["steps"]
+                return steps[min(calls_so_far, len(steps) - 1)]
+        return {"content": DEFAULT_REPLY}
+
+    def completion(self, request: dict) -> dict:
+        step = self.next_step(request.get("messages") or [])
+        message = {"role": "assistant", "content": step.get("content")}
+        if step.get("tool_calls"):
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{i}_{call['name']}",
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))}
+                }
+                for i, call in enumerate(step["tool_calls"])
+            ]
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", self.model),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if step.get("tool_calls") else "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def stream_chunks(self, request: dict):
+        """The completion split into chat.completion.chunk objects."""
+        completion = self.completion(request)
+        message = completion["choices"][0]["message"]
+        base = {"id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"], "model": completion["model"]}
+
+        def chunk(delta, finish_reason=None):
+            return dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}])
+
+        yield chunk({"role": "assistant", "content": ""})
+        for word in (message.get("content") or "").split(" "):
+            if word:
+                yield chunk({"content": word + " "})
+        for index, call in enumerate(message.get("tool_calls") or []):
+            yield chunk({"tool_calls": [{"index": index, "id": call["id"], "type": "function", "function": {"name": call["function"]["name"], "arguments": ""}}]})
+            yield chunk({"tool_calls": [{"index": index, "function": {"arguments": call["function"]["arguments"]}}]})
+        yield chunk({}, completion["choices"][0]["finish_reason"])
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                request = json.loads(body or b"{}")
+                model = request.get("model", stub.model)
+                with stub._lock:
+                    stub.stats["requests"] += 1
+                    stub.stats["bytes_in"] += len(body)
+                    stub.stats["models"][model] = stub.stats["models"].get(model, 0) + 1
+                latency = stub.model_latency.get(model, stub.latency)
+                if latency or stub.jitter:
+                    time.sleep(latency + random.random() * stub.jitter)
+
+                if model in stub.failing_models:
+                    data = json.dumps({"error": {"message": f"{model} is unavailable", "code": stub.failing_models[model]}}).encode("utf-8")
+                    self.send_response(stub.failing_models[model])
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+
+                if not request.get("stream"):
+                    data = json.dumps(stub.completion(request)).encode("utf-8")
+                    self._count(len(data))
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for item in stub.stream_chunks(request):
+                    self._write_chunk(f"data: {json.dumps(item)}\n\n".encode("utf-8"))
+                    if stub.token_delay:
+                        time.sleep(stub.token_delay)
+                self._write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, data: bytes):
+                self._count(len(data))
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _count(self, size: int):
+                with stub._lock:
+                    stub.stats["bytes_out"] += size
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI-compatible chat endpoint")
+    parser.add_argument("script", help="JSON file with the scenario script")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="time to first byte in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with open(args.script) as f:
+        script = json.load(f)
+    server = LLMStubServer(script, port=args.port, latency=args.latency, token_delay=args.token_delay).start()
+    print(f"LLM stub listening on {server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Local stand-in for the MCP order management server
+JSON-RPC over HTTP with a synthetic catalog and orders, for offline benchmarks,
+plus an SSE notification stream (GET with `Accept: text/event-stream`).
+
+Usage: python -m bench.mcp_stub --port 8765 --latency 0.05
+"""
+import argparse
+import json
+import queue
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CATEGORIES = {"Monitors": "MON", "Printers": "PRI", "Accessories": "ACC", "Networking": "NET"}
+STATUSES = ("draft", "submitted", "approved", "fulfilled", "cancelled")
+
+
+def build_catalog(products_per_category: int = 25, description_bytes: int = 200, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    catalog = []
+    for category, prefix in CATEGORIES.items():
+        for i in range(products_per_category):
+            catalog.append({
+                "sku": f"{prefix}-{i + 1:04d}",
+                "name": f"{category[:-1]} Model {i + 1}",
+                "category": category,
+                "description": ("Synthetic product description. " * (description_bytes // 31 + 1))[:description_bytes],
+                "price": f"{rng.randint(20, 900)}.{rng.randint(0, 99):02d}",
+                "currency": "USD",
+                "stock": rng.randint(0, 50),
+                "is_active": True,
+            })
+    return catalog
+
+
+def build_customers(count: int = 20, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "name": f"Customer {i + 1}",
+            "email": f"customer{i + 1}@example.com",
+            "pin": f"{1000 + i}",
+        }
+        for i in range(count)
+    ]
+
+
+def build_orders(customers: list, catalog: list, per_customer: int = 5, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    orders = []
+    for customer in customers:
+        for _ in range(per_customer):
+            items = [
+                {"sku": product["sku"], "quantity": rng.randint(1, 3), "unit_price": product["price"], "currency": "USD"}
+                for product in rng.sample(catalog, 2)
+            ]
+            orders.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "customer_id": customer["id"],
+                "status": rng.choice(STATUSES),
+                "currency": "USD",
+                "total": f"{sum(float(item['unit_price']) * item['quantity'] for item in items):.2f}",
+                "created_at": "2026-01-15T10:00:00Z",
+                "items": items,
+            })
+    return orders
+
+
+def _page(records: list, args: dict) -> list:
+    """The `offset` / `limit` slice of a list result."""
+    offset = int(args.get("offset") or 0)
+    limit = args.get("limit")
+    return records[offset:] if limit is None else records[offset:offset + int(limit)]
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer with a listen backlog big enough for load tests."""
+
+    request_queue_size = 512
+    daemon_threads = True
+
+
+class MCPStubServer:
+    """Threaded JSON-RPC server that answers the eight MCP tools.
+
+    `latency` (seconds, plus up to `jitter`) is added to every HTTP request.
+    Counters record HTTP requests, JSON-RPC calls and bytes in both
+    directions. Set `accept_batches=False` to mimic a server that rejects
+    JSON-RPC batch arrays. create_order returns the same order again for
+    a repeated `idempotency_key`, and tools/list advertises that argument;
+    set `honour_idempotency_keys=False` to mimic a server that does neither.
+
+    SSE subscribers receive `notifications/resources/updated` events from
+    `update_product()` and `set_order_status()`, any other notification
+    passed to `notify()`, and a keep-alive comment every `sse_keepalive`
+    seconds.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        products_per_category: int = 25,
+        description_bytes: int = 200,
+        accept_batches: bool = True,
+        honour_idempotency_keys: bool = True,
+        sse_keepalive: float = 15.0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.accept_batches = accept_batches
+        self.honour_idempotency_keys = honour_idempotency_keys
+        self.catalog = build_catalog(products_per_category, description_bytes)
+        self.customers = build_customers()
+        self.orders = build_orders(self.customers, self.catalog)
+        self.idempotency_keys = {}  # create_order idempotency_key -> order
+        self._lock = threading.Lock()
+        self.sse_keepalive = sse_keepalive
+        self._subscribers = []  # one queue per open SSE stream
+        self._closing = threading.Event()
+        self.stats = {}
+        self.reset_stats()
+        self._server = StubHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/mcp"
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"http_requests": 0, "rpc_calls": 0, "bytes_in": 0, "bytes_out": 0, "tool_calls": {}, "notifications": 0}
+
+    def start(self) -> "MCPStubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mcp-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._closing.set()
+        self.disconnect_subscribers()
+        self._server.shutdown()
+        self._server.server_close()
+
+    # Notifications
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def notify(self, method: str, params: dict):
+        """Send a JSON-RPC notification to every SSE subscriber."""
+        data = json.dumps({"jsonrpc": "2.0", "method": method, "params": params})
+        with self._lock:
+            self.stats["notifications"] += 1
+            for subscriber in self._subscribers:
+                subscriber.put(data)
+
+    def update_product(self, sku: str, **fields):
+        """Change a catalog entry (e.g. stock=0) and announce it."""
+        with self._lock:
+            product = next(p for p in self.catalog if p["sku"] == sku)
+            product.update(fields)
+        self.notify("notifications/resources/updated", {"uri": f"product://{sku}"})
+
+    def set_order_status(self, order_id: str, status: str):
+        with self._lock:
+            order = next(o for o in self.orders if o["id"] == order_id)
+            order["status"] = status
+        self.notify("notifications/resources/updated", {"uri": f"order://{order_id}"})
+
+    def disconnect_subscribers(self):
+        """End every open SSE stream (clients should reconnect)."""
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.put(None)
+
+    # JSON-RPC
+
+    def handle_rpc(self, request: dict) -> dict:
+        rpc_id = request.get("id")
+        method = request.get("method")
+        params = request.get("params") or {}
+        if method == "initialize":
+            result = {"protocolVersion": "2024-11-05", "capabilities": {"tools": {}}, "serverInfo": {"name": "mcp-stub", "version": "1.0.0"}}
+        elif method == "tools/list":
+            result = {"tools": [self._tool_listing(name) for name in self.TOOLS]}
+        elif method == "tools/call":
+            name = params.get("name")
+            with self._lock:
+                self.stats["tool_calls"][name] = self.stats["tool_calls"].get(name, 0) + 1
+            handler = self.TOOLS.get(name)
+            if handler is None:
+                return {"jsonrpc": "2.0", "id": rpc_id, "error": {"code": -32602, "message": f"Unknown tool: {name}"}}
+            text = handler(self, params.get("arguments") or {})
+            result = {"content": [{"type": "text", "text": text}]}
+        else:
+            return {"jsonrpc": "2.0", "id": rpc_id, "error": {"code": -32601, "message": f"Method not found: {method}"}}
+        return {"jsonrpc": "2.0", "id": rpc_id, "result": result}
+
+    def _tool_listing(self, name: str) -> dict:
+        if name != "create_order":
+            return {"name": name}
+        properties = {"customer_id": {"type": "string"}, "items": {"type": "array"}}
+        if self.honour_idempotency_keys:
+            properties["idempotency_key"] = {"type": "string"}
+        return {"name": name, "inputSchema": {"type": "object", "properties": properties, "required": ["customer_id", "items"]}}
+
+    def _list_products(self, args: dict) -> str:
+        products = [
+            p for p in self.catalog
+            if (not args.get("category") or p["category"].lower() == str(args["category"]).lower())
+            and ("is_active" not in args or p["is_active"] == args["is_active"])
+        ]
+        return json.dumps(_page(products, args))
+
+    def _get_product(self, args: dict) -> str:
+        sku = str(args.get("sku", "")).upper()
+        product = next((p for p in self.catalog if p["sku"] == sku), None)
+        return json.dumps(product) if product else f"Product {sku} not found"
+
+    def _search_products(self, args: dict) -> str:
+        words = str(args.get("query", "")).lower().split()
+        return json.dumps([
+            p for p in self.catalog
+            if words and all(word in f"{p['name']} {p['description']} {p['category']}".lower() for word in words)
+        ])
+
+    def _get_customer(self, args: dict) -> str:
+        customer = next((c for c in self.customers if c["id"] == args.get("customer_id")), None)
+        if customer is None:
+            return "Customer not found"
+        return json.dumps({key: value for key, value in customer.items() if key != "pin"})
+
+    def _verify_customer_pin(self, args: dict) -> str:
+        customer = next((c for c in self.customers if c["email"] == args.get("email")), None)
+        if customer is None or customer["pin"] != str(args.get("pin")):
+            return json.dumps({"verified": False})
+        return json.dumps({"verified": True, "customer_id": customer["id"], "name": customer["name"]})
+
+    def _list_orders(self, args: dict) -> str:
+        return json.dumps(_page([
+            {key: value for key, value in order.items() if key != "items"}
+            for order in self.orders
+            if (not args.get("customer_id") or order["customer_id"] == args["customer_id"])
+            and (not args.get("status") or order["status"] == args["status"])
+        ], args))
+
+    def _get_order(self, args: dict) -> str:
+        order = next((o for o in self.orders if o["id"] == args.get("order_id")), None)
+        return json.dumps(order) if order else "Order not found"
+
+    def _create_order(self, args: dict) -> str:
+        with self._lock:
+            key = args.get("idempotency_key") if self.honour_idempotency_keys else None
+            if key and key in self.idempotency_keys:
+                return json.dumps(self.idempotency_keys[key])
+            order = {
+                "id": str(uuid.uuid4()),
+                "customer_id": args.get("customer_id"),
+                "status": "submitted",
+                "currency": "USD",
+                "items": args.get("items") or [],
+            }
+            self.orders.append(order)
+            if key:
+                self.idempotency_keys[key] = order
+        return json.dumps(order)
+
+    TOOLS = {
+        "list_products": _list_products,
+        "get_product": _get_product,
+        "search_products": _search_products,
+        "get_customer": _get_customer,
+        "verify_customer_pin": _verify_customer_pin,
+        "list_orders": _list_orders,
+        "get_order": _get_order,
+        "create_order": _create_order,
+    }
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if "text/event-stream" not in self.headers.get("Accept", ""):
+                    self._reply(405, {"error": "Use POST for JSON-RPC, or Accept: text/event-stream"}, b"")
+                    return
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+
+                events = queue.Queue()
+                with stub._lock:
+                    stub._subscribers.append(events)
+                try:
+                    self.wfile.write(b": connected\n\n")
+                    self.wfile.flush()
+                    while not stub._closing.is_set():
+                        try:
+                            data = events.get(timeout=stub.sse_keepalive)
+                        except queue.Empty:
+                            self.wfile.write(b": ping\n\n")
+                        else:
+                            if data is None:
+                                break
+                            self.wfile.write(f"event: message\ndata: {data}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                except OSError:
+                    pass
+                finally:
+                    with stub._lock:
+                        stub._subscribers.remove(events)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if stub.latency or stub.jitter:
+                    time.sleep(stub.latency + random.random() * stub.jitter)
+                try:
+                    request = json.loads(body)
+                except ValueError:
+                    self._reply(400, {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}, body)
+                    return
+
+                if isinstance(request, list):
+                    if not stub.accept_batches:
+                        self._reply(200, {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Batch requests are not supported"}}, body)
+                        return
+                    responses = [stub.handle_rpc(item) for item in request]
+                    calls = len(request)
+                else:
+                    responses = stub.handle_rpc(request)
+                    calls = 1
+                with stub._lock:
+                    stub.stats["rpc_calls"] += calls
+                self._reply(200, responses, body)
+
+            def _reply(self, status: int, payload, body: bytes):
+                data = json.dumps(payload).encode("utf-8")
+                with stub._lock:
+                    stub.stats["http_requests"] += 1
+                    stub.stats["bytes_in"] += len(body)
+                    stub.stats["bytes_out"] += len(data)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local MCP stand-in server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--products", type=int, default=25, help="products per category")
+    parser.add_argument("--description-bytes", type=int, default=200)
+    parser.add_argument("--no-batches", action="store_true", help="reject JSON-RPC batch arrays")
+    parser.add_argument("--no-idempotency-keys", action="store_true", help="ignore create_order's idempotency_key")
+    parser.add_argument("--sse-keepalive", type=float, default=15.0, help="seconds between SSE keep-alive comments")
+    args = parser.parse_args()
+
+    server = MCPStubServer(
+        port=args.port, latency=args.latency, jitter=args.jitter,
+        products_per_category=args.products, description_bytes=args.description_bytes,
+        accept_batches=not args.no_batches, honour_idempotency_keys=not args.no_idempotency_keys,
+        sse_keepalive=args.sse_keepalive
+    ).start()
+    print(f"MCP stub listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
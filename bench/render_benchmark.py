@@ -0,0 +1,90 @@
+"""
+Transcript rerun benchmark
+Times a Streamlit rerun of the chat transcript (Streamlit's AppTest runner)
+against session length, for the full render (every message as its own
+chat bubble) and the incremental one used by the app.
+
+Usage: python -m bench.render_benchmark --turns 10 50 200 500 --reruns 5
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from streamlit.testing.v1 import AppTest
+
+from src.conversation_store import MemoryConversationStore
+from src.transcript import TranscriptRenderer
+
+REPLY = """Here are the monitors that match:
+
+| SKU | Name | Price | Stock |
+|-----|------|-------|-------|
+| MON-0054 | 27" 4K IPS Monitor | $329.99 | 14 |
+| MON-0055 | 32" Curved QHD Monitor | $289.99 | 6 |
+| MON-0056 | 24" 144Hz Gaming Monitor | $179.99 | 22 |
+
+Would you like more details on any of them?"""
+
+
+def full_render(store, session_id):
+    import streamlit as st
+    from src.conversation_store import chat_messages
+
+    messages = chat_messages(store.load_turns(session_id, store.turn_count(session_id), store.turn_count(session_id)))
+    for message in messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+
+def incremental_render(renderer, session_id):
+    from src.transcript import draw_transcript
+
+    draw_transcript(renderer, session_id)
+
+
+def build_session(store, turns: int) -> str:
+    session_id = store.create_session()
+    for n in range(turns):
+        store.append(session_id, [
+            {"role": "user", "content": f"What monitors do you have under ${200 + n}?"},
+            {"role": "assistant", "content": REPLY},
+        ])
+    return session_id
+
+
+def time_reruns(app: AppTest, reruns: int) -> float:
+    """Median rerun time in ms (the first, cold run is not counted)."""
+    app.run()
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcript rerun time vs session length")
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 200, 500])
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    store = MemoryConversationStore()
+    renderer = TranscriptRenderer(store)
+    print(f"{'Turns':>6}  {'Full (ms)':>10}  {'Incremental (ms)':>17}  {'Elements (full/incr)':>21}")
+    for turns in args.turns:
+        session_id = build_session(store, turns)
+        full = AppTest.from_function(full_render, args=(store, session_id), default_timeout=60)
+        incremental = AppTest.from_function(incremental_render, args=(renderer, session_id), default_timeout=60)
+        full_ms = time_reruns(full, args.reruns)
+        incremental_ms = time_reruns(incremental, args.reruns)
+        elements = f"{len(full.markdown)}/{len(incremental.markdown)}"
+        print(f"{turns:>6}  {full_ms:>10.1f}  {incremental_ms:>17.1f}  {elements:>21}")
+
+
+if __name__ == "__main__":
+    main()
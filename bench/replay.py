@@ -0,0 +1,121 @@
+"""
+Replay a recorded cassette
+Reruns the chat turns of a cassette (see src/cassette.py) through
+ChatEngine.get_bot_response with every MCP and LLM answer played back from
+it, offline, and compares turn latency and replies with the recording.
+
+Usage: python -m bench.replay cassette.jsonl.gz --speed 1 --concurrency 4
+
+With --speed 0 (the default) recorded delays are skipped, for fast
+regression runs; with --speed 1 calls take as long as they did when
+recorded, and turns start at their recorded times, scaled by 1 / speed.
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bench.benchmark import percentile
+from src.cache import ToolCache
+from src.cassette import Cassette
+from src.engine import ChatEngine
+from src.mcp_client import MCPClient
+from src.prefetch import Prefetcher
+from src.tracing import tracer
+from src.transport import HTTPTransport
+from src.validation import ToolValidator
+
+# Never contacted: every call is answered from the cassette
+REPLAY_SERVER_URL = "http://cassette.invalid/mcp"
+
+
+def run(args) -> dict:
+    cassette = Cassette(args.cassette, mode="replay", speed=args.speed, strict=args.strict)
+    mcp_client = cassette.wrap_mcp(MCPClient(
+        server_url=REPLAY_SERVER_URL, transport=HTTPTransport(), cache=None if args.no_cache else ToolCache()
+    ))
+    prefetcher = Prefetcher(mcp_client) if args.prefetch else None
+    engine = ChatEngine(
+        mcp_client=mcp_client,
+        llm_client=cassette.wrap_llm(),
+        prefetcher=prefetcher,
+        validator=ToolValidator()
+    )
+    turns = cassette.turns()
+    latencies, matched = [], []
+    lock = threading.Lock()
+
+    def replay(turn: dict):
+        start = time.perf_counter()
+        reply = engine.get_bot_response(turn["user_message"], turn["chat_history"])
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            matched.append(turn["reply"] is not None and reply.strip() == turn["reply"].strip())
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = []
+        for turn in turns:
+            if args.speed > 0:
+                # Keep the recorded arrival pattern
+                time.sleep(max(0.0, turn["t"] / args.speed - (time.perf_counter() - start)))
+            futures.append(pool.submit(replay, turn))
+        for future in futures:
+            future.result()
+        tracer.sink.flush()
+    elapsed = time.perf_counter() - start
+
+    recorded = [turn["seconds"] for turn in turns]
+    count = len(latencies)
+    return {
+        "turns": count,
+        "seconds": elapsed,
+        "turns_per_second": count / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {"p50": percentile(latencies, 50) * 1000, "p95": percentile(latencies, 95) * 1000},
+        "recorded_latency_ms": {"p50": percentile(recorded, 50) * 1000, "p95": percentile(recorded, 95) * 1000},
+        "replies_matched": sum(matched),
+        "calls": dict(cassette.stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the chat turns of a recorded cassette offline")
+    parser.add_argument("cassette", help="file written with CASSETTE_MODE=record or bench.benchmark --record")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = recorded speed, 2 = twice as fast, 0 = no delays")
+    parser.add_argument("--concurrency", type=int, default=1, help="turns replayed at once")
+    parser.add_argument("--no-cache", action="store_true", help="disable the catalog cache")
+    parser.add_argument("--prefetch", action="store_true", help="enable speculative prefetch of order / product lookups")
+    parser.add_argument("--strict", action="store_true", help="fail on calls that are not in the cassette")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="exit non-zero if p95 turn latency exceeds this")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        latency, recorded, calls = report["latency_ms"], report["recorded_latency_ms"], report["calls"]
+        print(f"Turns:                 {report['turns']} in {report['seconds']:.2f}s ({report['turns_per_second']:.1f}/s)")
+        print(f"Turn latency (ms):     p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}")
+        print(f"Recorded (ms):         p50 {recorded['p50']:.1f}  p95 {recorded['p95']:.1f}")
+        print(f"Replies matched:       {report['replies_matched']} of {report['turns']}")
+        print(f"Calls replayed:        {calls['mcp']} MCP, {calls['llm']} LLM, {calls['misses']} not in the cassette")
+
+    failed = report["replies_matched"] < report["turns"] or report["calls"]["misses"]
+    if args.max_p95_ms is not None and report["latency_ms"]["p95"] > args.max_p95_ms:
+        print(f"FAIL: p95 {report['latency_ms']['p95']:.1f} ms exceeds {args.max_p95_ms} ms", file=sys.stderr)
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
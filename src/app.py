@@ -12,133 +12,113 @@ st.set_page_config(
 )
 
 import sys
-import json
-from openai import OpenAI
 
-from src.config import OPENROUTER_API_KEY, OPENROUTER_BASE_URL, MODEL_NAME, SYSTEM_PROMPT
+from src.config import (
+    OPENROUTER_API_KEY, OPENROUTER_BASE_URL, METRICS_PORT,
+    SEARCH_INDEX_ENABLED, SEARCH_INDEX_REFRESH, STREAM_RESPONSES, FAST_PATH_ENABLED,
+    PREFETCH_ENABLED, SESSION_IDLE_TIMEOUT, FAST_STARTUP, STARTUP_WARM_UP, MCP_NOTIFICATIONS_ENABLED
+)
+from src.cache import ToolCache
+from src.cassette import configured_cassette
+from src.compaction import ResultStore
+from src.conversation_store import open_store
+from src.customer_context import CustomerContext
+from src.engine import ChatEngine
 from src.mcp_client import MCPClient
-from src.tools import get_openai_tools
-
-def log(msg):
-    """Print log message with flush for immediate output."""
-    print(f"[LOG] {msg}", flush=True)
+from src.prefetch import Prefetcher
+from src.router import FastPathRouter
+from src.search_index import ProductSearchIndex
+from src.startup import Lazy, warm_up
+from src.tracing import log, start_metrics_server
+from src.transcript import TranscriptRenderer, draw_transcript
 
 log("App module loaded")
 
 # Initialize clients
 @st.cache_resource
 def get_mcp_client():
-    return MCPClient()
+    client = MCPClient(cache=ToolCache())
+    cassette = configured_cassette()
+    return cassette.wrap_mcp(client) if cassette else client
+
+def build_llm_client():
+    cassette = configured_cassette()
+    if cassette and cassette.mode == "replay":
+        return cassette.wrap_llm()
+    if not OPENROUTER_API_KEY:
+        return None
+    # Importing openai takes about a second; with FAST_STARTUP it happens off the first page paint
+    from openai import OpenAI
+    client = OpenAI(base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY)
+    return cassette.wrap_llm(client) if cassette else client
 
 @st.cache_resource
 def get_llm_client():
-    if OPENROUTER_API_KEY:
-        return OpenAI(base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY)
+    if FAST_STARTUP:
+        return Lazy(build_llm_client, "llm_client")
+    return build_llm_client()
+
+@st.cache_resource
+def get_search_index():
+    if not SEARCH_INDEX_ENABLED:
+        return None
+    index = ProductSearchIndex()
+    index.start_background_refresh(get_mcp_client(), SEARCH_INDEX_REFRESH)
+    return index
+
+@st.cache_resource
+def get_notification_listener():
+    if not MCP_NOTIFICATIONS_ENABLED:
+        return None
+    return get_mcp_client().subscribe(search_index=get_search_index())
+
+@st.cache_resource
+def get_fast_path_router():
+    return FastPathRouter() if FAST_PATH_ENABLED else None
+
+@st.cache_resource
+def get_prefetcher():
+    return Prefetcher(get_mcp_client()) if PREFETCH_ENABLED else None
+
+@st.cache_resource
+def get_store():
+    store = open_store()
+    store.start_background_expiry(SESSION_IDLE_TIMEOUT)
+    return store
+
+@st.cache_resource
+def get_transcript_renderer():
+    return TranscriptRenderer(get_store())
+
+@st.cache_resource
+def get_engine():
+    return ChatEngine(
+        mcp_client=get_mcp_client(),
+        llm_client=get_llm_client(),
+        search_index=get_search_index(),
+        fast_path_router=get_fast_path_router(),
+        prefetcher=get_prefetcher(),
+        store=get_store()
+    )
+
+@st.cache_resource
+def get_metrics_server():
+    if METRICS_PORT:
+        return start_metrics_server(METRICS_PORT)
     return None
 
-mcp_client = get_mcp_client()
-llm_client = get_llm_client()
-
-
-def execute_tool(tool_name: str, arguments: dict) -> str:
-    """Execute an MCP tool and return the result."""
-    log(f"Executing tool: {tool_name} with args: {arguments}")
-    tool_map = {
-        "list_products": lambda args: mcp_client.list_products(
-            category=args.get("category"),
-            is_active=args.get("is_active")
-        ),
-        "get_product": lambda args: mcp_client.get_product(args.get("sku", "")),
-        "search_products": lambda args: mcp_client.search_products(args.get("query", "")),
-        "get_customer": lambda args: mcp_client.get_customer(args.get("customer_id", "")),
-        "verify_customer_pin": lambda args: mcp_client.verify_customer_pin(
-            args.get("email", ""), args.get("pin", "")
-        ),
-        "list_orders": lambda args: mcp_client.list_orders(
-            customer_id=args.get("customer_id"),
-            status=args.get("status")
-        ),
-        "get_order": lambda args: mcp_client.get_order(args.get("order_id", "")),
-        "create_order": lambda args: mcp_client.create_order(
-            args.get("customer_id", ""), args.get("items", [])
-        ),
-    }
-    
-    if tool_name in tool_map:
-        result = tool_map[tool_name](arguments)
-        log(f"Tool {tool_name} returned: {result[:200]}..." if len(result) > 200 else f"Tool {tool_name} returned: {result}")
-        return result
-    log(f"Unknown tool: {tool_name}")
-    return f"Unknown tool: {tool_name}"
-
-
-def get_bot_response(user_message: str, chat_history: list) -> str:
-    """Get response from Gemini via OpenRouter with tool calling."""
-    log(f"User message: {user_message}")
-    log(f"Chat history length: {len(chat_history)}")
-    
-    if not llm_client:
-        log("No LLM client - OPENROUTER_API_KEY not set")
-        return "⚠️ Please set OPENROUTER_API_KEY in your .env file."
-    
-    try:
-        # Build messages
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-        for msg in chat_history:
-            messages.append({"role": msg["role"], "content": msg["content"]})
-        messages.append({"role": "user", "content": user_message})
-        
-        log(f"Calling LLM with {len(messages)} messages")
-        
-        # Call LLM with tools
-        response = llm_client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=messages,
-            tools=get_openai_tools(),
-            tool_choice="auto"
-        )
-        
-        log(f"LLM response received")
-        
-        # Handle tool calls (max 5 iterations)
-        iteration = 0
-        for iteration in range(5):
-            message = response.choices[0].message
-            
-            if not message.tool_calls:
-                log(f"No more tool calls after {iteration} iterations")
-                break
-            
-            log(f"Iteration {iteration}: {len(message.tool_calls)} tool calls")
-            messages.append(message)
-            
-            for tool_call in message.tool_calls:
-                tool_name = tool_call.function.name
-                arguments = json.loads(tool_call.function.arguments)
-                log(f"Tool call: {tool_name}")
-                result = execute_tool(tool_name, arguments)
-                
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": result
-                })
-            
-            log(f"Calling LLM again with tool results")
-            response = llm_client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=messages,
-                tools=get_openai_tools(),
-                tool_choice="auto"
-            )
-        
-        final_response = response.choices[0].message.content or "I couldn't generate a response. Please try again."
-        log(f"Final response: {final_response[:100]}..." if len(final_response) > 100 else f"Final response: {final_response}")
-        return final_response
-        
-    except Exception as e:
-        log(f"Error in get_bot_response: {e}")
-        return f"❌ Error: {str(e)}"
+@st.cache_resource
+def start_warm_up():
+    """Build the LLM client and connect to the MCP server while the first page renders."""
+    return warm_up(get_llm_client(), mcp_client=get_mcp_client())
+
+engine = get_engine()
+store = get_store()
+transcript = get_transcript_renderer()
+get_metrics_server()
+get_notification_listener()
+if STARTUP_WARM_UP:
+    start_warm_up()
 
 
 # ============== STREAMLIT UI ==============
@@ -166,37 +146,60 @@ with st.sidebar:
     st.divider()
     
     if st.button("🗑️ Clear Chat"):
-        st.session_state.messages = []
+        store.delete_session(st.session_state.session_id)
+        st.session_state.session_id = store.create_session()
+        st.query_params["session"] = st.session_state.session_id
+        st.session_state.result_store = ResultStore()
+        st.session_state.customer_context = CustomerContext()
+        st.session_state.transcript_pages = 1
         st.rerun()
     
     st.divider()
     st.caption("Powered by Gemini Flash via OpenRouter + MCP")
 
-# Initialize chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-
-# Display chat history
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# Initialize the session: its history lives in the conversation store, and
+# the id is kept in the URL so a reload (or a restart) resumes the chat.
+# Anyone with the URL can do that, so customer verification is not part of
+# what resumes: it lives in this browser session's state only.
+if "session_id" not in st.session_state:
+    session_id = st.query_params.get("session")
+    if not session_id or not store.has_session(session_id):
+        session_id = store.create_session()
+        st.query_params["session"] = session_id
+    st.session_state.session_id = session_id
+if "result_store" not in st.session_state:
+    st.session_state.result_store = ResultStore()
+if "customer_context" not in st.session_state:
+    st.session_state.customer_context = CustomerContext()
+
+# Display chat history: newest turn in full, earlier turns collapsed and paged
+draw_transcript(transcript, st.session_state.session_id)
 
 # Chat input
 if prompt := st.chat_input("How can I help you today?"):
     log(f"=== New chat input received ===")
-    log(f"Current session messages: {len(st.session_state.messages)}")
+    log(f"Current session turns: {store.turn_count(st.session_state.session_id)}")
     
-    st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
     
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            log("Getting bot response...")
-            response = get_bot_response(prompt, st.session_state.messages[:-1])
-            log(f"Bot response received, length: {len(response)}")
-        st.markdown(response)
+        log("Getting bot response...")
+        if STREAM_RESPONSES:
+            response = st.write_stream(engine.stream_bot_response(
+                prompt, result_store=st.session_state.result_store,
+                session_id=st.session_state.session_id,
+                customer_context=st.session_state.customer_context
+            ))
+        else:
+            with st.spinner("Thinking..."):
+                response = engine.get_bot_response(
+                    prompt, result_store=st.session_state.result_store,
+                    session_id=st.session_state.session_id,
+                    customer_context=st.session_state.customer_context
+                )
+            st.markdown(response)
+        log(f"Bot response received, length: {len(response)}")
     
-    st.session_state.messages.append({"role": "assistant", "content": response})
-    log(f"Messages after response: {len(st.session_state.messages)}")
+    log(f"Session turns after response: {store.turn_count(st.session_state.session_id)}")
     log("=== Chat input processing complete ===")
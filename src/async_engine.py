@@ -0,0 +1,116 @@
+"""
+Async chat engine for the API server
+The ChatEngine turn loop with awaited MCP and LLM calls, so one process can
+run many chats concurrently.
+"""
+import asyncio
+from typing import Optional
+
+from src.compaction import ResultStore
+from src.customer_context import CustomerContext
+from src.engine import ChatEngine
+from src.history import HistoryManager
+from src.prefetch import PrefetchTurn
+from src.search_index import parse_products
+from src.steps import arun_steps, astream_steps
+
+
+class AsyncChatEngine(ChatEngine):
+    """ChatEngine driven by an AsyncMCPClient and an AsyncOpenAI client.
+
+    The turn logic is ChatEngine's (see src/steps.py); only the calls
+    that do I/O differ, and are awaited here. A `prefetcher` keeps its own
+    (sync) MCP client and thread pool, and conversation store calls run in
+    worker threads.
+    """
+
+    _turn_attributes = {"transport": "async"}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Strong references so fire-and-forget tasks aren't garbage collected
+        self._background = set()
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _observe_result(self, tool_name: str, mcp_args: dict, result: str):
+        if self.search_index is not None and tool_name == "create_order" and not result.startswith("Error"):
+            self._spawn(self._refresh_index())
+            return
+        super()._observe_result(tool_name, mcp_args, result)
+
+    async def _refresh_index(self):
+        products = parse_products(await self.mcp_client.list_products())
+        if products is not None:
+            self.search_index.update(products)
+
+    @staticmethod
+    async def _blocking(fn, *args):
+        return await asyncio.to_thread(fn, *args)
+
+    @staticmethod
+    async def _take_prefetched(prefetch: Optional[PrefetchTurn], tool_name: str, mcp_args: dict) -> Optional[str]:
+        if prefetch is None:
+            return None
+        future = prefetch.claim(tool_name, mcp_args)
+        if future is None:
+            return None
+        return prefetch.settle(tool_name, await asyncio.wrap_future(future))
+
+    async def _llm_call(self, messages: list, stream: bool, tools: list) -> tuple:
+        return await self.model_router.acomplete(
+            self.llm_client,
+            messages,
+            stream=stream,
+            tools=tools,
+            tool_choice="auto"
+        )
+
+    @staticmethod
+    async def _next_chunk(stream):
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def _close_stream(self, stream):
+        close = getattr(stream, "close", None)
+        result = close() if close is not None else None
+        if asyncio.iscoroutine(result):
+            # Called while a generator is being closed, so it can't be awaited there
+            self._spawn(result)
+
+    async def execute_tool(self, tool_name: str, arguments: dict, prefetch: Optional[PrefetchTurn] = None) -> str:
+        """Execute an MCP tool and return the result."""
+        return await arun_steps(self._execute_tool(tool_name, arguments, prefetch))
+
+    async def execute_tool_calls(self, tool_calls: list, prefetch: Optional[PrefetchTurn] = None) -> list:
+        """Execute the tool calls of one LLM message; see ChatEngine.execute_tool_calls."""
+        return await arun_steps(self._execute_tool_calls(tool_calls, prefetch))
+
+    async def get_bot_response(
+        self,
+        user_message: str,
+        chat_history: Optional[list] = None,
+        history: Optional[HistoryManager] = None,
+        result_store: Optional[ResultStore] = None,
+        session_id: Optional[str] = None,
+        customer_context: Optional[CustomerContext] = None
+    ) -> str:
+        """Async get_bot_response: the full reply to one user message."""
+        return await arun_steps(self._bot_response(user_message, chat_history, history, result_store, session_id, customer_context))
+
+    def stream_bot_response(
+        self,
+        user_message: str,
+        chat_history: Optional[list] = None,
+        history: Optional[HistoryManager] = None,
+        result_store: Optional[ResultStore] = None,
+        session_id: Optional[str] = None,
+        customer_context: Optional[CustomerContext] = None
+    ):
+        """Async generator of reply tokens; see ChatEngine.stream_bot_response."""
+        return astream_steps(self._stream_bot_response(user_message, chat_history, history, result_store, session_id, customer_context))
@@ -0,0 +1,194 @@
+"""
+Async MCP client for the API server
+Same tools, caching and resilience rules as MCPClient, over an httpx.AsyncClient.
+"""
+import asyncio
+import itertools
+from typing import Optional
+
+import httpx
+
+from src.config import (
+    MCP_SERVER_URL, MCP_HEADERS, MCP_CONNECT_TIMEOUT, MCP_READ_TIMEOUT,
+    MCP_HEDGE_ENABLED, MCP_COALESCE_ENABLED, MCP_POOL_SIZE, TOOL_CONCURRENCY
+)
+from src.cache import ToolCache, cache_key
+from src.mcp_client import TRANSIENT_STATUS_CODES, UNREACHABLE_ERROR, BaseMCPClient
+from src.resilience import IDEMPOTENT_TOOLS, AsyncSingleFlight, CircuitBreaker, LatencyTracker, RetryPolicy
+from src.steps import arun_steps
+from src.tracing import tracer
+
+
+class AsyncMCPClient(BaseMCPClient):
+    """Non-blocking MCP client; one instance serves every request of the process.
+
+    Same rules as MCPClient (shared through BaseMCPClient): JSON-RPC
+    batches with a concurrent fallback, retries and hedging for idempotent
+    reads, a circuit breaker, stale cache results while the server is
+    failing, and with `coalesce`, identical concurrent reads sharing one
+    request. `cache` may be shared with a sync MCPClient.
+    """
+
+    def __init__(
+        self,
+        server_url: str = MCP_SERVER_URL,
+        cache: Optional[ToolCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge: bool = MCP_HEDGE_ENABLED,
+        pool_size: int = MCP_POOL_SIZE,
+        coalesce: bool = MCP_COALESCE_ENABLED
+    ):
+        self.server_url = server_url
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.hedge = hedge
+        self.flights = AsyncSingleFlight() if coalesce else None
+        self.batch_supported: Optional[bool] = None
+        self._ids = itertools.count(1)
+        self._client = httpx.AsyncClient(
+            headers=MCP_HEADERS,
+            timeout=httpx.Timeout(MCP_READ_TIMEOUT, connect=MCP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    async def _call(self, method: str, params: Optional[dict] = None) -> dict:
+        """Make a JSON-RPC call, with the same retry and breaker rules as MCPClient._call."""
+        return await arun_steps(self._call_steps(method, params))
+
+    @staticmethod
+    async def _sleep(seconds: float):
+        await asyncio.sleep(seconds)
+
+    async def _attempt(self, method: str, params: Optional[dict], tool_name: str, hedge: bool) -> dict:
+        delay = self.latency.hedge_delay(tool_name or method) if hedge else None
+        if delay is None:
+            return await self._send(method, params)
+
+        primary = asyncio.ensure_future(self._send(method, params))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        tracer.count("mcp_hedged", tool=tool_name)
+        backup = asyncio.ensure_future(self._send(method, params, True))
+        pending = {primary, backup}
+        result = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if not result.get("transient"):
+                    if future is backup:
+                        tracer.count("mcp_hedge_wins", tool=tool_name)
+                    for loser in pending:
+                        loser.cancel()
+                    return result
+        return result
+
+    async def _send(self, method: str, params: Optional[dict], hedged: bool = False) -> dict:
+        payload = {
+            "jsonrpc": "2.0",
+            "id": self._next_id(),
+            "method": method,
+            "params": params or {}
+        }
+        tool_name = (params or {}).get("name", "")
+
+        with tracer.span("mcp_call", method=method, tool=tool_name, hedged=hedged, transport="async") as span:
+            try:
+                response = await self._client.post(self.server_url, json=payload)
+                span.set("status_code", response.status_code)
+                span.set("response_bytes", len(response.content))
+                if response.status_code in TRANSIENT_STATUS_CODES:
+                    span.status = "error"
+                    return {"error": f"MCP server returned HTTP {response.status_code}", "transient": True}
+                result = response.json()
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                span.status = "error"
+                span.set("error", "unreachable")
+                return {"error": f"{UNREACHABLE_ERROR}: {e}", "transient": True}
+            except httpx.TimeoutException:
+                span.status = "error"
+                span.set("error", "timeout")
+                return {"error": "Request timed out", "transient": True}
+            except Exception as e:
+                span.status = "error"
+                span.set("error", str(e))
+                return {"error": str(e), "transient": True}
+
+        self.latency.record(tool_name or method, span.duration)
+        return result
+
+    def _next_id(self) -> int:
+        return next(self._ids)
+
+    async def _call_batch(self, calls: list) -> Optional[list]:
+        """Send several calls as one batch array; None if the server rejected it."""
+        payload = self._batch_payload(calls)
+
+        with tracer.span("mcp_call", method="batch", calls=len(payload), transport="async") as span:
+            try:
+                response = await self._client.post(self.server_url, json=payload)
+                span.set("status_code", response.status_code)
+                span.set("response_bytes", len(response.content))
+                if response.status_code in TRANSIENT_STATUS_CODES:
+                    span.status = "error"
+                    return self._batch_failed(payload, f"MCP server returned HTTP {response.status_code}")
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = None
+            except httpx.TimeoutException:
+                span.status = "error"
+                span.set("error", "timeout")
+                return self._batch_failed(payload, "Request timed out")
+            except Exception as e:
+                span.status = "error"
+                span.set("error", str(e))
+                return self._batch_failed(payload, str(e))
+
+        return self._batch_answered(payload, body, response.status_code)
+
+    async def call_tools_batch(self, calls: list) -> list:
+        """Call several tools in one round trip; results in `calls` order."""
+        return await arun_steps(self._batch_steps(calls))
+
+    async def _call_tools_individually(self, calls: list) -> list:
+        limit = asyncio.Semaphore(max(1, TOOL_CONCURRENCY))
+
+        async def fetch(name, arguments):
+            async with limit:
+                return await self._fetch_tool(name, arguments)
+
+        return list(await asyncio.gather(*(fetch(name, arguments) for name, arguments in calls)))
+
+    async def call_tool(self, tool_name: str, arguments: Optional[dict] = None) -> str:
+        """Call an MCP tool and return the result text."""
+        cached = self._cached(tool_name, arguments)
+        if cached is not None:
+            return cached
+        return await self._fetch_tool(tool_name, arguments)
+
+    async def _fetch_tool(self, tool_name: str, arguments: Optional[dict]) -> str:
+        """Call a tool on the server; reads join an identical call already in flight."""
+        if self.flights is None or tool_name not in IDEMPOTENT_TOOLS:
+            return await self._request_tool(tool_name, arguments)
+        result, shared = await self.flights.do(
+            cache_key(tool_name, arguments), lambda: self._request_tool(tool_name, arguments)
+        )
+        if shared:
+            tracer.count("mcp_coalesced", tool=tool_name)
+        return result
+
+    async def _request_tool(self, tool_name: str, arguments: Optional[dict]) -> str:
+        result = await self._call("tools/call", {
+            "name": tool_name,
+            "arguments": arguments or {}
+        })
+        return self._finish(tool_name, arguments, result)
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -0,0 +1,503 @@
+"""
+Bulk order import
+Places orders from a CSV or JSONL file through create_order: each order is
+checked against a catalog snapshot (get_product), submitted with bounded
+concurrency under an idempotency key, and recorded in a ledger so that
+re-running an import never orders twice.
+
+Resending an order whose create_order got no answer is only safe if the
+server deduplicates by idempotency key, so this depends on the server: the
+importer retries (and re-runs resend unconfirmed orders) only when the
+server's tools/list schema for create_order lists an `idempotency_key`
+argument, or when the call provably never reached the server (connection
+refused, circuit open); the key itself is only sent to such servers. Otherwise
+such an order is reported as "unknown": check list_orders for its customer by
+hand before placing it again. A JSON-RPC error from the server is a refusal
+and rejects the order outright.
+
+Usage: python -m src.bulk_orders orders.csv --results results.jsonl --concurrency 8
+
+CSV: one row per line item, with columns customer_id, sku, quantity and
+optionally ref, unit_price, currency, idempotency_key; consecutive rows with
+the same ref are one order. JSONL: one order per line,
+{"ref": ..., "customer_id": ..., "items": [{"sku": ..., "quantity": ...}]}.
+Give every order a ref (or an idempotency_key): without one, an order is
+known by its line number, which changes if the file is edited.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import BULK_CONCURRENCY, BULK_MAX_ATTEMPTS, BULK_LEDGER, MCP_SERVER_URL
+from src.mcp_client import never_sent, server_rejected
+from src.resilience import LatencyTracker, RetryPolicy
+from src.tracing import propagate, tracer
+from src.validation import TOOL_VALIDATOR, ToolArgumentError
+
+# Per-order outcomes, as written to the results file
+STATUSES = ("created", "duplicate", "rejected", "failed", "unknown")
+ITEM_COLUMNS = ("sku", "quantity", "unit_price", "currency")
+
+
+class OrderRejected(ValueError):
+    """An order that can't be placed as written (bad row, unknown SKU, wrong price)."""
+
+
+class OrderFailed(RuntimeError):
+    """An order that couldn't be placed this time (server errors); safe to re-run."""
+
+
+class OrderUnknown(RuntimeError):
+    """An order sent without a confirmation to a server that may not deduplicate it; check list_orders."""
+
+
+class BulkOrder:
+    """One order read from an import file; `error` is set for rows that couldn't be read."""
+
+    def __init__(
+        self,
+        ref: str,
+        line: int,
+        customer_id: Optional[str] = None,
+        items=None,
+        idempotency_key: Optional[str] = None,
+        error: Optional[str] = None
+    ):
+        self.ref = ref
+        self.line = line
+        self.customer_id = customer_id
+        self.items = items
+        self.idempotency_key = idempotency_key
+        self.error = error
+
+
+def order_key(ref: str, arguments: dict) -> str:
+    """Idempotency key for an order without one: a hash of its ref and normalized create_order arguments."""
+    canonical = json.dumps({"ref": ref, **arguments}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def read_orders(path: str, fmt: Optional[str] = None) -> Iterator[BulkOrder]:
+    """Orders from a CSV or JSONL file (by extension unless `fmt` is given), read lazily."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from (_csv_orders(f) if fmt == "csv" else _jsonl_orders(f))
+
+
+def _jsonl_orders(lines: Iterable[str]) -> Iterator[BulkOrder]:
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield BulkOrder(f"line-{number}", number, error=f"invalid JSON: {e}")
+            continue
+        if not isinstance(data, dict):
+            yield BulkOrder(f"line-{number}", number, error="expected a JSON object")
+            continue
+        yield BulkOrder(
+            str(data.get("ref") or f"line-{number}"), number,
+            data.get("customer_id"), data.get("items"), data.get("idempotency_key")
+        )
+
+
+def _csv_orders(f: TextIO) -> Iterator[BulkOrder]:
+    reader = csv.DictReader(f)
+    order = None
+    for row in reader:
+        row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+        ref = row.get("ref") or row.get("order_ref")
+        item = {key: row[key] for key in ITEM_COLUMNS if row.get(key)}
+        if order is not None and ref and ref == order.ref:
+            order.items.append(item)
+            if row.get("customer_id") and row["customer_id"] != order.customer_id:
+                order.error = "rows of one order name different customers"
+            continue
+        if order is not None:
+            yield order
+        order = BulkOrder(
+            ref or f"line-{reader.line_num}", reader.line_num,
+            row.get("customer_id"), [item], row.get("idempotency_key") or None
+        )
+    if order is not None:
+        yield order
+
+
+def honours_idempotency_keys(mcp_client) -> bool:
+    """True if the server's tools/list schema for create_order has an `idempotency_key` argument."""
+    response = mcp_client.list_tools()
+    tools = (response.get("result") or {}).get("tools") or []
+    for tool in tools:
+        if tool.get("name") == "create_order":
+            return "idempotency_key" in ((tool.get("inputSchema") or {}).get("properties") or {})
+    return False
+
+
+def _parse(result: str):
+    try:
+        return json.loads(result)
+    except (TypeError, ValueError):
+        return None
+
+
+class CatalogSnapshot:
+    """get_product results for the SKUs of an import, each fetched once.
+
+    Orders needing SKUs that another order is already fetching wait for
+    that lookup. Unknown SKUs are remembered as None; lookups that failed
+    are retried by the next order that needs them.
+    """
+
+    def __init__(self, mcp_client):
+        self.mcp_client = mcp_client
+        self.fetched = 0
+        self._products = {}
+        self._in_flight = {}  # sku -> Event set when its lookup finishes
+        self._lock = threading.Lock()
+
+    def products(self, skus: list) -> dict:
+        """SKU -> product dict (None if there is no such product)."""
+        with self._lock:
+            missing = [sku for sku in dict.fromkeys(skus) if sku not in self._products and sku not in self._in_flight]
+            waiting = [self._in_flight[sku] for sku in dict.fromkeys(skus) if sku in self._in_flight]
+            for sku in missing:
+                self._in_flight[sku] = threading.Event()
+        if missing:
+            self._fetch(missing)
+        for event in waiting:
+            event.wait()
+        with self._lock:
+            if any(sku not in self._products for sku in skus):
+                raise OrderFailed("could not load the catalog for " + ", ".join(sku for sku in skus if sku not in self._products))
+            return {sku: self._products[sku] for sku in skus}
+
+    def _fetch(self, skus: list):
+        results = []
+        try:
+            results = self.mcp_client.call_tools_batch([("get_product", {"sku": sku}) for sku in skus])
+        finally:
+            with self._lock:
+                self.fetched += len(skus)
+                for sku, result in zip(skus, results):
+                    product = _parse(result)
+                    if isinstance(product, dict):
+                        self._products[sku] = product
+                    elif not result.startswith("Error"):
+                        self._products[sku] = None
+                for sku in skus:
+                    self._in_flight.pop(sku).set()
+
+
+def price_items(items: list, products: dict) -> list:
+    """Items with catalog prices filled in; raises OrderRejected if the catalog can't fill them."""
+    priced = []
+    for item in items:
+        sku = item["sku"]
+        product = products[sku]
+        if product is None:
+            raise OrderRejected(f"unknown SKU {sku}")
+        if product.get("is_active") is False:
+            raise OrderRejected(f"{sku} is no longer sold")
+        stock = product.get("stock")
+        if isinstance(stock, int) and item["quantity"] > stock:
+            raise OrderRejected(f"only {stock} of {sku} in stock, {item['quantity']} ordered")
+        price = product.get("price")
+        try:
+            if item.get("unit_price") and price is not None and Decimal(item["unit_price"]) != Decimal(str(price)):
+                raise OrderRejected(f"{sku} costs {price} in the catalog, not {item['unit_price']}")
+        except InvalidOperation:
+            raise OrderRejected(f"{sku} has no usable catalog price ({price!r})")
+        currency = product.get("currency") or "USD"
+        if item.get("currency") and item["currency"] != currency:
+            raise OrderRejected(f"{sku} is sold in {currency}, not {item['currency']}")
+        priced.append({**item, "unit_price": item.get("unit_price") or str(price), "currency": currency})
+    return priced
+
+
+class OrderLedger:
+    """Idempotency keys of submitted orders, in SQLite.
+
+    An order is claimed (status "pending") before it is submitted and
+    marked "created" with its order id once the server confirms it.
+    Created orders are never submitted again; failed or rejected ones
+    are. Pending ones (an earlier run stopped mid-submit) and unknown ones
+    are re-sent under the same key only with `resend_unconfirmed`, i.e.
+    when the server returns the order it already created for a key
+    instead of a second one; otherwise they stay "unknown".
+    """
+
+    def __init__(self, path: str = BULK_LEDGER):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS bulk_orders (
+                key TEXT PRIMARY KEY,
+                ref TEXT,
+                status TEXT NOT NULL,
+                order_id TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._lock = threading.Lock()
+        self._claimed = set()  # keys claimed by this process
+
+    def claim(self, key: str, ref: str, resend_unconfirmed: bool = False) -> tuple:
+        """(True, None, None) if the order should be submitted now, else (False, status, order id).
+
+        The status is "created" (with its order id) for an order already
+        placed under `key`, "unknown" for one sent earlier without a
+        confirmation that can't safely be sent again, and None when
+        another order in this import already has the key.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT status, order_id FROM bulk_orders WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] == "created":
+                return False, "created", row[1]
+            if key in self._claimed:
+                return False, None, None
+            if row is not None and row[0] in ("pending", "unknown") and not resend_unconfirmed:
+                self._db.execute("UPDATE bulk_orders SET status = 'unknown' WHERE key = ?", (key,))
+                return False, "unknown", None
+            self._claimed.add(key)
+            self._db.execute(
+                "INSERT OR REPLACE INTO bulk_orders (key, ref, status, order_id, error, updated_at) VALUES (?, ?, 'pending', NULL, NULL, ?)",
+                (key, ref, time.time())
+            )
+            return True, None, None
+
+    def record(self, key: str, status: str, order_id: Optional[str] = None, error: Optional[str] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE bulk_orders SET status = ?, order_id = ?, error = ?, updated_at = ? WHERE key = ?",
+                (status, order_id, error, time.time(), key)
+            )
+
+    def status(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT status FROM bulk_orders WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class BulkOrderImporter:
+    """Validates, prices and submits orders with at most `concurrency` in flight.
+
+    Orders are read lazily and at most twice `concurrency` are held at a
+    time, so files of any size stream through in bounded memory. Each
+    order's create_order arguments go through the tool validator, its
+    SKUs through the catalog snapshot, and its submission through the
+    ledger. create_order is retried (up to `max_attempts`) under the
+    order's idempotency key when the server errors, if `idempotency_keys`
+    (by default, whether the server advertises them; see the module
+    docstring) or the call never reached the server.
+    """
+
+    def __init__(
+        self,
+        mcp_client,
+        ledger: OrderLedger,
+        concurrency: int = BULK_CONCURRENCY,
+        max_attempts: int = BULK_MAX_ATTEMPTS,
+        validator=TOOL_VALIDATOR,
+        retry_policy: Optional[RetryPolicy] = None,
+        idempotency_keys: Optional[bool] = None
+    ):
+        self.mcp_client = mcp_client
+        self.ledger = ledger
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.validator = validator
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.idempotency_keys = idempotency_keys
+        self.catalog = CatalogSnapshot(mcp_client)
+        self.latency = LatencyTracker(window=10000, min_samples=1, min_delay=0.0)
+        self.stats = {status: 0 for status in STATUSES}
+        self.stats["create_order_calls"] = 0
+        self._lock = threading.Lock()
+
+    def run(self, orders: Iterable[BulkOrder], results: Optional[TextIO] = None) -> dict:
+        """Place `orders`, writing one JSON line per order to `results` as each finishes; returns the summary."""
+        start = time.monotonic()
+        if self.idempotency_keys is None:
+            self.idempotency_keys = honours_idempotency_keys(self.mcp_client)
+        with tracer.span("bulk_import", concurrency=self.concurrency) as span, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="bulk-order") as pool:
+            in_flight = set()
+            for order in orders:
+                if len(in_flight) >= 2 * self.concurrency:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    self._write(done, results)
+                in_flight.add(pool.submit(propagate(self.process), order))
+            self._write(wait(in_flight).done, results)
+            summary = self.summary(time.monotonic() - start)
+            span.set("orders", summary["orders"])
+        if results is not None:
+            results.write(json.dumps({"summary": summary}) + "\n")
+        return summary
+
+    @staticmethod
+    def _write(done, results: Optional[TextIO]):
+        for future in done:
+            result = future.result()
+            if results is not None:
+                results.write(json.dumps(result) + "\n")
+
+    def process(self, order: BulkOrder) -> dict:
+        """Place one order; returns its result record."""
+        start = time.monotonic()
+        result = {"ref": order.ref, "line": order.line}
+        with tracer.span("bulk_order", ref=order.ref) as span:
+            try:
+                result.update(self._place(order, result))
+            except OrderRejected as e:
+                result.update(status="rejected", error=str(e))
+            except OrderUnknown as e:
+                result.update(status="unknown", error=str(e))
+            except OrderFailed as e:
+                result.update(status="failed", error=str(e))
+            except Exception as e:
+                # A bug or an unexpected client error fails this order, not the whole import
+                result.update(status="failed", error=f"{type(e).__name__}: {e}")
+            span.set("status", result["status"])
+        result["seconds"] = round(time.monotonic() - start, 4)
+        with self._lock:
+            self.stats[result["status"]] += 1
+        tracer.count("bulk_orders", status=result["status"])
+        return result
+
+    def _place(self, order: BulkOrder, result: dict) -> dict:
+        if order.error:
+            raise OrderRejected(order.error)
+        try:
+            arguments = self.validator.validate("create_order", {"customer_id": order.customer_id, "items": order.items})
+        except ToolArgumentError as e:
+            raise OrderRejected(str(e))
+        key = str(order.idempotency_key) if order.idempotency_key else order_key(order.ref, arguments)
+        result["idempotency_key"] = key
+
+        claimed, status, order_id = self.ledger.claim(key, order.ref, resend_unconfirmed=self.idempotency_keys)
+        if status == "created":
+            return {"status": "duplicate", "order_id": order_id}
+        if status == "unknown":
+            raise OrderUnknown(self._unconfirmed(arguments["customer_id"], "an earlier run sent it without a confirmation"))
+        if not claimed:
+            raise OrderRejected("same order as an earlier one in this import")
+        try:
+            items = price_items(arguments["items"], self.catalog.products([item["sku"] for item in arguments["items"]]))
+            created = self._submit(arguments["customer_id"], items, key)
+        except OrderRejected as e:
+            self.ledger.record(key, "rejected", error=str(e))
+            raise
+        except OrderUnknown as e:
+            self.ledger.record(key, "unknown", error=str(e))
+            raise
+        except Exception as e:
+            self.ledger.record(key, "failed", error=str(e))
+            raise
+        self.ledger.record(key, "created", order_id=created["id"])
+        return {"status": "created", "order_id": created["id"], "total": created.get("total")}
+
+    def _submit(self, customer_id: str, items: list, key: str) -> dict:
+        """The created order, sending create_order again (same key) after server errors when that's safe."""
+        error = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                time.sleep(self.retry_policy.delay(attempt - 1))
+            start = time.monotonic()
+            try:
+                # Only sent to servers that advertise it: others may reject the unknown argument
+                text = self.mcp_client.create_order(customer_id, items, idempotency_key=key if self.idempotency_keys else None)
+            except Exception as e:
+                text = f"Error: {type(e).__name__}: {e}"
+            self.latency.record("create_order", time.monotonic() - start)
+            with self._lock:
+                self.stats["create_order_calls"] += 1
+            created = _parse(text)
+            if isinstance(created, dict) and created.get("id"):
+                return created
+            if not text.startswith("Error") or server_rejected(text):
+                raise OrderRejected(text)  # the server refused the order
+            if not (self.idempotency_keys or never_sent(text)):
+                raise OrderUnknown(self._unconfirmed(customer_id, text))
+            error = text
+        raise OrderFailed(error)
+
+    @staticmethod
+    def _unconfirmed(customer_id: str, reason: str) -> str:
+        return (
+            f"{reason}, and the server does not take idempotency keys: check list_orders for customer "
+            f"{customer_id} before placing it again (remove its key from the ledger to re-send it)"
+        )
+
+    def summary(self, seconds: float) -> dict:
+        """Per-status counts and throughput for the orders processed so far."""
+        with self._lock:
+            stats = dict(self.stats)
+        orders = sum(stats[status] for status in STATUSES)
+        return {
+            "orders": orders,
+            **stats,
+            "products_fetched": self.catalog.fetched,
+            "seconds": round(seconds, 3),
+            "orders_per_second": round(orders / seconds, 2) if seconds > 0 else None,
+            "created_per_second": round(stats["created"] / seconds, 2) if seconds > 0 else None,
+            "create_order_p50": self.latency.percentile("create_order", 50),
+            "create_order_p95": self.latency.percentile("create_order", 95),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Place orders in bulk from a CSV or JSONL file")
+    parser.add_argument("path", help="orders file (.csv, or JSON lines)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="input format (default: from the file extension)")
+    parser.add_argument("--results", help="per-order results, as JSON lines (default: <path>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY)
+    parser.add_argument("--max-attempts", type=int, default=BULK_MAX_ATTEMPTS)
+    parser.add_argument("--ledger", default=BULK_LEDGER, help="SQLite file of submitted idempotency keys")
+    parser.add_argument("--server-url", default=MCP_SERVER_URL)
+    args = parser.parse_args()
+
+    from src.mcp_client import MCPClient
+
+    ledger = OrderLedger(args.ledger)
+    importer = BulkOrderImporter(
+        MCPClient(server_url=args.server_url), ledger,
+        concurrency=args.concurrency, max_attempts=args.max_attempts
+    )
+    results_path = args.results or f"{args.path}.results.jsonl"
+    try:
+        with open(results_path, "w", encoding="utf-8") as results:
+            summary = importer.run(read_orders(args.path, args.format), results)
+    finally:
+        ledger.close()
+
+    p50, p95 = summary["create_order_p50"], summary["create_order_p95"]
+    print(
+        f"{summary['created']} created, {summary['duplicate']} already placed, {summary['rejected']} rejected, "
+        f"{summary['failed']} failed, {summary['unknown']} unknown (check list_orders) of {summary['orders']} orders in {summary['seconds']:.1f}s "
+        f"({summary['orders_per_second'] or 0:.1f} orders/s"
+        + (f"; create_order p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms" if p50 is not None else "")
+        + f"). Results: {results_path}"
+    )
+    sys.exit(1 if summary["failed"] or summary["rejected"] or summary["unknown"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+In-process cache for read-mostly MCP catalog tools
+Bounded by entry count and byte size, evicted in LRU order.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from src.config import CACHE_TTLS, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES
+
+# Tools whose success changes catalog data (e.g. stock levels)
+INVALIDATED_BY = {
+    "create_order": ("list_products", "get_product", "search_products"),
+}
+
+
+def cache_key(tool_name: str, arguments: Optional[dict]) -> str:
+    """Canonical key for a tool call: name plus sorted JSON arguments."""
+    return f"{tool_name}:{json.dumps(arguments or {}, sort_keys=True, separators=(',', ':'))}"
+
+
+class ToolCache:
+    """Thread-safe TTL + LRU cache of MCP tool result texts.
+
+    Only tools listed in `ttls` are ever cached, so customer- and
+    order-scoped tools (get_customer, verify_customer_pin, get_order, ...)
+    always go to the server. Expired entries stay until evicted so they
+    can be served by `get_stale()` while the server is unavailable.
+    `max_age`, when set, caps every TTL (the notification listener sets
+    it while it cannot receive invalidations).
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[dict] = None,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES
+    ):
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (tool_name, value, expires_at, size, stored_at)
+        self._bytes = 0
+        self.max_age: Optional[float] = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0, "stale_hits": 0}
+
+    def is_cacheable(self, tool_name: str) -> bool:
+        return self.ttls.get(tool_name, 0) > 0
+
+    def get(self, tool_name: str, arguments: Optional[dict]) -> Optional[str]:
+        """Return the cached result, or None on a miss or expired entry."""
+        if not self.is_cacheable(tool_name):
+            return None
+        key = cache_key(tool_name, arguments)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            now = time.monotonic()
+            if entry[2] <= now or (self.max_age is not None and entry[4] + self.max_age <= now):
+                # Kept until evicted or replaced so get_stale() can still serve it
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def get_stale(self, tool_name: str, arguments: Optional[dict]) -> Optional[str]:
+        """Return the cached result even if it has expired (for outages)."""
+        if not self.is_cacheable(tool_name):
+            return None
+        key = cache_key(tool_name, arguments)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self.stats["stale_hits"] += 1
+            return entry[1]
+
+    def put(self, tool_name: str, arguments: Optional[dict], value: str):
+        """Store a successful result; errors and uncacheable tools are ignored."""
+        if not self.is_cacheable(tool_name) or value.startswith("Error"):
+            return
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        key = cache_key(tool_name, arguments)
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (tool_name, value, now + self.ttls[tool_name], size, now)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def invalidate(self, tool_name: Optional[str] = None):
+        """Drop all entries, or only those of one tool."""
+        with self._lock:
+            keys = [
+                key for key, entry in self._entries.items()
+                if tool_name is None or entry[0] == tool_name
+            ]
+            for key in keys:
+                self._remove(key)
+            self.stats["invalidations"] += len(keys)
+
+    def invalidate_call(self, tool_name: str, arguments: Optional[dict]):
+        """Drop the entry of one exact call, if cached."""
+        with self._lock:
+            key = cache_key(tool_name, arguments)
+            if key in self._entries:
+                self._remove(key)
+                self.stats["invalidations"] += 1
+
+    def invalidate_after(self, tool_name: str):
+        """Invalidate whatever a successful call of `tool_name` makes stale."""
+        for stale_tool in INVALIDATED_BY.get(tool_name, ()):
+            self.invalidate(stale_tool)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[3]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
@@ -0,0 +1,454 @@
+"""
+Record / replay cassettes for MCP and LLM traffic
+Records every MCPClient JSON-RPC call and OpenAI chat completion, with its
+timing, to a compact JSON-lines file (gzipped for *.gz paths); replays them
+offline so a recorded conversation runs deterministically, at recorded speed
+or as fast as possible, without the MCP server or OpenRouter.
+
+    cassette = Cassette("turns.jsonl.gz", mode="record")
+    engine = ChatEngine(cassette.wrap_mcp(MCPClient()), cassette.wrap_llm(OpenAI(...)))
+    ...
+    cassette.close()
+
+A cassette in "replay" mode wraps clients the same way (the LLM client may
+be None); `turns()` lists the recorded chat turns for bench/replay.py.
+
+Secrets are redacted before anything is written: `pin` / `password`
+arguments (as JSON fields or inside tool call argument strings), PINs typed
+in chat messages and email addresses are replaced by placeholders that
+still pass tool argument validation, and replays are matched on the
+redacted form.
+"""
+import atexit
+import gzip
+import json
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Optional
+
+from src.config import CASSETTE_MODE, CASSETTE_PATH, CASSETTE_SPEED
+from src.history import EMAIL_RE
+from src.model_router import should_fail_over
+from src.tracing import log, tracer
+
+CASSETTE_VERSION = 1
+
+# Placeholders for redacted values; the PIN one fits verify_customer_pin's
+# 4-digit pattern so replayed tool calls still validate
+SECRET_FIELDS = ("pin", "password")
+REDACTED_SECRET = "0000"
+REDACTED_EMAIL = "redacted@example.com"
+# A secret field inside JSON text, e.g. tool call arguments: group 1 is its value
+SECRET_JSON_RE = re.compile(r'"(?:%s)"\s*:\s*("(?:[^"\\]|\\.)*"|-?\d+)' % "|".join(SECRET_FIELDS), re.IGNORECASE)
+# A PIN typed in a chat message ("my PIN is 1234"): group 1 is the PIN
+PIN_TEXT_RE = re.compile(r"\bpin\b(?:\s*(?:is|:|=))?\s*(\d{4})\b", re.IGNORECASE)
+
+
+class CassetteError(Exception):
+    """A recorded LLM failure, raised again on replay."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _dump(value):
+    """JSON-safe form of API objects (pydantic models) inside requests and responses."""
+    return value.model_dump(exclude_none=True) if hasattr(value, "model_dump") else str(value)
+
+
+def _key(*parts) -> str:
+    return json.dumps(parts, sort_keys=True, separators=(",", ":"), default=_dump)
+
+
+def _secret_spans(text: str) -> list:
+    """(start, end, replacement) for each secret in `text`, in order."""
+    spans = []
+    for pattern, group, replacement in (
+        (SECRET_JSON_RE, 1, f'"{REDACTED_SECRET}"'), (PIN_TEXT_RE, 1, REDACTED_SECRET), (EMAIL_RE, 0, REDACTED_EMAIL)
+    ):
+        for m in pattern.finditer(text):
+            if not any(start < m.end(group) and m.start(group) < end for start, end, _ in spans):
+                spans.append((m.start(group), m.end(group), replacement))
+    return sorted(spans)
+
+
+def _redact_pieces(pieces: list) -> list:
+    """`pieces` with the secrets of their concatenation redacted, for text streamed in fragments.
+
+    A secret split across pieces is replaced in the piece where it starts
+    and removed from the rest, so the pieces still join up correctly.
+    """
+    spans = _secret_spans("".join(pieces))
+    if not spans:
+        return pieces
+    redacted, offset = [], 0
+    for piece in pieces:
+        end, pos, text = offset + len(piece), offset, ""
+        for start, stop, replacement in spans:
+            if stop <= pos or start >= end:
+                continue
+            text += piece[pos - offset:max(start, pos) - offset]
+            if start >= offset:
+                text += replacement
+            pos = min(stop, end)
+        redacted.append(text + piece[pos - offset:])
+        offset = end
+    return redacted
+
+
+def _redact(value):
+    """`value` (JSON-like) with secret fields and email addresses replaced by placeholders."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED_SECRET if str(key).lower() in SECRET_FIELDS and item is not None else _redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_redact(item) for item in value]
+    if isinstance(value, str):
+        return _redact_pieces([value])[0]
+    return value
+
+
+def _redact_stream(chunks: list) -> list:
+    """Redacted (offset, chunk) pairs; each choice's content and tool call arguments are redacted as a whole."""
+    streams = defaultdict(list)  # (choice, tool call or None) -> [(dict, key)] of its fragments
+    for _, chunk in chunks:
+        for choice in chunk.get("choices") or []:
+            delta = choice.get("delta") or {}
+            if isinstance(delta.get("content"), str):
+                streams[(choice.get("index"), None)].append((delta, "content"))
+            for call in delta.get("tool_calls") or []:
+                function = call.get("function") or {}
+                if isinstance(function.get("arguments"), str):
+                    streams[(choice.get("index"), call.get("index"))].append((function, "arguments"))
+    for places in streams.values():
+        for (container, key), text in zip(places, _redact_pieces([container[key] for container, key in places])):
+            container[key] = text
+    return [(offset, _redact(chunk)) for offset, chunk in chunks]
+
+
+def _field(message, name: str):
+    return message.get(name) if isinstance(message, dict) else getattr(message, name, None)
+
+
+def _open(path: str, mode: str):
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
+
+class Cassette:
+    """A recording of MCP and LLM calls, being written ("record") or played back ("replay").
+
+    MCP calls are recorded where MCPClient makes them (`_call` and
+    `_call_batch`), so what is stored is each call's final outcome after
+    retries and hedging, with its total time. On replay they are matched
+    by method and (redacted) parameters, first recorded first served for
+    repeats.
+    LLM calls are matched by the user message of their turn, in recorded
+    order; a failed attempt the model router recovered from is folded
+    into the time of the attempt that succeeded. `speed` scales the
+    recorded delays on replay: 1 is recorded speed, 0 no delay at all.
+    Calls with no recording are counted in `stats["misses"]` and answered
+    with an error (or raise KeyError with `strict`).
+    """
+
+    def __init__(self, path: str = CASSETTE_PATH, mode: str = "replay", speed: float = CASSETTE_SPEED, strict: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Cassette mode must be 'record' or 'replay', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.strict = strict
+        self.stats = {"mcp": 0, "llm": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._entries = []
+        self._mcp = defaultdict(deque)
+        self._llm = defaultdict(deque)
+        self._file = None
+        if mode == "record":
+            self._file = _open(path, "w")
+            self._file.write(json.dumps({"cassette": CASSETTE_VERSION, "recorded_at": time.time()}) + "\n")
+        else:
+            self._load()
+
+    def __enter__(self) -> "Cassette":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _load(self):
+        with _open(self.path, "r") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("cassette") != CASSETTE_VERSION:
+                raise ValueError(f"{self.path} is not a version {CASSETTE_VERSION} cassette")
+            for line in f:
+                entry = json.loads(line)
+                self._entries.append(entry)
+                if entry["kind"] == "llm":
+                    self._llm[entry["request"]["user"]].append(entry)
+                elif entry["kind"] == "mcp_batch":
+                    self._mcp[_key(entry["calls"])].append(entry)
+                else:
+                    self._mcp[_key(entry["method"], entry["params"])].append(entry)
+        log(f"Loaded cassette {self.path}", entries=len(self._entries))
+
+    def _write(self, entry: dict):
+        line = json.dumps(entry, separators=(",", ":"), default=_dump)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+                # Readable even if the process is killed mid-recording
+                self._file.flush()
+
+    def _elapsed(self) -> float:
+        return round(time.monotonic() - self._start, 6)
+
+    def _wait(self, seconds: float):
+        if self.speed > 0 and seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def _count(self, kind: str):
+        with self._lock:
+            self.stats[kind] += 1
+        tracer.count("cassette_calls", kind=kind, mode=self.mode)
+
+    def _miss(self, description: str):
+        with self._lock:
+            self.stats["misses"] += 1
+        tracer.count("cassette_misses")
+        if self.strict:
+            raise KeyError(f"No recorded response for {description}")
+        log(f"Cassette has no recorded response for {description}")
+
+    # MCP
+
+    def wrap_mcp(self, mcp_client):
+        """Route `mcp_client`'s JSON-RPC calls through the cassette; returns the client."""
+        call, call_batch = mcp_client._call, mcp_client._call_batch
+        mcp_client._call = lambda method, params=None: self._mcp_call(call, method, params)
+        mcp_client._call_batch = lambda calls: self._mcp_batch(call_batch, calls)
+        return mcp_client
+
+    def _mcp_call(self, call, method: str, params: Optional[dict]) -> dict:
+        redacted = _redact(params or {})
+        return self._mcp_exchange("mcp", _key(method, redacted), lambda: call(method, params), {
+            "method": method, "params": redacted,
+        }, f"{method} {json.dumps(redacted, default=_dump)[:200]}", {"error": "No recorded response (cassette replay)"})
+
+    def _mcp_batch(self, call_batch, calls: list) -> Optional[list]:
+        calls = [(method, params or {}) for method, params in calls]
+        redacted = [[method, _redact(params)] for method, params in calls]
+        return self._mcp_exchange("mcp_batch", _key(redacted), lambda: call_batch(calls), {
+            "calls": redacted,
+        }, f"a batch of {len(calls)} calls", None)
+
+    def _mcp_exchange(self, kind: str, key: str, send, request: dict, description: str, missing):
+        self._count("mcp")
+        if self.mode == "replay":
+            with self._lock:
+                entries = self._mcp.get(key)
+                entry = entries.popleft() if entries else None
+            if entry is None:
+                self._miss(description)
+                return missing
+            self._wait(entry["elapsed"])
+            return entry["response"]
+        start, t = time.monotonic(), self._elapsed()
+        response = send()
+        self._write({
+            "kind": kind, "t": t, "elapsed": round(time.monotonic() - start, 6),
+            **request, "response": _redact(response),
+        })
+        return response
+
+    # LLM
+
+    def wrap_llm(self, llm_client=None) -> "CassetteLLMClient":
+        """An OpenAI-client stand-in whose chat completions go through the cassette."""
+        return CassetteLLMClient(self, llm_client)
+
+    def _llm_request(self, kwargs: dict) -> dict:
+        messages = kwargs.get("messages") or []
+        last_user = max((i for i, m in enumerate(messages) if _field(m, "role") == "user"), default=-1)
+        request = {
+            "model": kwargs.get("model"),
+            "stream": bool(kwargs.get("stream")),
+            "user": (_field(messages[last_user], "content") or "") if last_user >= 0 else "",
+            "messages": len(messages),
+        }
+        if last_user == len(messages) - 1:
+            # First LLM call of a turn: keep what a replay needs to rerun the turn
+            request["history"] = [
+                {"role": _field(m, "role"), "content": _field(m, "content")}
+                for m in messages[:last_user]
+                if _field(m, "role") in ("user", "assistant") and _field(m, "content")
+            ]
+        return _redact(request)
+
+    def _llm_create(self, client, kwargs: dict):
+        self._count("llm")
+        request = self._llm_request(kwargs)
+        if self.mode == "replay":
+            return self._llm_replay(request)
+        if client is None:
+            raise RuntimeError("Recording LLM calls needs a real client")
+        start, t = time.monotonic(), self._elapsed()
+        entry = {"kind": "llm", "t": t, "request": request}
+        try:
+            response = client.chat.completions.create(**kwargs)
+        except Exception as e:
+            entry.update(elapsed=round(time.monotonic() - start, 6), error={
+                "type": type(e).__name__, "message": _redact(str(e)),
+                "status_code": getattr(e, "status_code", None), "recovered": should_fail_over(e),
+            })
+            self._write(entry)
+            raise
+        if request["stream"]:
+            return self._record_stream(response, entry, start)
+        entry.update(elapsed=round(time.monotonic() - start, 6), response=_redact(response.model_dump(exclude_none=True)))
+        self._write(entry)
+        return response
+
+    def _record_stream(self, stream, entry: dict, start: float):
+        chunks = []
+        try:
+            for chunk in stream:
+                chunks.append((round(time.monotonic() - start, 6), chunk.model_dump(exclude_none=True)))
+                yield chunk
+        finally:
+            entry.update(elapsed=round(time.monotonic() - start, 6), chunks=_redact_stream(chunks))
+            self._write(entry)
+
+    def _llm_replay(self, request: dict):
+        from openai.types.chat import ChatCompletion
+
+        with self._lock:
+            entries = self._llm.get(request["user"])
+            entry = entries.popleft() if entries else None
+            waited = 0.0
+            # Attempts that failed over to another model: only their time is replayed
+            while entry is not None and entry.get("error", {}).get("recovered") and entries:
+                waited += entry["elapsed"]
+                entry = entries.popleft()
+        if entry is None:
+            self._miss(f"an LLM call for {request['user'][:80]!r}")
+            raise CassetteError("No recorded LLM response (cassette replay)")
+        if "error" in entry:
+            self._wait(waited + entry["elapsed"])
+            raise CassetteError(entry["error"]["message"], entry["error"].get("status_code"))
+        if "chunks" in entry:
+            return self._replay_stream(entry, waited)
+        self._wait(waited + entry["elapsed"])
+        return ChatCompletion.model_validate(entry["response"])
+
+    def _replay_stream(self, entry: dict, waited: float):
+        from openai.types.chat import ChatCompletionChunk
+
+        self._wait(waited)
+        previous = 0.0
+        for offset, chunk in entry["chunks"]:
+            self._wait(offset - previous)
+            previous = offset
+            yield ChatCompletionChunk.model_validate(chunk)
+
+    # Replay
+
+    def turns(self) -> list:
+        """Recorded chat turns that reached the LLM, in the order they started.
+
+        Each is {"user_message", "chat_history", "reply" (the recorded
+        answer, None if the turn failed), "t" (seconds into the recording),
+        "seconds" (from the start of its first LLM call to the end of its
+        last)}.
+        """
+        turns, open_turns = [], {}
+        for entry in sorted(self._entries, key=lambda e: e["t"]):
+            if entry["kind"] != "llm":
+                continue
+            request = entry["request"]
+            turn = open_turns.get(request["user"])
+            # A new turn, unless this call is the router retrying a failed first call on another model
+            if "history" in request and not (turn and turn["retrying"]):
+                turn = open_turns[request["user"]] = {
+                    "user_message": request["user"], "chat_history": request["history"], "t": entry["t"], "end": entry["t"]
+                }
+                turns.append(turn)
+            if turn is None:
+                continue
+            turn["end"] = max(turn["end"], entry["t"] + entry["elapsed"])
+            turn["retrying"] = bool(entry.get("error", {}).get("recovered"))
+            turn["reply"] = _reply_text(entry)
+        return [
+            {
+                "user_message": turn["user_message"], "chat_history": turn["chat_history"], "reply": turn["reply"],
+                "t": turn["t"], "seconds": round(turn["end"] - turn["t"], 6),
+            }
+            for turn in turns
+        ]
+
+
+def _reply_text(entry: dict) -> Optional[str]:
+    """The assistant text of a recorded completion (None for errors)."""
+    if "error" in entry:
+        return None
+    if "chunks" in entry:
+        return "".join(
+            choice.get("delta", {}).get("content") or ""
+            for _, chunk in entry["chunks"] for choice in chunk.get("choices", [])[:1]
+        )
+    choices = entry["response"].get("choices") or [{}]
+    return choices[0].get("message", {}).get("content")
+
+
+class _Completions:
+    def __init__(self, cassette: Cassette, client):
+        self._cassette = cassette
+        self._client = client
+
+    def create(self, **kwargs):
+        return self._cassette._llm_create(self._client, kwargs)
+
+
+class _Chat:
+    def __init__(self, completions: _Completions):
+        self.completions = completions
+
+
+class CassetteLLMClient:
+    """The part of the OpenAI client the engines use (`chat.completions.create`, `with_options`)."""
+
+    def __init__(self, cassette: Cassette, client=None):
+        self.cassette = cassette
+        self.client = client
+        self.chat = _Chat(_Completions(cassette, client))
+
+    def with_options(self, **options) -> "CassetteLLMClient":
+        client = self.client.with_options(**options) if self.client is not None else None
+        return CassetteLLMClient(self.cassette, client)
+
+
+_configured = None
+_configured_lock = threading.Lock()
+
+
+def configured_cassette() -> Optional[Cassette]:
+    """The process-wide cassette named by CASSETTE_MODE / CASSETTE_PATH, or None if off."""
+    global _configured
+    if not CASSETTE_MODE:
+        return None
+    with _configured_lock:
+        if _configured is None:
+            _configured = Cassette(CASSETTE_PATH, CASSETTE_MODE)
+            atexit.register(_configured.close)
+        return _configured
@@ -0,0 +1,134 @@
+"""
+Tool result compaction
+Shrinks MCP results before they are added to the LLM conversation.
+"""
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from src.config import COMPACT_MAX_ROWS, COMPACT_MAX_CHARS, RESULT_STORE_SIZE
+
+PRODUCT_FIELDS = ("sku", "name", "category", "price", "unit_price", "currency", "stock", "stock_quantity", "is_active")
+ORDER_FIELDS = ("id", "order_id", "customer_id", "status", "total", "total_amount", "currency", "created_at", "item_count")
+
+# Fields the model needs from each row of a list-style result
+TOOL_FIELDS = {
+    "list_products": PRODUCT_FIELDS,
+    "search_products": PRODUCT_FIELDS,
+    "list_orders": ORDER_FIELDS,
+}
+
+# Keys under which servers commonly wrap the rows of a list tool's result.
+# Only list tools are cut by rows: a get_order result's "items" are the
+# order's line items, and are never truncated as if they were a page.
+LIST_KEYS = ("products", "orders", "items", "results", "data")
+
+FULL_RESULT_TOOL = "get_full_tool_result"
+
+
+def _find_rows(data):
+    """Return (rows, wrapper_key) for a list result, or (None, None)."""
+    if isinstance(data, list):
+        return data, None
+    if isinstance(data, dict):
+        for key in LIST_KEYS:
+            if isinstance(data.get(key), list):
+                return data[key], key
+    return None, None
+
+
+def _project(row, fields: tuple):
+    if not isinstance(row, dict):
+        return row
+    projected = {key: row[key] for key in fields if key in row}
+    return projected or row
+
+
+class ResultStore:
+    """Full tool payloads kept on the side, per chat session.
+
+    Bounded to the `size` most recent results. The model can fetch a
+    stored payload with the local get_full_tool_result tool.
+    """
+
+    def __init__(self, size: int = RESULT_STORE_SIZE):
+        self.size = size
+        self._results = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def put(self, text: str, tool_name: Optional[str] = None) -> str:
+        with self._lock:
+            self._next_id += 1
+            result_id = f"r{self._next_id}"
+            self._results[result_id] = (tool_name, text)
+            while len(self._results) > self.size:
+                self._results.popitem(last=False)
+            return result_id
+
+    def get(self, result_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self._results.get(result_id)
+        return entry[1] if entry is not None else None
+
+    def read(self, result_id: str, offset: int = 0) -> str:
+        """Rows of a stored list result from `offset`, at most COMPACT_MAX_ROWS; other text from character `offset`."""
+        with self._lock:
+            tool_name, text = self._results.get(result_id, (None, None))
+        if text is None:
+            return f"Error: no stored result with id {result_id}"
+        try:
+            rows, _ = _find_rows(json.loads(text)) if tool_name in TOOL_FIELDS else (None, None)
+        except ValueError:
+            rows = None
+        if rows is None:
+            return text[offset:offset + COMPACT_MAX_CHARS]
+        page = rows[offset:offset + COMPACT_MAX_ROWS]
+        remaining = len(rows) - offset - len(page)
+        body = {"rows": page, "offset": offset}
+        if remaining > 0:
+            body["note"] = f"{remaining} more omitted; call {FULL_RESULT_TOOL} with offset={offset + len(page)}"
+        return json.dumps(body, separators=(",", ":"))
+
+
+def compact_tool_result(tool_name: str, text: str, store: Optional[ResultStore] = None) -> str:
+    """Project and cap a tool result for the LLM.
+
+    Results of the list tools (TOOL_FIELDS) keep only those fields and at
+    most COMPACT_MAX_ROWS rows; anything else is cut at COMPACT_MAX_CHARS. If
+    anything was dropped and a `store` is given, the full payload is kept
+    there and the marker tells the model how to fetch it.
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        data = None
+
+    rows, wrapper_key = _find_rows(data) if tool_name in TOOL_FIELDS else (None, None)
+    if rows is None:
+        if data is not None:
+            text = json.dumps(data, separators=(",", ":"))
+        if len(text) <= COMPACT_MAX_CHARS:
+            return text
+        omitted = f"[{len(text) - COMPACT_MAX_CHARS} more characters omitted{_fetch_hint(tool_name, text, store)}]"
+        return text[:COMPACT_MAX_CHARS] + omitted
+
+    fields = TOOL_FIELDS.get(tool_name)
+    compacted = [_project(row, fields) if fields else row for row in rows[:COMPACT_MAX_ROWS]]
+    omitted = len(rows) - len(compacted)
+    if omitted > 0 or (fields and compacted != rows):
+        note = f"{omitted} more omitted" if omitted > 0 else "some fields omitted"
+        compacted.append({"note": note + _fetch_hint(tool_name, text, store)})
+
+    if wrapper_key is not None:
+        data = dict(data)
+        data[wrapper_key] = compacted
+        return json.dumps(data, separators=(",", ":"))
+    return json.dumps(compacted, separators=(",", ":"))
+
+
+def _fetch_hint(tool_name: str, text: str, store: Optional[ResultStore]) -> str:
+    if store is None:
+        return ""
+    return f"; full result available via {FULL_RESULT_TOOL} with result_id={store.put(text, tool_name)}"
@@ -12,7 +12,20 @@ load_dotenv(dotenv_path=env_path)
 # API Configuration
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
-MODEL_NAME = "google/gemini-2.0-flash-001"
+MODEL_NAME = os.environ.get("MODEL_NAME", "google/gemini-2.0-flash-001")
+
+# Model routing: MODEL_NAME is the default; MODEL_ROUTES sends an LLM call to
+# another model by the first matching rule - write (an order is being placed),
+# long (more than MODEL_LONG_HISTORY messages), chat (small talk), followup
+# (answering from tool results) - e.g. "write=openai/gpt-4o,chat=google/gemini-2.0-flash-lite-001".
+# MODEL_FALLBACKS (comma-separated) are tried when a model errors or sends no
+# first byte within MODEL_TTFB_DEADLINE seconds.
+MODEL_ROUTES = os.environ.get("MODEL_ROUTES", "")
+MODEL_FALLBACKS = [model.strip() for model in os.environ.get("MODEL_FALLBACKS", "").split(",") if model.strip()]
+MODEL_TTFB_DEADLINE = float(os.environ.get("MODEL_TTFB_DEADLINE", "8"))
+MODEL_LONG_HISTORY = int(os.environ.get("MODEL_LONG_HISTORY", "30"))
+# Stream tokens into the chat as they are generated
+STREAM_RESPONSES = os.environ.get("STREAM_RESPONSES", "true").lower() in ("1", "true", "yes")
 
 # MCP Server Configuration
 MCP_SERVER_URL = os.environ.get(
@@ -25,6 +38,136 @@ MCP_HEADERS = {
 }
 MCP_TIMEOUT = 15
 
+# Connect and read timeouts in seconds. A dead host fails in MCP_CONNECT_TIMEOUT
+# instead of holding the turn for the full read timeout.
+MCP_CONNECT_TIMEOUT = float(os.environ.get("MCP_CONNECT_TIMEOUT", "3"))
+MCP_READ_TIMEOUT = float(os.environ.get("MCP_READ_TIMEOUT", str(MCP_TIMEOUT)))
+
+# Resilience: retries with jittered exponential backoff (read tools only),
+# hedged duplicate reads once a call passes its p95 latency, and a circuit
+# breaker that fails fast (serving stale cache) after repeated failures
+MCP_RETRY_ATTEMPTS = int(os.environ.get("MCP_RETRY_ATTEMPTS", "3"))
+MCP_RETRY_BASE_DELAY = float(os.environ.get("MCP_RETRY_BASE_DELAY", "0.2"))
+MCP_RETRY_MAX_DELAY = float(os.environ.get("MCP_RETRY_MAX_DELAY", "2.0"))
+MCP_HEDGE_ENABLED = os.environ.get("MCP_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+MCP_HEDGE_MIN_DELAY = float(os.environ.get("MCP_HEDGE_MIN_DELAY", "0.05"))
+MCP_HEDGE_MIN_SAMPLES = int(os.environ.get("MCP_HEDGE_MIN_SAMPLES", "20"))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", "30"))
+# Concurrent identical reads (any session) share one in-flight request
+MCP_COALESCE_ENABLED = os.environ.get("MCP_COALESCE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Connection pooling: keep-alive connections kept per MCP host, optional HTTP/2
+MCP_POOL_SIZE = int(os.environ.get("MCP_POOL_SIZE", "10"))
+MCP_HTTP2 = os.environ.get("MCP_HTTP2", "").lower() in ("1", "true", "yes")
+
+# Large list results (iter_orders / iter_products): records fetched per page
+# (limit/offset), and bytes read from the response body at a time
+LIST_PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", "100"))
+MCP_STREAM_CHUNK_BYTES = int(os.environ.get("MCP_STREAM_CHUNK_BYTES", "65536"))
+
+# Max tool calls executed concurrently within one LLM iteration
+TOOL_CONCURRENCY = int(os.environ.get("TOOL_CONCURRENCY", "4"))
+
+# Catalog cache: TTL in seconds per tool (0 disables). Only catalog tools
+# belong here - customer and order data is never cached.
+CACHE_TTLS = {
+    "list_products": int(os.environ.get("CACHE_TTL_LIST_PRODUCTS", "300")),
+    "get_product": int(os.environ.get("CACHE_TTL_GET_PRODUCT", "120")),
+    "search_products": int(os.environ.get("CACHE_TTL_SEARCH_PRODUCTS", "300")),
+}
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "500"))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Push invalidation: subscribe to the MCP server's SSE notification stream and
+# drop cached catalog data as changes arrive, so the TTLs above can be long.
+# While the stream is down cached results live at most NOTIFY_FALLBACK_MAX_AGE seconds.
+MCP_NOTIFICATIONS_ENABLED = os.environ.get("MCP_NOTIFICATIONS_ENABLED", "").lower() in ("1", "true", "yes")
+MCP_NOTIFICATIONS_URL = os.environ.get("MCP_NOTIFICATIONS_URL", "")
+NOTIFY_FALLBACK_MAX_AGE = float(os.environ.get("NOTIFY_FALLBACK_MAX_AGE", "60"))
+# Seconds to wait before refreshing the search index after a catalog change (bursts refresh once)
+NOTIFY_REFRESH_DELAY = float(os.environ.get("NOTIFY_REFRESH_DELAY", "1.0"))
+# Reconnect if the stream is silent (not even keep-alives) for this long
+NOTIFY_IDLE_TIMEOUT = float(os.environ.get("NOTIFY_IDLE_TIMEOUT", "90"))
+
+# Local search index: answer search_products from an in-memory BM25 index
+# built from the list_products catalog, refreshed every N seconds
+SEARCH_INDEX_ENABLED = os.environ.get("SEARCH_INDEX_ENABLED", "").lower() in ("1", "true", "yes")
+SEARCH_INDEX_REFRESH = int(os.environ.get("SEARCH_INDEX_REFRESH", "300"))
+SEARCH_INDEX_LIMIT = 10
+
+# Conversation history sent to the LLM: approximate token budget, number of
+# recent turns kept verbatim, and summary lines kept for older turns
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "4000"))
+HISTORY_KEEP_TURNS = int(os.environ.get("HISTORY_KEEP_TURNS", "6"))
+HISTORY_SUMMARY_LINES = int(os.environ.get("HISTORY_SUMMARY_LINES", "20"))
+
+# Tool result compaction: rows and characters of a tool result sent to the
+# LLM, and how many full results each session keeps for follow-ups
+COMPACT_MAX_ROWS = int(os.environ.get("COMPACT_MAX_ROWS", "20"))
+COMPACT_MAX_CHARS = int(os.environ.get("COMPACT_MAX_CHARS", "4000"))
+RESULT_STORE_SIZE = int(os.environ.get("RESULT_STORE_SIZE", "20"))
+
+# Fast path for bare SKU / order-ID lookups. Mode "llm" pre-runs the tool and
+# lets one LLM call phrase the answer; "template" answers without the LLM.
+FAST_PATH_ENABLED = os.environ.get("FAST_PATH_ENABLED", "true").lower() in ("1", "true", "yes")
+FAST_PATH_THRESHOLD = float(os.environ.get("FAST_PATH_THRESHOLD", "0.8"))
+FAST_PATH_MODE = os.environ.get("FAST_PATH_MODE", "llm")
+
+# Speculative prefetch: order / product / customer-order lookups started from
+# the user message before the LLM asks for them, at most N per turn
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+PREFETCH_MAX_CALLS = int(os.environ.get("PREFETCH_MAX_CALLS", "3"))
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", "4"))
+
+# Verified-customer context: after a successful verify_customer_pin the profile
+# and N most recent orders are loaded and kept in the prompt for this many seconds
+VERIFIED_SESSION_TTL = float(os.environ.get("VERIFIED_SESSION_TTL", "1800"))
+CUSTOMER_RECENT_ORDERS = int(os.environ.get("CUSTOMER_RECENT_ORDERS", "5"))
+
+# Conversation store: "sqlite:///conversations.db" (default), "memory://".
+# Only the last STORE_HOT_TURNS turns (keep above HISTORY_KEEP_TURNS) of
+# STORE_HOT_SESSIONS recently used sessions are kept in memory; sessions idle for SESSION_IDLE_TIMEOUT
+# seconds are deleted.
+CONVERSATION_STORE = os.environ.get("CONVERSATION_STORE", "sqlite:///conversations.db")
+STORE_HOT_TURNS = int(os.environ.get("STORE_HOT_TURNS", "20"))
+STORE_HOT_SESSIONS = int(os.environ.get("STORE_HOT_SESSIONS", "200"))
+SESSION_IDLE_TIMEOUT = int(os.environ.get("SESSION_IDLE_TIMEOUT", str(24 * 3600)))
+
+# Chat transcript in the Streamlit UI: older turns are shown as collapsed
+# pages of N turns ("Show earlier messages" adds a page); rendered turns are cached
+TRANSCRIPT_PAGE_TURNS = int(os.environ.get("TRANSCRIPT_PAGE_TURNS", "10"))
+TRANSCRIPT_CACHE_TURNS = int(os.environ.get("TRANSCRIPT_CACHE_TURNS", "5000"))
+
+# Fast cold start: import heavy libraries and build the LLM client on first use;
+# warm-up builds them (and opens the MCP connection) in the background at startup
+FAST_STARTUP = os.environ.get("FAST_STARTUP", "true").lower() in ("1", "true", "yes")
+STARTUP_WARM_UP = os.environ.get("STARTUP_WARM_UP", "true").lower() in ("1", "true", "yes")
+
+# Headless API server (python -m src.server)
+SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", "8080"))
+
+# Cassettes: CASSETTE_MODE=record writes every MCP call and LLM completion (with
+# timings) to CASSETTE_PATH; CASSETTE_MODE=replay answers them from it instead,
+# with recorded delays scaled by 1 / CASSETTE_SPEED (0 = no delays)
+CASSETTE_MODE = os.environ.get("CASSETTE_MODE", "").lower()
+CASSETTE_PATH = os.environ.get("CASSETTE_PATH", "cassette.jsonl.gz")
+CASSETTE_SPEED = float(os.environ.get("CASSETTE_SPEED", "1"))
+
+# Bulk order import (python -m src.bulk_orders): create_order calls in flight at
+# once, attempts per order, and the SQLite ledger of idempotency keys already submitted
+BULK_CONCURRENCY = int(os.environ.get("BULK_CONCURRENCY", "8"))
+BULK_MAX_ATTEMPTS = int(os.environ.get("BULK_MAX_ATTEMPTS", "3"))
+BULK_LEDGER = os.environ.get("BULK_LEDGER", "bulk_orders.db")
+
+# Tracing and metrics: OTLP-style JSON-lines span file (empty disables),
+# Prometheus /metrics port (0 disables), buffered sink size, log preview size
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+TRACE_QUEUE_SIZE = int(os.environ.get("TRACE_QUEUE_SIZE", "10000"))
+LOG_PREVIEW_CHARS = int(os.environ.get("LOG_PREVIEW_CHARS", "200"))
+
 # System Prompt
 SYSTEM_PROMPT = """You are a helpful customer support assistant for TechGear Pro, a company that sells computer products including monitors, printers, accessories, and networking equipment.
 
@@ -0,0 +1,345 @@
+"""
+Conversation store
+Persists chat turns (including tool calls and results) and keeps only a
+bounded window of recent turns in memory.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+from src.config import CONVERSATION_STORE, STORE_HOT_TURNS, STORE_HOT_SESSIONS
+
+# Message fields worth persisting; everything else in an API message is dropped
+MESSAGE_FIELDS = ("role", "content", "tool_calls", "tool_call_id", "name")
+# Encoded messages larger than this are zlib-compressed
+COMPRESS_THRESHOLD = 512
+
+
+def encode_message(message: dict) -> tuple:
+    """(codec, bytes) for a message: compact JSON, zlib-compressed when that pays off."""
+    data = json.dumps(
+        {key: message[key] for key in MESSAGE_FIELDS if message.get(key) is not None},
+        separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+    if len(data) > COMPRESS_THRESHOLD:
+        packed = zlib.compress(data, 6)
+        if len(packed) < len(data):
+            return 1, packed
+    return 0, data
+
+
+def decode_message(codec: int, data: bytes) -> dict:
+    return json.loads(zlib.decompress(data) if codec == 1 else data)
+
+
+def chat_messages(messages: list) -> list:
+    """Only the user / assistant text messages - what the UI shows and the LLM history uses."""
+    return [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in messages
+        if msg["role"] in ("user", "assistant") and msg.get("content")
+    ]
+
+
+class ConversationStore:
+    """Base class for conversation persistence.
+
+    Every message belongs to a turn: a user message and everything that
+    answered it (tool calls, tool results, the reply), numbered from 0 per
+    session. The last `hot_turns` turns of up to `hot_sessions` recently
+    used sessions are kept in memory; older turns are read from the
+    backend on demand. Subclasses implement the underscore methods.
+    """
+
+    def __init__(self, hot_turns: int = STORE_HOT_TURNS, hot_sessions: int = STORE_HOT_SESSIONS):
+        self.hot_turns = hot_turns
+        self.hot_sessions = hot_sessions
+        self._hot = OrderedDict()  # session id -> list of turns (lists of messages)
+        self._lock = threading.RLock()
+
+    def create_session(self) -> str:
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._create(session_id, time.time())
+        return session_id
+
+    def has_session(self, session_id: str) -> bool:
+        with self._lock:
+            return self._session_info(session_id) is not None
+
+    def append(self, session_id: str, messages: list):
+        """Persist messages in order; each user message starts a new turn."""
+        with self._lock:
+            info = self._session_info(session_id)
+            if info is None:
+                self._create(session_id, time.time())
+                turns, seq = 0, 0
+            else:
+                turns, seq = info
+            rows = []
+            for message in messages:
+                if message["role"] == "user" or turns == 0:
+                    turns += 1
+                codec, data = encode_message(message)
+                rows.append((seq, turns - 1, codec, data))
+                seq += 1
+            self._insert(session_id, rows, turns, seq, time.time())
+
+            hot = self._hot.get(session_id)
+            if hot is not None:
+                for _, turn, codec, data in rows:
+                    message = decode_message(codec, data)
+                    if hot and hot[-1][0] == turn:
+                        hot[-1][1].append(message)
+                    else:
+                        hot.append((turn, [message]))
+                del hot[:-self.hot_turns]
+                self._hot.move_to_end(session_id)
+
+    def recent(self, session_id: str) -> tuple:
+        """(number of the first hot turn, messages of the hot window)."""
+        with self._lock:
+            hot = self._hot.get(session_id)
+            if hot is None:
+                info = self._session_info(session_id)
+                turns = info[0] if info else 0
+                first = max(0, turns - self.hot_turns)
+                hot = self._group(self._select(session_id, first, turns))
+                self._hot[session_id] = hot
+                while len(self._hot) > self.hot_sessions:
+                    self._hot.popitem(last=False)
+            self._hot.move_to_end(session_id)
+            first_turn = hot[0][0] if hot else 0
+            return first_turn, [msg for _, turn in hot for msg in turn]
+
+    def load_turns(self, session_id: str, before_turn: int, count: int) -> list:
+        """Messages of up to `count` turns before `before_turn`, oldest first (not cached)."""
+        with self._lock:
+            return [message for _, message in self._select(session_id, max(0, before_turn - count), before_turn)]
+
+    def turn_count(self, session_id: str) -> int:
+        with self._lock:
+            info = self._session_info(session_id)
+            return info[0] if info else 0
+
+    def get_state(self, session_id: str) -> dict:
+        """Small JSON state kept with the session (e.g. the history summary)."""
+        with self._lock:
+            return self._get_state(session_id) or {}
+
+    def set_state(self, session_id: str, state: dict):
+        with self._lock:
+            self._set_state(session_id, state)
+
+    def delete_session(self, session_id: str):
+        with self._lock:
+            self._hot.pop(session_id, None)
+            self._delete([session_id])
+
+    def expire_idle(self, max_idle: float) -> list:
+        """Delete sessions idle for more than `max_idle` seconds; returns their ids."""
+        with self._lock:
+            expired = self._idle_sessions(time.time() - max_idle)
+            for session_id in expired:
+                self._hot.pop(session_id, None)
+            if expired:
+                self._delete(expired)
+            return expired
+
+    def start_background_expiry(self, max_idle: float, interval: float = 60) -> threading.Thread:
+        """Call expire_idle() every `interval` seconds from a daemon thread."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.expire_idle(max_idle)
+                except Exception:
+                    pass
+
+        thread = threading.Thread(target=run, name="conversation-expiry", daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def _group(rows: list) -> list:
+        """[(turn, message)] -> [(turn, [messages])]."""
+        grouped = []
+        for turn, message in rows:
+            if grouped and grouped[-1][0] == turn:
+                grouped[-1][1].append(message)
+            else:
+                grouped.append((turn, [message]))
+        return grouped
+
+    def close(self):
+        pass
+
+    # Backend primitives
+    def _create(self, session_id: str, now: float):
+        raise NotImplementedError
+
+    def _session_info(self, session_id: str) -> Optional[tuple]:
+        """(turn count, message count), or None for an unknown session."""
+        raise NotImplementedError
+
+    def _insert(self, session_id: str, rows: list, turns: int, messages: int, now: float):
+        raise NotImplementedError
+
+    def _select(self, session_id: str, first_turn: int, end_turn: int) -> list:
+        """[(turn, message)] for turns in [first_turn, end_turn), in order."""
+        raise NotImplementedError
+
+    def _get_state(self, session_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def _set_state(self, session_id: str, state: dict):
+        raise NotImplementedError
+
+    def _idle_sessions(self, cutoff: float) -> list:
+        raise NotImplementedError
+
+    def _delete(self, session_ids: list):
+        raise NotImplementedError
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Default store: one SQLite file (or ":memory:"), safe to share between threads."""
+
+    def __init__(self, path: str = "conversations.db", **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                last_active REAL NOT NULL,
+                turns INTEGER NOT NULL DEFAULT 0,
+                messages INTEGER NOT NULL DEFAULT 0,
+                state TEXT
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions (last_active);
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                turn INTEGER NOT NULL,
+                codec INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS messages_turn ON messages (session_id, turn);
+        """)
+
+    def _create(self, session_id, now):
+        self._db.execute(
+            "INSERT OR IGNORE INTO sessions (id, created_at, last_active) VALUES (?, ?, ?)",
+            (session_id, now, now)
+        )
+
+    def _session_info(self, session_id):
+        return self._db.execute("SELECT turns, messages FROM sessions WHERE id = ?", (session_id,)).fetchone()
+
+    def _insert(self, session_id, rows, turns, messages, now):
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO messages (session_id, seq, turn, codec, body) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, seq, turn, codec, data) for seq, turn, codec, data in rows]
+            )
+            self._db.execute(
+                "UPDATE sessions SET turns = ?, messages = ?, last_active = ? WHERE id = ?",
+                (turns, messages, now, session_id)
+            )
+
+    def _select(self, session_id, first_turn, end_turn):
+        rows = self._db.execute(
+            "SELECT turn, codec, body FROM messages WHERE session_id = ? AND turn >= ? AND turn < ? ORDER BY seq",
+            (session_id, first_turn, end_turn)
+        )
+        return [(turn, decode_message(codec, body)) for turn, codec, body in rows]
+
+    def _get_state(self, session_id):
+        row = self._db.execute("SELECT state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def _set_state(self, session_id, state):
+        self._db.execute(
+            "UPDATE sessions SET state = ? WHERE id = ?",
+            (json.dumps(state, separators=(",", ":")), session_id)
+        )
+
+    def _idle_sessions(self, cutoff):
+        return [row[0] for row in self._db.execute("SELECT id FROM sessions WHERE last_active < ?", (cutoff,))]
+
+    def _delete(self, session_ids):
+        with self._db:
+            self._db.execute("BEGIN")
+            for session_id in session_ids:
+                self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def close(self):
+        self._db.close()
+
+
+class MemoryConversationStore(ConversationStore):
+    """Non-persistent store (tests, throwaway deployments). Messages are still kept encoded."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions = {}  # id -> {"turns", "messages", "last_active", "state", "rows"}
+
+    def _create(self, session_id, now):
+        self._sessions.setdefault(session_id, {"turns": 0, "messages": 0, "last_active": now, "state": None, "rows": []})
+
+    def _session_info(self, session_id):
+        session = self._sessions.get(session_id)
+        return (session["turns"], session["messages"]) if session else None
+
+    def _insert(self, session_id, rows, turns, messages, now):
+        session = self._sessions[session_id]
+        session["rows"].extend((turn, codec, data) for _, turn, codec, data in rows)
+        session.update(turns=turns, messages=messages, last_active=now)
+
+    def _select(self, session_id, first_turn, end_turn):
+        session = self._sessions.get(session_id)
+        if session is None:
+            return []
+        return [
+            (turn, decode_message(codec, data))
+            for turn, codec, data in session["rows"]
+            if first_turn <= turn < end_turn
+        ]
+
+    def _get_state(self, session_id):
+        session = self._sessions.get(session_id)
+        return session["state"] if session else None
+
+    def _set_state(self, session_id, state):
+        if session_id in self._sessions:
+            self._sessions[session_id]["state"] = state
+
+    def _idle_sessions(self, cutoff):
+        return [session_id for session_id, session in self._sessions.items() if session["last_active"] < cutoff]
+
+    def _delete(self, session_ids):
+        for session_id in session_ids:
+            self._sessions.pop(session_id, None)
+
+
+def open_store(url: str = CONVERSATION_STORE) -> ConversationStore:
+    """Store for a URL: "sqlite:///path/to/file.db", "sqlite://:memory:" or "memory://"."""
+    if url.startswith("memory://"):
+        return MemoryConversationStore()
+    if url.startswith("sqlite://"):
+        path = url[len("sqlite://"):]
+        return SQLiteConversationStore(path[1:] if path.startswith("/") else path)
+    raise ValueError(f"Unsupported conversation store: {url}")
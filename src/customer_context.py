@@ -0,0 +1,120 @@
+"""
+Verified-customer session context
+Remembers, per chat session, which customer passed verify_customer_pin and
+until when, with a compact snapshot of their profile and recent orders that
+is put in the prompt so later turns don't re-verify or re-fetch it.
+"""
+import json
+import time
+from typing import Optional
+
+from src.config import VERIFIED_SESSION_TTL, CUSTOMER_RECENT_ORDERS
+
+# Profile fields never copied into the prompt
+HIDDEN_FIELDS = ("pin", "password", "pin_hash")
+ORDER_FIELDS = ("id", "status", "total", "currency", "created_at")
+
+
+def preload_calls(customer_id: str) -> list:
+    """The reads fetched, in one burst, when a customer is verified."""
+    return [("get_customer", {"customer_id": customer_id}), ("list_orders", {"customer_id": customer_id})]
+
+
+def _parse(result: Optional[str]):
+    try:
+        return json.loads(result or "")
+    except ValueError:
+        return None
+
+
+def _order_line(order: dict) -> str:
+    total = f"{order.get('total')} {order.get('currency') or ''}".strip() if order.get("total") is not None else ""
+    parts = [order.get("id"), order.get("status"), total, (order.get("created_at") or "")[:10]]
+    return " | ".join(str(part) for part in parts if part)
+
+
+class CustomerContext:
+    """Where one live chat session keeps its verified customer.
+
+    Owned by whatever holds the live session (Streamlit's session state,
+    the API server's ChatSession) and never read from the conversation
+    store: the app puts session ids in its URL, and knowing a session id
+    must not make anyone a verified customer.
+    """
+
+    def __init__(self):
+        self.customer: Optional["VerifiedCustomer"] = None
+
+
+class VerifiedCustomer:
+    """A customer verified in this session, valid until `expires_at`.
+
+    `profile` and `orders` are what get_customer and list_orders returned
+    at `loaded_at` (orders trimmed to the most recent few and to a few
+    fields). `summary()` is the system-prompt text.
+    """
+
+    def __init__(
+        self,
+        customer_id: str,
+        profile: Optional[dict] = None,
+        orders: Optional[list] = None,
+        verified_at: Optional[float] = None,
+        ttl: float = VERIFIED_SESSION_TTL,
+        loaded_at: Optional[float] = None
+    ):
+        self.customer_id = customer_id
+        self.profile = profile or {}
+        self.orders = orders or []
+        self.verified_at = time.time() if verified_at is None else verified_at
+        self.expires_at = self.verified_at + ttl
+        self.loaded_at = self.verified_at if loaded_at is None else loaded_at
+
+    @classmethod
+    def from_results(
+        cls, customer_id: str, profile_result: Optional[str], orders_result: Optional[str],
+        ttl: float = VERIFIED_SESSION_TTL, recent_orders: int = CUSTOMER_RECENT_ORDERS
+    ) -> "VerifiedCustomer":
+        """Build from get_customer / list_orders result texts (either may be an error)."""
+        profile = _parse(profile_result)
+        profile = {
+            key: value for key, value in profile.items()
+            if key not in HIDDEN_FIELDS and not isinstance(value, (dict, list))
+        } if isinstance(profile, dict) else {}
+        orders = _parse(orders_result)
+        if isinstance(orders, dict):
+            orders = next((value for value in orders.values() if isinstance(value, list)), None)
+        orders = [order for order in orders if isinstance(order, dict)] if isinstance(orders, list) else []
+        orders.sort(key=lambda order: str(order.get("created_at") or ""), reverse=True)
+        return cls(
+            customer_id,
+            profile=profile,
+            ttl=ttl,
+            orders=[{key: order[key] for key in ORDER_FIELDS if key in order} for order in orders[:recent_orders]]
+        )
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) >= self.expires_at
+
+    def add_order(self, result: str, recent_orders: int = CUSTOMER_RECENT_ORDERS):
+        """Record an order this customer just created (a create_order result)."""
+        order = _parse(result)
+        if isinstance(order, dict) and order.get("id") and order.get("customer_id") in (None, self.customer_id):
+            self.orders.insert(0, {key: order[key] for key in ORDER_FIELDS if key in order})
+            del self.orders[recent_orders:]
+
+    def summary(self) -> str:
+        valid_until = time.strftime("%H:%M UTC", time.gmtime(self.expires_at))
+        as_of = time.strftime("%H:%M UTC", time.gmtime(self.loaded_at))
+        lines = [
+            f"Verified customer (email and PIN checked; valid until {valid_until} - "
+            "do not ask them to verify again before then):",
+            f"- Customer ID: {self.customer_id}",
+        ]
+        lines += [f"- {key.replace('_', ' ').capitalize()}: {value}" for key, value in self.profile.items() if key != "id"]
+        if self.orders:
+            lines.append(f"Their most recent orders as of {as_of} (id | status | total | date; use get_order for items or current status):")
+            lines += [f"- {_order_line(order)}" for order in self.orders]
+        else:
+            lines.append(f"They had no orders as of {as_of}.")
+        return "\n".join(lines)
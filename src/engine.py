@@ -0,0 +1,736 @@
+"""
+Chat engine - the turn logic behind the Streamlit UI
+Runs the LLM tool-calling loop against the MCP server, with no UI dependency.
+"""
+import json
+import threading
+from typing import Optional
+
+from src.config import MODEL_NAME, SYSTEM_PROMPT, SEARCH_INDEX_LIMIT, FAST_PATH_MODE
+from src.compaction import FULL_RESULT_TOOL, ResultStore, compact_tool_result
+from src.conversation_store import ConversationStore, chat_messages
+from src.customer_context import CustomerContext, VerifiedCustomer, preload_calls
+from src.history import HistoryManager
+from src.model_router import ModelRouter
+from src.prefetch import Prefetcher, PrefetchTurn, verified_customer_id
+from src.router import FastPathRouter, Route, render_answer
+from src.search_index import ProductSearchIndex, parse_products
+from src.startup import resolve
+from src.steps import run_steps, stream_steps
+from src.tools import get_openai_tools
+from src.tracing import log, preview, tracer
+from src.validation import TOOL_VALIDATOR, ToolArgumentError, ToolValidator, decode_arguments
+
+
+def _optional(**kwargs) -> dict:
+    """Drop unset optional arguments, as the MCPClient helpers do."""
+    return {key: value for key, value in kwargs.items() if value is not None and value != ""}
+
+
+# Map LLM tool arguments onto the arguments sent to the MCP server
+TOOL_ARGUMENTS = {
+    "list_products": lambda args: _optional(
+        category=args.get("category"),
+        is_active=args.get("is_active"),
+        limit=args.get("limit"),
+        offset=args.get("offset")
+    ),
+    "get_product": lambda args: {"sku": args.get("sku", "")},
+    "search_products": lambda args: {"query": args.get("query", "")},
+    "get_customer": lambda args: {"customer_id": args.get("customer_id", "")},
+    "verify_customer_pin": lambda args: {
+        "email": args.get("email", ""), "pin": args.get("pin", "")
+    },
+    "list_orders": lambda args: _optional(
+        customer_id=args.get("customer_id"),
+        status=args.get("status"),
+        limit=args.get("limit"),
+        offset=args.get("offset")
+    ),
+    "get_order": lambda args: {"order_id": args.get("order_id", "")},
+    "create_order": lambda args: {
+        "customer_id": args.get("customer_id", ""), "items": args.get("items", [])
+    },
+}
+
+
+# Streamed after text the LLM sent before calling tools, so it doesn't run into the answer
+PREAMBLE_SEPARATOR = "\n\n"
+
+
+def _as_dict(message) -> dict:
+    """API message objects (from non-streaming completions) as plain dicts."""
+    return message if isinstance(message, dict) else message.model_dump(exclude_none=True)
+
+
+def _log_result(tool_name: str, result: str):
+    log(f"Tool {tool_name} returned", bytes=len(result), preview=preview(result))
+
+
+def _answer(parts: list) -> str:
+    """The reply proper: the text of the last LLM call (or message), without what came before tool calls."""
+    return "".join(parts[-1]) if parts else ""
+
+
+def add_delta(chunk, tool_calls: dict) -> Optional[str]:
+    """Text of one streamed completion chunk; its tool-call deltas are assembled into `tool_calls` (by index)."""
+    if not chunk.choices:
+        return None
+    delta = chunk.choices[0].delta
+    for tc in delta.tool_calls or []:
+        call = tool_calls.setdefault(tc.index, {
+            "id": "",
+            "type": "function",
+            "function": {"name": "", "arguments": ""}
+        })
+        if tc.id:
+            call["id"] = tc.id
+        if tc.function:
+            call["function"]["name"] += tc.function.name or ""
+            call["function"]["arguments"] += tc.function.arguments or ""
+    return delta.content or None
+
+
+class ChatEngine:
+    """Runs chat turns: builds the prompt, calls the LLM, executes tools.
+
+    Holds only process-wide resources (clients, search index, fast-path
+    router, prefetcher, conversation store), so one engine can serve every
+    session. Per-session state is either read from the `store` by session
+    id, or passed in on each turn (chat history, history manager); the
+    result store is always passed in. `llm_client` may be a Lazy, built
+    on the first turn that needs it. Tool arguments from the LLM are
+    checked and normalized by `validator` before any call is made. Each
+    LLM call goes through `model_router`, which picks the model (`model`
+    by default) and fails over to backup models.
+    """
+
+    # Extra attributes of each turn span
+    _turn_attributes: dict = {}
+
+    def __init__(
+        self,
+        mcp_client,
+        llm_client,
+        search_index: Optional[ProductSearchIndex] = None,
+        fast_path_router: Optional[FastPathRouter] = None,
+        prefetcher: Optional[Prefetcher] = None,
+        store: Optional[ConversationStore] = None,
+        model: str = MODEL_NAME,
+        validator: Optional[ToolValidator] = TOOL_VALIDATOR,
+        model_router: Optional[ModelRouter] = None
+    ):
+        self.mcp_client = mcp_client
+        self._llm_client = llm_client
+        self.search_index = search_index
+        self.fast_path_router = fast_path_router
+        self.prefetcher = prefetcher
+        self.store = store
+        self.model = model
+        self.validator = validator
+        self.model_router = model_router or ModelRouter(default_model=model)
+
+    @property
+    def llm_client(self):
+        return resolve(self._llm_client)
+
+    @llm_client.setter
+    def llm_client(self, client):
+        self._llm_client = client
+
+    def search_locally(self, query: str):
+        """Answer search_products from the local index, or None if it can't."""
+        if self.search_index is None or not self.search_index.is_warm:
+            return None
+        products = self.search_index.search(query, limit=SEARCH_INDEX_LIMIT)
+        if not products:
+            return None
+        return json.dumps(products)
+
+    def _observe_result(self, tool_name: str, mcp_args: dict, result: str):
+        """Keep the local search index in step with what the server returns."""
+        if self.search_index is None:
+            return
+        if tool_name == "list_products" and not mcp_args:
+            products = parse_products(result)
+            if products is not None:
+                self.search_index.update(products)
+        elif tool_name == "create_order" and not result.startswith("Error"):
+            threading.Thread(target=self.search_index.refresh, args=(self.mcp_client,), daemon=True).start()
+
+    def _validate(self, tool_name: str, arguments) -> tuple:
+        """(normalized arguments, None), or (None, error result) for a call the server can only reject."""
+        if self.validator is None:
+            return (arguments if isinstance(arguments, dict) else {}), None
+        try:
+            return self.validator.validate(tool_name, arguments), None
+        except ToolArgumentError as e:
+            return None, self.validator.error_result(tool_name, e)
+
+    # The turn logic below is written as generators of I/O steps (see
+    # src/steps.py); these are the steps AsyncChatEngine makes coroutines
+    @staticmethod
+    def _blocking(fn, *args):
+        return fn(*args)
+
+    @staticmethod
+    def _take_prefetched(prefetch: Optional[PrefetchTurn], tool_name: str, mcp_args: dict) -> Optional[str]:
+        return prefetch.take(tool_name, mcp_args) if prefetch is not None else None
+
+    def _llm_call(self, messages: list, stream: bool, tools: list) -> tuple:
+        return self.model_router.complete(
+            self.llm_client,
+            messages,
+            stream=stream,
+            tools=tools,
+            tool_choice="auto"
+        )
+
+    @staticmethod
+    def _next_chunk(stream):
+        return next(stream, None)
+
+    @staticmethod
+    def _close_stream(stream):
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+    def execute_tool(self, tool_name: str, arguments: dict, prefetch: Optional[PrefetchTurn] = None) -> str:
+        """Execute an MCP tool and return the result.
+
+        A matching speculative call from `prefetch` is used instead of a new
+        request to the MCP server. Invalid arguments are answered with an
+        error without calling the server.
+        """
+        return run_steps(self._execute_tool(tool_name, arguments, prefetch))
+
+    def _execute_tool(self, tool_name: str, arguments: dict, prefetch: Optional[PrefetchTurn]):
+        with tracer.span("execute_tool", tool=tool_name) as span:
+            log(f"Executing tool: {tool_name}", args=arguments)
+            arguments, error = self._validate(tool_name, arguments)
+            if error is not None:
+                span.set("source", "validation")
+                return error
+            if tool_name == "search_products":
+                result = self.search_locally(arguments.get("query", ""))
+                if result is not None:
+                    span.set("source", "local_index")
+                    span.set("result_bytes", len(result))
+                    _log_result(tool_name, result)
+                    return result
+            if tool_name in TOOL_ARGUMENTS:
+                mcp_args = TOOL_ARGUMENTS[tool_name](arguments)
+                result = yield (self._take_prefetched, prefetch, tool_name, mcp_args)
+                span.set("source", "mcp" if result is None else "prefetch")
+                if result is None:
+                    result = yield (self.mcp_client.call_tool, tool_name, mcp_args)
+                self._observe_result(tool_name, mcp_args, result)
+                span.set("result_bytes", len(result))
+                _log_result(tool_name, result)
+                return result
+            log(f"Unknown tool: {tool_name}")
+            span.set("source", "unknown")
+            return f"Unknown tool: {tool_name}"
+
+    def execute_tool_calls(self, tool_calls: list, prefetch: Optional[PrefetchTurn] = None) -> list:
+        """Execute the tool calls of one LLM message.
+
+        `tool_calls` are in the OpenAI wire format ({"id", "function": {"name",
+        "arguments"}}). Several calls are sent to the MCP server as one JSON-RPC
+        batch (the client falls back to concurrent individual calls, at most
+        TOOL_CONCURRENCY at once, if batches are rejected). Results are
+        returned in the same order as `tool_calls`, so they can be appended to
+        the conversation in `tool_call_id` order. Results already fetched
+        speculatively by `prefetch` are taken from it instead.
+        """
+        return run_steps(self._execute_tool_calls(tool_calls, prefetch))
+
+    def _execute_tool_calls(self, tool_calls: list, prefetch: Optional[PrefetchTurn]):
+        calls = [(tc["function"]["name"], decode_arguments(tc["function"]["arguments"])) for tc in tool_calls]
+        if len(calls) == 1:
+            results = [(yield from self._execute_tool(*calls[0], prefetch))]
+        else:
+            results = yield from self._execute_batch(calls, prefetch)
+        if prefetch is not None:
+            for (name, _), result in zip(calls, results):
+                prefetch.observe(name, result)
+        return results
+
+    def _execute_batch(self, calls: list, prefetch: Optional[PrefetchTurn]):
+        """Several calls: local search and prefetched results first, the rest in one MCP batch."""
+        results = [None] * len(calls)
+        batch = []
+        for i, (name, args) in enumerate(calls):
+            args, results[i] = self._validate(name, args)
+            if results[i] is None and name == "search_products":
+                results[i] = self.search_locally(args.get("query", ""))
+            if results[i] is None and name in TOOL_ARGUMENTS:
+                mcp_args = TOOL_ARGUMENTS[name](args)
+                results[i] = yield (self._take_prefetched, prefetch, name, mcp_args)
+                if results[i] is not None:
+                    self._observe_result(name, mcp_args, results[i])
+                else:
+                    batch.append((i, name, mcp_args))
+            elif results[i] is None:
+                log(f"Unknown tool: {name}")
+                results[i] = f"Unknown tool: {name}"
+
+        if batch:
+            with tracer.span("execute_tool", tool="batch", calls=len(batch)) as span:
+                log(f"Executing {len(batch)} tools in one batch", tools=[name for _, name, _ in batch])
+                batch_results = yield (self.mcp_client.call_tools_batch, [(name, args) for _, name, args in batch])
+                for (i, name, mcp_args), result in zip(batch, batch_results):
+                    self._observe_result(name, mcp_args, result)
+                    results[i] = result
+                span.set("source", "mcp")
+                span.set("result_bytes", sum(len(result) for result in batch_results))
+
+        for (name, _), result in zip(calls, results):
+            _log_result(name, result)
+        return results
+
+    def _build_messages(
+        self,
+        user_message: str,
+        chat_history: list,
+        history: Optional[HistoryManager] = None,
+        first_turn: int = 0
+    ) -> list:
+        if history is not None:
+            return history.build_messages(SYSTEM_PROMPT, chat_history, user_message, first_turn)
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        for msg in chat_history:
+            messages.append({"role": msg["role"], "content": msg["content"]})
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    @staticmethod
+    def _read_full_result(tool_call: dict, result_store: Optional[ResultStore]) -> str:
+        if result_store is None:
+            return "Error: full results are not available in this session"
+        args = decode_arguments(tool_call["function"]["arguments"]) or {}
+        offset = args.get("offset") or 0
+        try:
+            offset = int(offset)
+        except (TypeError, ValueError):
+            offset = -1
+        if offset < 0:
+            return f"Error: offset must be a row index (0 or more), got {args.get('offset')!r}"
+        return result_store.read(str(args.get("result_id", "")), offset)
+
+    def _append_tool_results(
+        self,
+        messages: list,
+        tool_calls: list,
+        result_store: Optional[ResultStore] = None,
+        prefetch: Optional[PrefetchTurn] = None,
+        history: Optional[HistoryManager] = None
+    ):
+        """Run the tool calls and add one tool message per call, in call order.
+
+        MCP results are compacted before they enter the conversation; the full
+        payloads go to `result_store` for get_full_tool_result follow-ups.
+        A successful verification loads the customer's profile and recent
+        orders into the session's `history` (see VerifiedCustomer).
+        """
+        mcp_calls = [tc for tc in tool_calls if tc["function"]["name"] != FULL_RESULT_TOOL]
+        mcp_results = (yield from self._execute_tool_calls(mcp_calls, prefetch)) if mcp_calls else []
+        for i, customer_id in self._verified_customers(mcp_calls, mcp_results):
+            customer = yield from self._load_customer(customer_id, prefetch)
+            mcp_results[i] = self._remember_customer(history, customer, mcp_results[i])
+        self._track_orders(history, mcp_calls, mcp_results)
+        self._add_tool_messages(messages, tool_calls, mcp_results, result_store)
+
+    @staticmethod
+    def _verified_customers(mcp_calls: list, mcp_results: list) -> list:
+        """(index, customer id) of each successful verify_customer_pin result."""
+        verified = []
+        for i, (tool_call, result) in enumerate(zip(mcp_calls, mcp_results)):
+            if tool_call["function"]["name"] == "verify_customer_pin":
+                customer_id = verified_customer_id(result)
+                if customer_id:
+                    verified.append((i, customer_id))
+        return verified
+
+    def _load_customer(self, customer_id: str, prefetch: Optional[PrefetchTurn]):
+        """Profile and recent orders in one burst (a single batch), reusing prefetched results."""
+        calls = preload_calls(customer_id)
+        results = []
+        for call in calls:
+            results.append((yield (self._take_prefetched, prefetch, *call)))
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            fetched = yield (self.mcp_client.call_tools_batch, [calls[i] for i in missing])
+            for i, result in zip(missing, fetched):
+                results[i] = result
+        return VerifiedCustomer.from_results(customer_id, *results)
+
+    @staticmethod
+    def _remember_customer(history: Optional[HistoryManager], customer: VerifiedCustomer, result: str) -> str:
+        """Keep the customer in the session, and show the preloaded data with the verification result."""
+        if history is not None:
+            history.customer = customer
+        tracer.count("customer_context_loaded")
+        log("Verified customer context loaded", customer_id=customer.customer_id, orders=len(customer.orders))
+        return f"{result}\n\n{customer.summary()}"
+
+    @staticmethod
+    def _track_orders(history: Optional[HistoryManager], mcp_calls: list, mcp_results: list):
+        """Add orders the verified customer just placed to their context."""
+        if history is None or history.customer is None:
+            return
+        for tool_call, result in zip(mcp_calls, mcp_results):
+            if tool_call["function"]["name"] == "create_order" and not result.startswith("Error"):
+                history.customer.add_order(result)
+
+    def _add_tool_messages(self, messages: list, tool_calls: list, mcp_results: list, result_store: Optional[ResultStore]):
+        """Add one tool message per call; `mcp_results` are the results of the MCP calls among them."""
+        mcp_results = iter(mcp_results)
+        for tool_call in tool_calls:
+            name = tool_call["function"]["name"]
+            if name == FULL_RESULT_TOOL:
+                content = self._read_full_result(tool_call, result_store)
+            else:
+                result = next(mcp_results)
+                content = compact_tool_result(name, result, result_store)
+                if len(content) < len(result):
+                    log(f"Compacted {name} result from {len(result)} to {len(content)} chars")
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "content": content
+            })
+
+    def _fast_path(
+        self,
+        user_message: str,
+        messages: list,
+        result_store: Optional[ResultStore],
+        prefetch: Optional[PrefetchTurn] = None
+    ) -> Optional[str]:
+        """Run an obvious SKU / order lookup before the first LLM call.
+
+        Returns a templated answer in "template" mode. Otherwise (or if the
+        result can't be templated) the lookup is added to `messages` as if the
+        LLM had requested it, so one LLM call can phrase the answer directly.
+        """
+        route = self._route(user_message)
+        if route is None:
+            return None
+        result = yield from self._execute_tool(route.tool_name, route.arguments, prefetch)
+        return self._apply_fast_path(route, result, messages, result_store)
+
+    def _route(self, user_message: str) -> Optional[Route]:
+        if self.fast_path_router is None:
+            return None
+        route = self.fast_path_router.route(user_message)
+        if route is None:
+            return None
+        tracer.count("fast_path_taken", tool=route.tool_name)
+        log(f"Fast path: {route.tool_name}", args=route.arguments, confidence=round(route.confidence, 2), taken=self.fast_path_router.stats["taken"])
+        return route
+
+    @staticmethod
+    def _apply_fast_path(route: Route, result: str, messages: list, result_store: Optional[ResultStore]) -> Optional[str]:
+        """Template answer for `result`, or add it to `messages` as an LLM-requested call."""
+        if FAST_PATH_MODE == "template":
+            answer = render_answer(route, result)
+            if answer is not None:
+                return answer
+
+        tool_call = {
+            "id": "fastpath_0",
+            "type": "function",
+            "function": {"name": route.tool_name, "arguments": json.dumps(route.arguments)}
+        }
+        messages.append({"role": "assistant", "content": None, "tool_calls": [tool_call]})
+        messages.append({
+            "role": "tool",
+            "tool_call_id": tool_call["id"],
+            "content": compact_tool_result(route.tool_name, result, result_store)
+        })
+        return None
+
+    def _complete(self, messages: list, iteration: int, tools: list):
+        """One non-streaming LLM call, traced."""
+        with tracer.span("llm_call", messages=len(messages), iteration=iteration, stream=False) as span:
+            model, response = yield (self._llm_call, messages, False, tools)
+            span.set("model", model)
+            message = response.choices[0].message
+            span.set("tool_calls", len(message.tool_calls or []))
+            span.set("response_chars", len(message.content or ""))
+            return response
+
+    def load_session(
+        self,
+        session_id: Optional[str],
+        chat_history: Optional[list],
+        history: Optional[HistoryManager],
+        customer_context: Optional[CustomerContext] = None
+    ) -> tuple:
+        """(chat history, history manager, number of its first turn) for a turn.
+
+        With a store and a session id, the recent turns and the summary
+        state come from the store; otherwise the passed-in values are used.
+        A verified customer is only ever taken from `customer_context`,
+        never from the store.
+        """
+        if session_id is None or self.store is None:
+            return chat_history or [], history, 0
+        first_turn, records = self.store.recent(session_id)
+        history = HistoryManager.from_dict(self.store.get_state(session_id).get("history"))
+        history.customer = customer_context.customer if customer_context is not None else None
+        return chat_messages(records), history, first_turn
+
+    def save_turn(
+        self,
+        session_id: Optional[str],
+        history: Optional[HistoryManager],
+        turn: list,
+        customer_context: Optional[CustomerContext] = None
+    ):
+        """Persist a finished turn (user message, tool calls and results, reply)."""
+        if customer_context is not None and history is not None:
+            customer_context.customer = history.customer
+        if session_id is None or self.store is None:
+            return
+        self.store.append(session_id, turn)
+        if history is not None:
+            self.store.set_state(session_id, {"history": history.to_dict()})
+
+    def get_bot_response(
+        self,
+        user_message: str,
+        chat_history: Optional[list] = None,
+        history: Optional[HistoryManager] = None,
+        result_store: Optional[ResultStore] = None,
+        session_id: Optional[str] = None,
+        customer_context: Optional[CustomerContext] = None
+    ) -> str:
+        """Get response from Gemini via OpenRouter with tool calling.
+
+        With a `history` manager, older turns are summarized to keep the
+        prompt within its token budget. `result_store` keeps the full tool
+        payloads that were compacted for the LLM. With a `session_id` the
+        history is read from the engine's conversation store instead, and
+        the turn is saved there; the session's verified customer is then
+        kept in `customer_context`, in memory only.
+        """
+        return run_steps(self._bot_response(user_message, chat_history, history, result_store, session_id, customer_context))
+
+    def _bot_response(self, user_message, chat_history, history, result_store, session_id, customer_context=None):
+        chat_history, history, first_turn = yield (
+            self._blocking, self.load_session, session_id, chat_history, history, customer_context
+        )
+        with tracer.span("turn", stream=False, history_messages=len(chat_history), **self._turn_attributes) as span:
+            turn = [{"role": "user", "content": user_message}]
+            response = yield from self._respond(user_message, chat_history, history, result_store, span, turn, first_turn)
+            span.set("response_chars", len(response))
+        turn.append({"role": "assistant", "content": response})
+        yield (self._blocking, self.save_turn, session_id, history, turn, customer_context)
+        return response
+
+    def _respond(self, user_message, chat_history, history, result_store, span, turn=None, first_turn=0):
+        log(f"User message: {user_message}")
+        log(f"Chat history length: {len(chat_history)}")
+
+        if not self.llm_client:
+            log("No LLM client - OPENROUTER_API_KEY not set")
+            return "⚠️ Please set OPENROUTER_API_KEY in your .env file."
+
+        prefetch = self._start_prefetch(user_message)
+        messages, start = [], 0
+        try:
+            # Build messages
+            messages = self._build_messages(user_message, chat_history, history, first_turn)
+            start = len(messages)
+            answer = yield from self._fast_path(user_message, messages, result_store, prefetch)
+            if answer is not None:
+                return answer
+
+            log(f"Calling LLM with {len(messages)} messages")
+
+            # Call LLM with tools
+            tools = get_openai_tools(local=result_store is not None)
+            response = yield from self._complete(messages, 0, tools)
+
+            log(f"LLM response received")
+
+            # Handle tool calls (max 5 iterations)
+            iteration = 0
+            for iteration in range(5):
+                message = response.choices[0].message
+
+                if not message.tool_calls:
+                    log(f"No more tool calls after {iteration} iterations")
+                    break
+
+                log(f"Iteration {iteration}: {len(message.tool_calls)} tool calls")
+                span.set("iterations", iteration + 1)
+                messages.append(message)
+                yield from self._append_tool_results(messages, [tc.model_dump() for tc in message.tool_calls], result_store, prefetch, history)
+
+                log(f"Calling LLM again with tool results")
+                response = yield from self._complete(messages, iteration + 1, tools)
+
+            final_response = response.choices[0].message.content or "I couldn't generate a response. Please try again."
+            log("Final response", chars=len(final_response), preview=preview(final_response))
+            return final_response
+
+        except Exception as e:
+            log(f"Error in get_bot_response: {e}")
+            span.status = "error"
+            span.set("error", str(e))
+            return f"❌ Error: {str(e)}"
+        finally:
+            if prefetch is not None:
+                prefetch.finish()
+            if turn is not None:
+                turn.extend(_as_dict(message) for message in messages[start:])
+
+    def _start_prefetch(self, user_message: str) -> Optional[PrefetchTurn]:
+        """Start speculative lookups for this turn while the LLM runs."""
+        if self.prefetcher is None:
+            return None
+        return self.prefetcher.start(user_message)
+
+    def _stream_completion(self, messages: list, tool_calls: dict, iteration: int, tools: list, content: Optional[list] = None):
+        """Yield text deltas of one streamed completion (also appended to `content`).
+
+        Tool-call deltas are assembled into `tool_calls` (keyed by index) as
+        they arrive, so the caller can run them once the stream ends.
+        """
+        content = [] if content is None else content
+        with tracer.span("llm_call", messages=len(messages), iteration=iteration, stream=True) as span:
+            chars = 0
+            model, stream = yield (self._llm_call, messages, True, tools)
+            span.set("model", model)
+            try:
+                while True:
+                    chunk = yield (self._next_chunk, stream)
+                    if chunk is None:
+                        break
+                    token = add_delta(chunk, tool_calls)
+                    if token:
+                        if not chars:
+                            span.set("time_to_first_token", span.duration)
+                        chars += len(token)
+                        content.append(token)
+                        yield token
+            except GeneratorExit:
+                # The consumer stopped mid-answer: release the HTTP connection now
+                self._close_stream(stream)
+                raise
+            span.set("tool_calls", len(tool_calls))
+            span.set("response_chars", chars)
+
+    def stream_bot_response(
+        self,
+        user_message: str,
+        chat_history: Optional[list] = None,
+        history: Optional[HistoryManager] = None,
+        result_store: Optional[ResultStore] = None,
+        session_id: Optional[str] = None,
+        customer_context: Optional[CustomerContext] = None
+    ):
+        """Streaming variant of get_bot_response for st.write_stream.
+
+        Yields text tokens as soon as the LLM produces them. Tool calls are
+        assembled from the stream, executed, and the loop continues exactly
+        as in get_bot_response (max 5 tool iterations); text streamed
+        before tool calls is set apart from the answer, and only the
+        answer is saved as the reply. The turn is saved to the store when
+        the stream ends, or with the partial reply if the consumer stops
+        early.
+        """
+        return stream_steps(self._stream_bot_response(user_message, chat_history, history, result_store, session_id, customer_context))
+
+    def _stream_bot_response(self, user_message, chat_history, history, result_store, session_id, customer_context=None):
+        chat_history, history, first_turn = yield (
+            self._blocking, self.load_session, session_id, chat_history, history, customer_context
+        )
+        turn = [{"role": "user", "content": user_message}]
+        parts = []
+        try:
+            with tracer.span("turn", stream=True, history_messages=len(chat_history), **self._turn_attributes) as span:
+                yield from self._stream_respond(user_message, chat_history, history, result_store, span, turn, first_turn, parts)
+                span.set("response_chars", len(_answer(parts)))
+        except GeneratorExit:
+            # The consumer stopped early: save the partial reply now, no more steps can be yielded
+            turn.append({"role": "assistant", "content": _answer(parts)})
+            self.save_turn(session_id, history, turn, customer_context)
+            raise
+        turn.append({"role": "assistant", "content": _answer(parts)})
+        yield (self._blocking, self.save_turn, session_id, history, turn, customer_context)
+
+    def _stream_respond(self, user_message, chat_history, history, result_store, span, turn=None, first_turn=0, parts=None):
+        """Yield the reply's tokens; `parts` collects them, one list per LLM call or message.
+
+        Only the last part is the answer (what get_bot_response would
+        return, and what is saved as the reply); text the LLM streamed
+        before calling tools was shown, followed by PREAMBLE_SEPARATOR.
+        """
+        parts = [] if parts is None else parts
+        log(f"User message (streaming): {user_message}")
+        log(f"Chat history length: {len(chat_history)}")
+
+        if not self.llm_client:
+            log("No LLM client - OPENROUTER_API_KEY not set")
+            parts.append(["⚠️ Please set OPENROUTER_API_KEY in your .env file."])
+            yield parts[-1][0]
+            return
+
+        prefetch = self._start_prefetch(user_message)
+        messages, start = [], 0
+        try:
+            messages = self._build_messages(user_message, chat_history, history, first_turn)
+            start = len(messages)
+            answer = yield from self._fast_path(user_message, messages, result_store, prefetch)
+            if answer is not None:
+                parts.append([answer])
+                yield answer
+                return
+
+            tools = get_openai_tools(local=result_store is not None)
+            for iteration in range(6):
+                log(f"Streaming LLM call with {len(messages)} messages")
+                tool_calls = {}
+                content = []
+                parts.append(content)
+                yield from self._stream_completion(messages, tool_calls, iteration, tools, content)
+
+                # The sixth response is final, like the non-streaming loop
+                if not tool_calls or iteration == 5:
+                    log(f"No more tool calls after {iteration} iterations")
+                    break
+                if content:
+                    # Text sent before tool calls ("Let me check...") is not part of
+                    # the answer: set it apart from the answer that follows
+                    yield PREAMBLE_SEPARATOR
+
+                ordered = [tool_calls[index] for index in sorted(tool_calls)]
+                log(f"Iteration {iteration}: {len(ordered)} tool calls")
+                span.set("iterations", iteration + 1)
+                messages.append({
+                    "role": "assistant",
+                    "content": "".join(content) or None,
+                    "tool_calls": ordered
+                })
+                yield from self._append_tool_results(messages, ordered, result_store, prefetch, history)
+
+            if not parts[-1]:
+                parts.append(["I couldn't generate a response. Please try again."])
+                yield parts[-1][0]
+
+        except Exception as e:
+            log(f"Error in stream_bot_response: {e}")
+            span.status = "error"
+            span.set("error", str(e))
+            parts.append([f"❌ Error: {str(e)}"])
+            yield parts[-1][0]
+        finally:
+            if prefetch is not None:
+                prefetch.finish()
+            if turn is not None:
+                turn.extend(messages[start:])
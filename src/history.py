@@ -0,0 +1,177 @@
+"""
+Token-budgeted conversation history
+Keeps recent turns verbatim and folds older ones into a rolling summary.
+"""
+import re
+from typing import Optional
+
+from src.config import HISTORY_TOKEN_BUDGET, HISTORY_KEEP_TURNS, HISTORY_SUMMARY_LINES
+from src.customer_context import VerifiedCustomer
+
+UUID_RE = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE)
+SKU_RE = re.compile(r"\b[A-Z]{3}-\d{4}\b", re.IGNORECASE)
+EMAIL_RE = re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.-]+\b")
+
+# Characters of context before an id used to tell customer ids from order ids
+ID_CONTEXT = 60
+# Characters of each message kept in a summary line
+SUMMARY_SNIPPET = 120
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) plus message overhead."""
+    return len(text or "") // 4 + 4
+
+
+def _snippet(text: str) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= SUMMARY_SNIPPET else text[:SUMMARY_SNIPPET - 3] + "..."
+
+
+def extract_entities(text: str) -> dict:
+    """Customer ids, order ids, emails and SKUs mentioned in `text`, in order."""
+    entities = {"customer_ids": [], "order_ids": [], "emails": [], "skus": []}
+    for match in UUID_RE.finditer(text):
+        context = text[max(0, match.start() - ID_CONTEXT):match.start()].lower()
+        # The nearest preceding keyword decides what kind of id this is
+        key = "customer_ids" if context.rfind("customer") > context.rfind("order") else "order_ids"
+        entities[key].append(match.group(0).lower())
+    for match in EMAIL_RE.finditer(text):
+        entities["emails"].append(match.group(0))
+    for match in SKU_RE.finditer(text):
+        entities["skus"].append(match.group(0).upper())
+    return entities
+
+
+def split_turns(chat_history: list) -> list:
+    """Group messages into turns, each starting at a user message."""
+    turns = []
+    for msg in chat_history:
+        if msg["role"] == "user" or not turns:
+            turns.append([])
+        turns[-1].append(msg)
+    return turns
+
+
+class HistoryManager:
+    """Builds the LLM message list for one chat session within a token budget.
+
+    The last `keep_turns` turns are sent verbatim (fewer if they alone
+    exceed the budget). Turns that fall out of that window are folded into
+    a rolling summary exactly once; the summary is extended, never
+    regenerated. Customer ids, order ids, emails and SKUs seen in folded
+    turns are kept as key facts even after their summary line is dropped.
+    The session's verified `customer`, if any, is included until it expires;
+    it is set from the live session's CustomerContext and never persisted.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        keep_turns: int = HISTORY_KEEP_TURNS,
+        summary_lines: int = HISTORY_SUMMARY_LINES
+    ):
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.max_summary_lines = summary_lines
+        self.reset()
+
+    def reset(self):
+        self.summary_lines = []
+        self.facts = {"customer_ids": [], "order_ids": [], "emails": [], "skus": []}
+        self.folded_turns = 0
+        self.customer: Optional[VerifiedCustomer] = None
+
+    def to_dict(self) -> dict:
+        """Summary state, for persisting alongside a stored conversation."""
+        return {
+            "summary_lines": self.summary_lines, "facts": self.facts, "folded_turns": self.folded_turns
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict, **kwargs) -> "HistoryManager":
+        manager = cls(**kwargs)
+        if state:
+            manager.summary_lines = list(state["summary_lines"])
+            manager.facts = {key: list(values) for key, values in state["facts"].items()}
+            manager.folded_turns = state["folded_turns"]
+        return manager
+
+    def build_messages(self, system_prompt: str, chat_history: list, user_message: str, first_turn: int = 0) -> list:
+        """System prompt, summary of older turns, recent turns, new message.
+
+        `chat_history` may be just the most recent part of the conversation,
+        starting at turn number `first_turn` (as read from a conversation
+        store); it must reach back past the turns kept verbatim.
+        """
+        turns = split_turns(chat_history)
+        total = first_turn + len(turns)
+        if total < self.folded_turns:
+            # History was cleared or replaced
+            self.reset()
+        if self.customer is not None and self.customer.expired():
+            self.customer = None
+
+        fixed = estimate_tokens(system_prompt) + estimate_tokens(user_message)
+        keep = min(self.keep_turns, len(turns))
+        while keep > 0 and fixed + self._summary_tokens() + self._turn_tokens(turns[-keep:]) > self.token_budget:
+            keep -= 1
+        # Never un-fold turns that are already in the summary
+        keep = min(keep, total - self.folded_turns)
+
+        for turn in turns[max(0, self.folded_turns - first_turn):len(turns) - keep]:
+            self._fold(turn)
+        self.folded_turns = total - keep
+
+        messages = [{"role": "system", "content": system_prompt}]
+        summary = self.summary_text()
+        if summary:
+            messages.append({"role": "system", "content": summary})
+        for turn in turns[len(turns) - keep:]:
+            messages.extend({"role": msg["role"], "content": msg["content"]} for msg in turn)
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def summary_text(self) -> str:
+        """The rolling summary and key facts as a system message body."""
+        parts = []
+        if self.customer is not None:
+            parts.append(self.customer.summary())
+        if self.summary_lines:
+            parts.append("Summary of earlier conversation:\n" + "\n".join(f"- {line}" for line in self.summary_lines))
+        facts = [
+            f"{label}: {', '.join(self.facts[key])}"
+            for key, label in (
+                ("customer_ids", "Customer IDs"),
+                ("order_ids", "Order IDs"),
+                ("emails", "Emails"),
+                ("skus", "Product SKUs"),
+            )
+            if self.facts[key]
+        ]
+        if facts:
+            parts.append("Key facts from earlier in this conversation:\n" + "\n".join(f"- {fact}" for fact in facts))
+        return "\n\n".join(parts)
+
+    def _fold(self, turn: list):
+        line = " / ".join(f"{msg['role'].capitalize()}: {_snippet(msg['content'])}" for msg in turn)
+        self.summary_lines.append(line)
+        del self.summary_lines[:-self.max_summary_lines]
+        for msg in turn:
+            self._extract_facts(msg["content"] or "")
+
+    def _extract_facts(self, text: str):
+        for key, values in extract_entities(text).items():
+            for value in values:
+                self._add_fact(key, value)
+
+    def _add_fact(self, key: str, value: str):
+        if value not in self.facts[key]:
+            self.facts[key].append(value)
+
+    def _summary_tokens(self) -> int:
+        return estimate_tokens(self.summary_text()) + SUMMARY_SNIPPET // 2
+
+    @staticmethod
+    def _turn_tokens(turns: list) -> int:
+        return sum(estimate_tokens(msg["content"]) for turn in turns for msg in turn)
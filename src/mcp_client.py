@@ -2,50 +2,209 @@
 MCP Client for the Order Management Server
 Handles all communication with the MCP server.
 """
-import requests
-from typing import Optional
-from src.config import MCP_SERVER_URL, MCP_HEADERS, MCP_TIMEOUT
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from typing import Iterator, Optional
+from src.config import (
+    MCP_SERVER_URL, MCP_HEADERS, MCP_CONNECT_TIMEOUT, MCP_READ_TIMEOUT,
+    MCP_HEDGE_ENABLED, MCP_COALESCE_ENABLED, MCP_POOL_SIZE, TOOL_CONCURRENCY,
+    MCP_NOTIFICATIONS_URL, LIST_PAGE_SIZE
+)
+from src.cache import ToolCache, cache_key
+from src.resilience import IDEMPOTENT_TOOLS, CircuitBreaker, LatencyTracker, RetryPolicy, SingleFlight
+from src.streaming import ToolResultError, iter_tool_records
+from src.steps import run_steps
+from src.tracing import propagate, tracer
+from src.transport import HTTPTransport, TransportTimeout, TransportUnreachable, get_shared_transport
 
+# Responses that mean "server unhealthy, try again later" rather than a bad request
+TRANSIENT_STATUS_CODES = (429, 500, 502, 503, 504)
 
-class MCPClient:
-    """Client for interacting with the MCP server."""
+# Errors for calls that provably never reached the server
+UNREACHABLE_ERROR = "Could not connect to the MCP server"
+CIRCUIT_OPEN_ERROR = "MCP server unavailable (circuit open)"
+# Prefix of a JSON-RPC error object the server answered with
+SERVER_ERROR = "MCP server rejected the call"
+
+
+def never_sent(text: str) -> bool:
+    """True if a tool result is the error for a call that never reached the server.
+
+    Only then is a failed non-idempotent call (create_order) known not to
+    have happened; any other error may have come after the server acted.
+    """
+    return text.startswith((f"Error: {UNREACHABLE_ERROR}", f"Error: {CIRCUIT_OPEN_ERROR}"))
+
+
+def server_rejected(text: str) -> bool:
+    """True if a tool result is a JSON-RPC error the server answered with: a definite refusal, not a lost call."""
+    return text.startswith(f"Error: {SERVER_ERROR}")
+
+
+def _page(args: dict, limit: Optional[int], offset: Optional[int]) -> dict:
+    """Add pagination arguments to a list tool's arguments, if given."""
+    if limit is not None:
+        args["limit"] = limit
+    if offset:
+        args["offset"] = offset
+    return args
+
+
+class BaseMCPClient:
+    """Result handling and per-tool helpers shared by the sync and async clients.
     
-    def __init__(self, server_url: str = MCP_SERVER_URL):
-        self.server_url = server_url
-        self.request_id = 0
+    Subclasses provide `call_tool` and set `cache`; the helpers return
+    whatever `call_tool` returns (a coroutine for the async client).
+    """
     
-    def _call(self, method: str, params: Optional[dict] = None) -> dict:
-        """Make a JSON-RPC call to the MCP server."""
-        self.request_id += 1
-        payload = {
-            "jsonrpc": "2.0",
-            "id": self.request_id,
-            "method": method,
-            "params": params or {}
-        }
+    cache: Optional[ToolCache] = None
+    breaker: CircuitBreaker
+    retry_policy: RetryPolicy
+    hedge: bool
+    batch_supported: Optional[bool] = None
+    
+    # The retry and batch rules below are generators of I/O steps (see
+    # src/steps.py), run by each client with its own `_sleep`, `_attempt`,
+    # `_call_batch` and `_call_tools_individually`
+    def _call_steps(self, method: str, params: Optional[dict]):
+        """Make a JSON-RPC call to the MCP server.
         
-        try:
-            response = requests.post(
-                self.server_url,
-                json=payload,
-                headers=MCP_HEADERS,
-                timeout=MCP_TIMEOUT
-            )
-            return response.json()
-        except requests.exceptions.Timeout:
-            return {"error": "Request timed out"}
-        except Exception as e:
-            return {"error": str(e)}
+        Idempotent reads are retried with jittered backoff and hedged once
+        they pass their p95 latency; nothing is sent while the circuit
+        breaker is open. Transport failures are returned as
+        {"error": ..., "transient": True}.
+        """
+        tool_name = (params or {}).get("name", "")
+        idempotent = method != "tools/call" or tool_name in IDEMPOTENT_TOOLS
+        attempts = max(1, self.retry_policy.max_attempts) if idempotent else 1
+        
+        result = None
+        for attempt in range(attempts):
+            if attempt:
+                yield (self._sleep, self.retry_policy.delay(attempt - 1))
+            if not self.breaker.allow():
+                tracer.count("mcp_circuit_rejected", tool=tool_name)
+                return {"error": CIRCUIT_OPEN_ERROR, "transient": True}
+            if attempt:
+                tracer.count("mcp_retries", tool=tool_name)
+            result = yield (self._attempt, method, params, tool_name, idempotent and self.hedge)
+            if not result.get("transient"):
+                self.breaker.record_success()
+                return result
+            self.breaker.record_failure()
+        return result
     
-    def call_tool(self, tool_name: str, arguments: Optional[dict] = None) -> str:
-        """Call an MCP tool and return the result text."""
-        result = self._call("tools/call", {
-            "name": tool_name,
-            "arguments": arguments or {}
-        })
+    def _batch_steps(self, calls: list):
+        """Call several MCP tools in one round trip.
+        
+        `calls` is a list of (tool_name, arguments) pairs; the result texts
+        are returned in the same order. Falls back to concurrent individual
+        calls if the server does not accept JSON-RPC batches.
+        """
+        if not calls:
+            return []
+        
+        results = [self._cached(name, arguments) for name, arguments in calls]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        
+        pending_calls = [calls[i] for i in pending]
+        if len(pending_calls) == 1 or self.batch_supported is False or not self.breaker.allow():
+            fetched = yield (self._call_tools_individually, pending_calls)
+        else:
+            responses = yield (self._call_batch, [
+                ("tools/call", {"name": name, "arguments": arguments or {}})
+                for name, arguments in pending_calls
+            ])
+            if responses is None:
+                self.batch_supported = False
+                fetched = yield (self._call_tools_individually, pending_calls)
+            else:
+                self.batch_supported = True
+                fetched = [
+                    self._finish(name, arguments, response)
+                    for (name, arguments), response in zip(pending_calls, responses)
+                ]
+                # Reads lost to a transport failure go through the retrying single-call path
+                retry = [
+                    i for i, ((name, _), response) in enumerate(zip(pending_calls, responses))
+                    if response.get("transient") and name in IDEMPOTENT_TOOLS
+                ]
+                if retry:
+                    retried = yield (self._call_tools_individually, [pending_calls[i] for i in retry])
+                    for i, result in zip(retry, retried):
+                        fetched[i] = result
+        
+        for i, result in zip(pending, fetched):
+            results[i] = result
+        return results
+    
+    def _batch_payload(self, calls: list) -> list:
+        return [
+            {
+                "jsonrpc": "2.0",
+                "id": self._next_id(),
+                "method": method,
+                "params": params or {}
+            }
+            for method, params in calls
+        ]
+    
+    def _batch_failed(self, payload: list, error: str) -> list:
+        """A batch lost in transit: a transient error for every call, counted by the breaker."""
+        self.breaker.record_failure()
+        return [{"error": error, "transient": True} for _ in payload]
+    
+    def _batch_answered(self, payload: list, body, status_code: int) -> Optional[list]:
+        """Responses to a batch the server answered, in `payload` order (matched back by id).
         
+        None only if the server rejected the array itself, by answering it
+        with a single JSON-RPC object (e.g. -32600 Invalid Request); any
+        other unusable reply fails just these calls and batching stays on.
+        """
+        self.breaker.record_success()
+        if isinstance(body, dict):
+            return None
+        if not isinstance(body, list):
+            error = f"MCP server returned HTTP {status_code}" if status_code >= 400 else "Invalid response to batched request"
+            return [{"error": error} for _ in payload]
+        by_id = {item.get("id"): item for item in body if isinstance(item, dict)}
+        return [
+            by_id.get(item["id"], {"error": "No response for batched request"})
+            for item in payload
+        ]
+    
+    def _finish(self, tool_name: str, arguments: Optional[dict], result: dict) -> str:
+        """Turn a response into result text, serving stale cache if the server is failing."""
+        if result.get("transient") and self.cache is not None:
+            stale = self.cache.get_stale(tool_name, arguments)
+            if stale is not None:
+                tracer.count("mcp_stale_served", tool=tool_name)
+                return stale
+        return self._store(tool_name, arguments, self._result_text(result))
+    
+    def _cached(self, tool_name: str, arguments: Optional[dict]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.get(tool_name, arguments)
+    
+    def _store(self, tool_name: str, arguments: Optional[dict], text: str) -> str:
+        """Record a fresh result in the cache and invalidate what it makes stale."""
+        if self.cache is not None and not text.startswith("Error"):
+            self.cache.put(tool_name, arguments, text)
+            self.cache.invalidate_after(tool_name)
+        return text
+    
+    @staticmethod
+    def _result_text(result: dict) -> str:
+        """Extract the text content from a tools/call response."""
         if "error" in result:
-            return f"Error: {result['error']}"
+            error = result["error"]
+            if isinstance(error, dict):
+                return f"Error: {SERVER_ERROR} ({error.get('code')}): {error.get('message')}"
+            return f"Error: {error}"
         
         try:
             content = result.get("result", {}).get("content", [])
@@ -55,14 +214,21 @@ class MCPClient:
         except Exception as e:
             return f"Error parsing response: {e}"
     
+    def list_tools(self) -> dict:
+        """The server's raw tools/list response (tool names and input schemas)."""
+        return self._call("tools/list")
+    
     # Convenience methods for each tool
-    def list_products(self, category: Optional[str] = None, is_active: Optional[bool] = None) -> str:
+    def list_products(
+        self, category: Optional[str] = None, is_active: Optional[bool] = None,
+        limit: Optional[int] = None, offset: Optional[int] = None
+    ) -> str:
         args = {}
         if category:
             args["category"] = category
         if is_active is not None:
             args["is_active"] = is_active
-        return self.call_tool("list_products", args)
+        return self.call_tool("list_products", _page(args, limit, offset))
     
     def get_product(self, sku: str) -> str:
         return self.call_tool("get_product", {"sku": sku})
@@ -76,19 +242,356 @@ class MCPClient:
     def verify_customer_pin(self, email: str, pin: str) -> str:
         return self.call_tool("verify_customer_pin", {"email": email, "pin": pin})
     
-    def list_orders(self, customer_id: Optional[str] = None, status: Optional[str] = None) -> str:
+    def list_orders(
+        self, customer_id: Optional[str] = None, status: Optional[str] = None,
+        limit: Optional[int] = None, offset: Optional[int] = None
+    ) -> str:
         args = {}
         if customer_id:
             args["customer_id"] = customer_id
         if status:
             args["status"] = status
-        return self.call_tool("list_orders", args)
+        return self.call_tool("list_orders", _page(args, limit, offset))
     
     def get_order(self, order_id: str) -> str:
         return self.call_tool("get_order", {"order_id": order_id})
     
-    def create_order(self, customer_id: str, items: list) -> str:
-        return self.call_tool("create_order", {
+    def create_order(self, customer_id: str, items: list, idempotency_key: Optional[str] = None) -> str:
+        args = {
             "customer_id": customer_id,
             "items": items
+        }
+        if idempotency_key:
+            # The server returns the order already created with this key instead of a new one
+            args["idempotency_key"] = idempotency_key
+        return self.call_tool("create_order", args)
+
+
+class MCPClient(BaseMCPClient):
+    """Client for interacting with the MCP server.
+    
+    Safe to share between threads (e.g. Streamlit sessions): requests go
+    through a pooled keep-alive transport and request ids are allocated
+    under a lock. With a `cache`, catalog tool results are served from
+    memory until they expire or a write invalidates them, and stale
+    entries are served while the server is failing. With `coalesce`,
+    identical read calls that overlap in time (from any session) share
+    one request; `flights.stats` counts them.
+    """
+    
+    def __init__(
+        self,
+        server_url: str = MCP_SERVER_URL,
+        transport: Optional[HTTPTransport] = None,
+        cache: Optional[ToolCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge: bool = MCP_HEDGE_ENABLED,
+        coalesce: bool = MCP_COALESCE_ENABLED
+    ):
+        self.server_url = server_url
+        # The shared transport (and its HTTP library) is created on first use
+        self._transport = transport
+        self.cache = cache
+        self.request_id = 0
+        self._id_lock = threading.Lock()
+        # None until the first batch tells us whether the server accepts them
+        self.batch_supported: Optional[bool] = None
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.hedge = hedge
+        self.flights = SingleFlight() if coalesce else None
+        self.notifications = None
+        # Runs the primary and duplicate request of a hedged read
+        self._hedge_pool = ThreadPoolExecutor(max_workers=2 * MCP_POOL_SIZE, thread_name_prefix="mcp-hedge")
+    
+    @property
+    def transport(self) -> HTTPTransport:
+        if self._transport is None:
+            self._transport = get_shared_transport()
+        return self._transport
+
+    def subscribe(self, search_index=None):
+        """Start this client's notification listener (once) and return it.
+
+        Change notifications from the server's SSE stream invalidate the
+        cache and refresh `search_index`; see NotificationListener.
+        """
+        with self._id_lock:
+            if self.notifications is None:
+                from src.notifications import NotificationListener
+                self.notifications = NotificationListener(
+                    MCP_NOTIFICATIONS_URL or self.server_url, cache=self.cache,
+                    mcp_client=self, search_index=search_index
+                ).start()
+            return self.notifications
+
+    def warm_up(self) -> bool:
+        """Open a keep-alive connection to the server before the first tool call."""
+        with tracer.span("mcp_warm_up") as span:
+            connected = self.transport.connect(self.server_url, (MCP_CONNECT_TIMEOUT, MCP_READ_TIMEOUT))
+            span.set("connected", connected)
+        return connected
+
+    def _next_id(self) -> int:
+        with self._id_lock:
+            self.request_id += 1
+            return self.request_id
+    
+    def _call(self, method: str, params: Optional[dict] = None) -> dict:
+        """Make a JSON-RPC call to the MCP server; see BaseMCPClient._call_steps."""
+        return run_steps(self._call_steps(method, params))
+    
+    @staticmethod
+    def _sleep(seconds: float):
+        time.sleep(seconds)
+    
+    def _attempt(self, method: str, params: Optional[dict], tool_name: str, hedge: bool) -> dict:
+        """Send once, plus a duplicate if the first is slower than usual."""
+        delay = self.latency.hedge_delay(tool_name or method) if hedge else None
+        if delay is None:
+            return self._send(method, params)
+        
+        primary = self._hedge_pool.submit(propagate(self._send), method, params)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        
+        tracer.count("mcp_hedged", tool=tool_name)
+        backup = self._hedge_pool.submit(propagate(self._send), method, params, True)
+        result = None
+        for future in as_completed((primary, backup)):
+            result = future.result()
+            if not result.get("transient"):
+                if future is backup:
+                    tracer.count("mcp_hedge_wins", tool=tool_name)
+                return result
+        return result
+    
+    def _send(self, method: str, params: Optional[dict], hedged: bool = False) -> dict:
+        """One JSON-RPC request/response over the transport."""
+        payload = {
+            "jsonrpc": "2.0",
+            "id": self._next_id(),
+            "method": method,
+            "params": params or {}
+        }
+        tool_name = (params or {}).get("name", "")
+        
+        with tracer.span("mcp_call", method=method, tool=tool_name, hedged=hedged) as span:
+            try:
+                response = self.transport.post(
+                    self.server_url,
+                    json=payload,
+                    headers=MCP_HEADERS,
+                    timeout=(MCP_CONNECT_TIMEOUT, MCP_READ_TIMEOUT)
+                )
+                span.set("status_code", response.status_code)
+                span.set("response_bytes", len(response.content))
+                if response.status_code in TRANSIENT_STATUS_CODES:
+                    span.status = "error"
+                    return {"error": f"MCP server returned HTTP {response.status_code}", "transient": True}
+                result = response.json()
+            except TransportTimeout:
+                span.status = "error"
+                span.set("error", "timeout")
+                return {"error": "Request timed out", "transient": True}
+            except TransportUnreachable as e:
+                span.status = "error"
+                span.set("error", "unreachable")
+                return {"error": f"{UNREACHABLE_ERROR}: {e}", "transient": True}
+            except Exception as e:
+                span.status = "error"
+                span.set("error", str(e))
+                return {"error": str(e), "transient": True}
+        
+        self.latency.record(tool_name or method, span.duration)
+        return result
+    
+    def _call_batch(self, calls: list) -> Optional[list]:
+        """Send several JSON-RPC calls as one batch array.
+        
+        `calls` is a list of (method, params) pairs. Returns the responses
+        in the same order (matched back by id), or None if the server
+        rejected the batch array. The outcome is always recorded on the circuit
+        breaker (the caller may hold its half-open probe).
+        """
+        payload = self._batch_payload(calls)
+        
+        with tracer.span("mcp_call", method="batch", calls=len(payload)) as span:
+            try:
+                response = self.transport.post(
+                    self.server_url,
+                    json=payload,
+                    headers=MCP_HEADERS,
+                    timeout=(MCP_CONNECT_TIMEOUT, MCP_READ_TIMEOUT)
+                )
+                span.set("status_code", response.status_code)
+                span.set("response_bytes", len(response.content))
+                if response.status_code in TRANSIENT_STATUS_CODES:
+                    span.status = "error"
+                    return self._batch_failed(payload, f"MCP server returned HTTP {response.status_code}")
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = None
+            except TransportTimeout:
+                span.status = "error"
+                span.set("error", "timeout")
+                return self._batch_failed(payload, "Request timed out")
+            except Exception as e:
+                span.status = "error"
+                span.set("error", str(e))
+                return self._batch_failed(payload, str(e))
+        
+        return self._batch_answered(payload, body, response.status_code)
+    
+    def call_tools_batch(self, calls: list) -> list:
+        """Call several MCP tools in one round trip; see BaseMCPClient._batch_steps."""
+        return run_steps(self._batch_steps(calls))
+    
+    def _call_tools_individually(self, calls: list) -> list:
+        if len(calls) == 1:
+            return [self._fetch_tool(*calls[0])]
+        workers = max(1, min(TOOL_CONCURRENCY, len(calls)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(propagate(lambda call: self._fetch_tool(*call)), calls))
+    
+    def call_tool(self, tool_name: str, arguments: Optional[dict] = None) -> str:
+        """Call an MCP tool and return the result text."""
+        cached = self._cached(tool_name, arguments)
+        if cached is not None:
+            return cached
+        return self._fetch_tool(tool_name, arguments)
+    
+    def _fetch_tool(self, tool_name: str, arguments: Optional[dict]) -> str:
+        """Call a tool on the server, bypassing the cache lookup.
+
+        Reads join an identical call already in flight, if there is one.
+        """
+        if self.flights is None or tool_name not in IDEMPOTENT_TOOLS:
+            return self._request_tool(tool_name, arguments)
+        result, shared = self.flights.do(
+            cache_key(tool_name, arguments), lambda: self._request_tool(tool_name, arguments)
+        )
+        if shared:
+            tracer.count("mcp_coalesced", tool=tool_name)
+        return result
+
+    def _request_tool(self, tool_name: str, arguments: Optional[dict]) -> str:
+        result = self._call("tools/call", {
+            "name": tool_name,
+            "arguments": arguments or {}
         })
+        return self._finish(tool_name, arguments, result)
+
+    def iter_orders(
+        self, customer_id: Optional[str] = None, status: Optional[str] = None,
+        page_size: int = LIST_PAGE_SIZE
+    ) -> Iterator[dict]:
+        """Yield every matching order, one page of `page_size` at a time.
+
+        Unlike `list_orders()`, nothing holds the whole result: each
+        page's response body is decoded record by record as it arrives,
+        so memory stays bounded however many orders there are. Raises
+        ToolResultError if a page can't be fetched.
+        """
+        args = {}
+        if customer_id:
+            args["customer_id"] = customer_id
+        if status:
+            args["status"] = status
+        return self._iter_pages("list_orders", args, page_size)
+
+    def iter_products(
+        self, category: Optional[str] = None, is_active: Optional[bool] = None,
+        page_size: int = LIST_PAGE_SIZE
+    ) -> Iterator[dict]:
+        """Yield every matching product, one page at a time; see `iter_orders()`."""
+        args = {}
+        if category:
+            args["category"] = category
+        if is_active is not None:
+            args["is_active"] = is_active
+        return self._iter_pages("list_products", args, page_size)
+
+    def _iter_pages(self, tool_name: str, arguments: dict, page_size: int) -> Iterator[dict]:
+        offset = 0
+        first_record = None
+        while True:
+            count = 0
+            for record in self.iter_tool_records(tool_name, dict(arguments, limit=page_size, offset=offset)):
+                if count == 0:
+                    if first_record is not None and record == first_record:
+                        return  # the server ignores offset and sent the first page again
+                    first_record = record
+                count += 1
+                yield record
+            # A short page is the last one; a long one means the server ignored the limit
+            if count != page_size:
+                return
+            offset += count
+
+    def iter_tool_records(self, tool_name: str, arguments: Optional[dict] = None) -> Iterator:
+        """Call a tool whose result is a JSON array and yield its records as they are decoded.
+
+        The response body is streamed and decoded incrementally instead
+        of being loaded with `response.json()`. Results are neither
+        cached nor coalesced. Transient failures are retried (read tools
+        only) until the first record has been yielded; after that, and
+        for tool errors, ToolResultError is raised.
+        """
+        payload = {"name": tool_name, "arguments": arguments or {}}
+        attempts = max(1, self.retry_policy.max_attempts) if tool_name in IDEMPOTENT_TOOLS else 1
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(self.retry_policy.delay(attempt - 1))
+                tracer.count("mcp_retries", tool=tool_name)
+            if not self.breaker.allow():
+                tracer.count("mcp_circuit_rejected", tool=tool_name)
+                raise ToolResultError(CIRCUIT_OPEN_ERROR)
+            records = yield from self._stream_tool(payload)
+            if records is not None:
+                return
+        raise ToolResultError(f"{tool_name} failed after {attempts} attempt(s)")
+
+    def _stream_tool(self, params: dict):
+        """One streamed tools/call; returns the record count, or None after a transient failure."""
+        tool_name = params["name"]
+        request = {"jsonrpc": "2.0", "id": self._next_id(), "method": "tools/call", "params": params}
+        records = 0
+        with tracer.span("mcp_stream", tool=tool_name) as span:
+            try:
+                with self.transport.post_stream(
+                    self.server_url, json=request, headers=MCP_HEADERS,
+                    timeout=(MCP_CONNECT_TIMEOUT, MCP_READ_TIMEOUT)
+                ) as (status_code, chunks):
+                    span.set("status_code", status_code)
+                    if status_code in TRANSIENT_STATUS_CODES:
+                        self.breaker.record_failure()
+                        span.status = "error"
+                        return None
+                    for record in iter_tool_records(chunks):
+                        records += 1
+                        yield record
+            except ToolResultError:
+                self.breaker.record_success()  # the server answered; the tool failed
+                raise
+            except GeneratorExit:
+                # The caller stopped early; the server was answering
+                self.breaker.record_success()
+                span.set("records", records)
+                return records
+            except Exception as e:
+                self.breaker.record_failure()
+                span.status = "error"
+                span.set("error", str(e))
+                if records:
+                    raise ToolResultError(f"Stream interrupted after {records} records: {e}") from e
+                return None
+            span.set("records", records)
+        self.breaker.record_success()
+        tracer.count("mcp_streamed_records", records, tool=tool_name)
+        return records
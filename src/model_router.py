@@ -0,0 +1,389 @@
+"""
+Model routing for LLM calls
+Picks the model for each chat completion from configurable rules, tracks
+rolling latency and errors per model, and fails over to a backup model when
+one errors or misses its time-to-first-byte deadline.
+"""
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+from typing import Optional
+
+from src.config import (
+    MODEL_NAME, MODEL_ROUTES, MODEL_FALLBACKS, MODEL_TTFB_DEADLINE, MODEL_LONG_HISTORY
+)
+from src.resilience import CircuitBreaker, LatencyTracker
+from src.tracing import log, propagate, tracer
+
+# Tools that change data; a turn that uses them is routed as "write"
+WRITE_TOOLS = ("create_order",)
+
+ORDER_INTENT_RE = re.compile(
+    r"\b(buy|purchase|checkout|check out|place (an |my |the |a new )?order|(new|an?) order for|order \d+)\b",
+    re.IGNORECASE,
+)
+SMALL_TALK_RE = re.compile(
+    r"^\W*(hi|hello|hey|thanks|thank you|thx|bye|goodbye|ok|okay|cool|great|good (morning|afternoon|evening))\b",
+    re.IGNORECASE,
+)
+
+# Conditions a route can name, in the order they are documented in config.py
+CONDITIONS = ("write", "long", "chat", "followup")
+
+
+def parse_routes(spec: str) -> list:
+    """[(condition, model)] from "write=model-a,chat=model-b"."""
+    routes = []
+    for part in filter(None, (part.strip() for part in (spec or "").split(","))):
+        condition, _, model = part.partition("=")
+        condition, model = condition.strip().lower(), model.strip()
+        if condition not in CONDITIONS or not model:
+            raise ValueError(f"Bad model route {part!r}: expected <{'|'.join(CONDITIONS)}>=<model>")
+        routes.append((condition, model))
+    return routes
+
+
+def _field(message, name: str):
+    """A field of a message dict or API message object."""
+    return message.get(name) if isinstance(message, dict) else getattr(message, name, None)
+
+
+def _tool_names(message) -> list:
+    names = []
+    for call in _field(message, "tool_calls") or []:
+        function = _field(call, "function")
+        names.append(_field(function, "name") if function is not None else None)
+    return names
+
+
+def turn_features(messages: list, long_history: int = MODEL_LONG_HISTORY) -> set:
+    """The route conditions that hold for an LLM call with these messages.
+
+    write: an order is being placed (a write tool was called, or the user
+    asks to buy); long: the conversation has more than `long_history`
+    messages; chat: the user message is small talk; followup: the call
+    answers from tool results already fetched this turn.
+    """
+    last_user = max((i for i, m in enumerate(messages) if _field(m, "role") == "user"), default=-1)
+    user_text = (_field(messages[last_user], "content") or "") if last_user >= 0 else ""
+    this_turn = messages[last_user + 1:]
+    features = set()
+    if ORDER_INTENT_RE.search(user_text) or any(
+        name in WRITE_TOOLS for message in this_turn for name in _tool_names(message)
+    ):
+        features.add("write")
+    if len(messages) > long_history:
+        features.add("long")
+    if not this_turn and len(user_text.split()) <= 6 and SMALL_TALK_RE.match(user_text) and not re.search(r"[\d@]", user_text):
+        features.add("chat")
+    if any(_field(message, "role") == "tool" for message in this_turn):
+        features.add("followup")
+    return features
+
+
+def should_fail_over(error: BaseException) -> bool:
+    """Whether another model might succeed where this one failed (timeouts, overload, outages)."""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 409, 429) or status >= 500
+    # openai.APITimeoutError / APIConnectionError, without importing openai here
+    return any(cls.__name__ in ("APITimeoutError", "APIConnectionError") for cls in type(error).__mro__)
+
+
+class ModelRouter:
+    """Chooses a model per LLM call and fails over between models.
+
+    The first route whose condition holds for the call (see
+    `turn_features`) picks the model, otherwise `default_model`. The
+    chosen model is tried first, then `fallbacks`, fastest first by
+    their recent time to first byte. Every model except the last one
+    tried must produce its first byte within `ttfb_deadline` seconds
+    (the whole response, for non-streamed calls; only the first chunk,
+    for streamed ones, so a pause mid-answer is not a failure), and is
+    called without
+    the client's own retries. A model that keeps failing is skipped by
+    its circuit breaker for a while, and a model whose median time to
+    first byte is past the deadline is tried after the fallbacks.
+    """
+
+    def __init__(
+        self,
+        default_model: str = MODEL_NAME,
+        routes=MODEL_ROUTES,
+        fallbacks: Optional[list] = None,
+        ttfb_deadline: float = MODEL_TTFB_DEADLINE,
+        long_history: int = MODEL_LONG_HISTORY,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0
+    ):
+        self.default_model = default_model
+        self.routes = parse_routes(routes) if isinstance(routes, str) else list(routes)
+        self.fallbacks = list(MODEL_FALLBACKS if fallbacks is None else fallbacks)
+        self.ttfb_deadline = ttfb_deadline
+        self.long_history = long_history
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency = LatencyTracker(window=100, min_samples=5, min_delay=0.0)
+        self.stats = {"calls": 0, "errors": 0, "failovers": 0}
+        self._breakers = {}
+        self._outcomes = {}  # model -> recent calls, True for an error
+        self._lock = threading.Lock()
+        self._no_retry_clients = {}
+
+    def choose(self, messages: list) -> str:
+        features = turn_features(messages, self.long_history)
+        for condition, model in self.routes:
+            if condition in features:
+                return model
+        return self.default_model
+
+    def candidates(self, model: str) -> list:
+        """Models to try for a call routed to `model`, in order."""
+        deadline = self.ttfb_deadline
+        fallbacks = sorted(
+            (m for m in dict.fromkeys(self.fallbacks) if m != model),
+            key=lambda m: self._median(m, default=deadline)
+        )
+        if fallbacks and self._median(model, default=0.0) > deadline:
+            return fallbacks + [model]
+        return [model] + fallbacks
+
+    def _median(self, model: str, default: float) -> float:
+        median = self.latency.percentile(model, 50)
+        return default if median is None else median
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def _plan(self, messages: list) -> list:
+        models = self.candidates(self.choose(messages))
+        available = [model for model in models if self._breaker(model).available()]
+        # Every circuit open: try the first choice anyway rather than fail the turn
+        return available or models[:1]
+
+    def _attempts(self, messages: list):
+        """(model, last) for each model to try, in order."""
+        models = self._plan(messages)
+        for position, model in enumerate(models):
+            last = position == len(models) - 1
+            # Another call may have claimed a half-open circuit's probe since _plan()
+            if self._breaker(model).allow() or last:
+                yield model, last
+
+    def _record(self, model: str, seconds: Optional[float], error: Optional[BaseException] = None):
+        with self._lock:
+            self.stats["calls"] += 1
+            self._outcomes.setdefault(model, deque(maxlen=50)).append(error is not None)
+            if error is not None:
+                self.stats["errors"] += 1
+        if error is None:
+            self.latency.record(model, seconds)
+            self._breaker(model).record_success()
+        elif should_fail_over(error):
+            self._breaker(model).record_failure()
+            tracer.count("llm_errors", model=model)
+
+    def _failed_over(self, model: str, error: BaseException, backup: str):
+        with self._lock:
+            self.stats["failovers"] += 1
+        tracer.count("llm_failovers", model=model, backup=backup)
+        log(f"LLM model {model} failed ({type(error).__name__}: {error}); failing over to {backup}")
+
+    def _client(self, client, last: bool):
+        """The client for one attempt: no retries of its own unless it's the last model to try."""
+        if last or not hasattr(client, "with_options"):
+            return client
+        with self._lock:
+            cached = self._no_retry_clients.get(id(client))
+            if cached is None or cached[0] is not client:
+                cached = self._no_retry_clients[id(client)] = (client, client.with_options(max_retries=0))
+            return cached[1]
+
+    def health(self) -> dict:
+        """Per-model rolling stats: p50 / p95 time to first byte, error rate, circuit state."""
+        with self._lock:
+            outcomes = {model: list(calls) for model, calls in self._outcomes.items()}
+            breakers = dict(self._breakers)
+        return {
+            model: {
+                "calls": len(calls),
+                "error_rate": sum(calls) / len(calls) if calls else 0.0,
+                "ttfb_p50": self.latency.percentile(model, 50),
+                "ttfb_p95": self.latency.percentile(model, 95),
+                "circuit": breakers[model].state if model in breakers else "closed",
+            }
+            for model, calls in outcomes.items()
+        }
+
+    def complete(self, client, messages: list, stream: bool = False, **kwargs) -> tuple:
+        """(model, response) for `client.chat.completions.create(messages=..., **kwargs)`.
+
+        With `stream`, the response is an iterator of chunks whose first
+        chunk has already arrived; closing it closes the HTTP stream.
+        """
+        failed = None
+        for model, last in self._attempts(messages):
+            if failed is not None:
+                self._failed_over(*failed, model)
+            # A streamed call's deadline is timed separately: the client's
+            # timeout would also apply to every later chunk
+            options = {"stream": True} if stream else {} if last else {"timeout": self.ttfb_deadline}
+            create = self._client(client, last).chat.completions.create
+            start = time.monotonic()
+            try:
+                if stream:
+                    response = _start_stream(
+                        partial(create, model=model, messages=messages, **options, **kwargs),
+                        None if last else self.ttfb_deadline
+                    )
+                else:
+                    response = create(model=model, messages=messages, **options, **kwargs)
+            except Exception as e:
+                self._record(model, None, e)
+                if last or not should_fail_over(e):
+                    raise
+                failed = (model, e)
+                continue
+            self._record(model, time.monotonic() - start)
+            return model, response
+
+    async def acomplete(self, client, messages: list, stream: bool = False, **kwargs) -> tuple:
+        """Async `complete()` for an AsyncOpenAI client."""
+        failed = None
+        for model, last in self._attempts(messages):
+            if failed is not None:
+                self._failed_over(*failed, model)
+            options = {"stream": True} if stream else {}
+            start = time.monotonic()
+            try:
+                response = await self._deadline(self._client(client, last).chat.completions.create(
+                    model=model, messages=messages, **options, **kwargs
+                ), last)
+                if stream:
+                    response = await self._start_astream(response, last, start)
+            except Exception as e:
+                self._record(model, None, e)
+                if last or not should_fail_over(e):
+                    raise
+                failed = (model, e)
+                continue
+            self._record(model, time.monotonic() - start)
+            return model, response
+
+    async def _start_astream(self, stream, last: bool, start: float) -> "_AsyncStartedStream":
+        """`stream` with its first chunk read within the deadline (closed if it misses it)."""
+        try:
+            first = await self._deadline(stream.__anext__(), last, start)
+        except StopAsyncIteration:
+            first = None
+        except BaseException:
+            await _aclose(stream)
+            raise
+        return _AsyncStartedStream(first, stream)
+
+    async def _deadline(self, awaitable, last: bool, start: Optional[float] = None):
+        if last:
+            return await awaitable
+        elapsed = 0.0 if start is None else time.monotonic() - start
+        return await asyncio.wait_for(awaitable, max(0.0, self.ttfb_deadline - elapsed))
+
+
+def _open_stream(create) -> tuple:
+    """(first chunk or None, iterator of the rest, stream) for a new streamed completion."""
+    stream = create()
+    iterator = iter(stream)
+    return next(iterator, None), iterator, stream
+
+
+def _close(stream):
+    close = getattr(stream, "close", None)
+    if close is not None:
+        close()
+
+
+def _close_late(future: Future):
+    if future.exception() is None:
+        _close(future.result()[2])
+
+
+def _start_stream(create, deadline: Optional[float]) -> "_StartedStream":
+    """Start a streamed completion and read its first chunk, within `deadline` seconds if given.
+
+    The wait runs in its own thread, so the deadline covers the first
+    chunk only; a stream that arrives after it is closed when it does.
+    """
+    if deadline is None:
+        return _StartedStream(*_open_stream(create))
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(_open_stream(create))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=propagate(run), name="llm-first-chunk", daemon=True).start()
+    try:
+        return _StartedStream(*future.result(timeout=deadline))
+    except TimeoutError:
+        future.add_done_callback(_close_late)
+        raise TimeoutError(f"No first chunk within {deadline:g}s")
+
+
+class _StartedStream:
+    """A stream whose first chunk was read already: yields it, then the rest. close() closes the stream."""
+
+    def __init__(self, first, iterator, stream):
+        self._first = first
+        self._iterator = iterator
+        self._stream = stream
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._first is not None:
+            chunk, self._first = self._first, None
+            return chunk
+        return next(self._iterator)
+
+    def close(self):
+        _close(self._stream)
+
+
+async def _aclose(stream):
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if close is not None:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
+
+
+class _AsyncStartedStream:
+    """Async _StartedStream; `await close()` closes the stream."""
+
+    def __init__(self, first, stream):
+        self._first = first
+        self._stream = stream
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._first is not None:
+            chunk, self._first = self._first, None
+            return chunk
+        return await self._stream.__anext__()
+
+    async def close(self):
+        await _aclose(self._stream)
@@ -0,0 +1,237 @@
+"""
+Push-based cache invalidation
+Holds one long-lived SSE subscription to the MCP server and drops cached
+catalog data (and refreshes the search index) as change notifications arrive.
+"""
+import json
+import threading
+from typing import Callable, Iterator, Optional
+
+from src.config import (
+    MCP_CONNECT_TIMEOUT, NOTIFY_FALLBACK_MAX_AGE, NOTIFY_IDLE_TIMEOUT, NOTIFY_REFRESH_DELAY
+)
+from src.resilience import RetryPolicy
+from src.tracing import log, tracer
+
+CATALOG_TOOLS = ("list_products", "get_product", "search_products")
+ORDER_TOOLS = ("get_order", "list_orders")
+
+# Resource URI schemes, e.g. product://MON-0054, order://<uuid>, catalog://products
+RESOURCE_KINDS = {
+    "product": "product", "products": "product", "catalog": "catalog",
+    "order": "order", "orders": "order",
+}
+
+
+def iter_sse(lines) -> Iterator[tuple]:
+    """(event, data) pairs from the lines of a text/event-stream body."""
+    event, data = "message", []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.rstrip("\r")
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+            continue
+        if line.startswith(":"):
+            continue  # comment / keep-alive
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            event = value
+        elif field == "data":
+            data.append(value)
+
+
+def parse_resource_uri(uri: str) -> tuple:
+    """(kind, id) for a resource URI; kind is None for resources we don't track."""
+    scheme, _, rest = (uri or "").partition("://")
+    kind = RESOURCE_KINDS.get(scheme.lower())
+    if kind == "catalog" or not rest.strip("/"):
+        return ("catalog" if kind in ("catalog", "product") else kind), None
+    return kind, rest.strip("/").split("/")[-1]
+
+
+class NotificationListener:
+    """One SSE subscription per process, applying change notifications.
+
+    Understands the MCP notifications `notifications/resources/updated`
+    (a product, order or the whole catalog, by URI) and
+    `notifications/resources/list_changed` (the catalog). While the
+    stream is down, `cache.max_age` caps cached results at
+    `fallback_max_age` seconds, and everything cached is dropped on
+    (re)connect since events may have been missed - so long TTLs are only
+    trusted while notifications are actually arriving. Callbacks added
+    with `add_callback()` get (kind, id) for every change, e.g. to drop
+    per-session state derived from an order.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        cache=None,
+        mcp_client=None,
+        search_index=None,
+        retry_policy: Optional[RetryPolicy] = None,
+        fallback_max_age: float = NOTIFY_FALLBACK_MAX_AGE,
+        refresh_delay: float = NOTIFY_REFRESH_DELAY,
+        idle_timeout: float = NOTIFY_IDLE_TIMEOUT
+    ):
+        self.url = url
+        self.cache = cache
+        self.mcp_client = mcp_client
+        self.search_index = search_index
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=0, base_delay=0.5, max_delay=30.0)
+        self.fallback_max_age = fallback_max_age
+        self.refresh_delay = refresh_delay
+        self.idle_timeout = idle_timeout
+        self.connected = False
+        self.stats = {"connects": 0, "events": 0, "invalidations": 0, "ignored": 0, "errors": 0}
+        self._callbacks = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._response = None
+        self._refresh_timer = None
+        self._thread = None
+        if self.cache is not None:
+            self.cache.max_age = self.fallback_max_age
+
+    def add_callback(self, callback: Callable):
+        self._callbacks.append(callback)
+
+    def start(self) -> "NotificationListener":
+        self._thread = threading.Thread(target=self._run, name="mcp-notifications", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            response = self._response
+        if response is not None:
+            response.close()
+
+    def _run(self):
+        import requests
+
+        session = requests.Session()
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                self._listen(session)
+                failures = 0
+            except Exception as e:
+                self.stats["errors"] += 1
+                failures += 1
+                if not self._stop.is_set():
+                    log(f"Notification stream failed: {e}")
+            finally:
+                self._set_connected(False)
+            self._stop.wait(self.retry_policy.delay(min(failures, 10)))
+        session.close()
+
+    def _listen(self, session):
+        response = session.get(
+            self.url, headers={"Accept": "text/event-stream"}, stream=True,
+            timeout=(MCP_CONNECT_TIMEOUT, self.idle_timeout)
+        )
+        with self._lock:
+            self._response = response
+        try:
+            response.raise_for_status()
+            if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                raise ValueError(f"not an event stream: {response.headers.get('Content-Type')}")
+            self._set_connected(True)
+            # chunk_size=1: hand each event over as soon as it arrives, not when a buffer fills
+            for _, data in iter_sse(response.iter_lines(chunk_size=1, decode_unicode=True)):
+                if self._stop.is_set():
+                    break
+                self.handle(data)
+        finally:
+            with self._lock:
+                self._response = None
+            response.close()
+
+    def _set_connected(self, connected: bool):
+        if connected == self.connected:
+            return
+        self.connected = connected
+        tracer.count("mcp_notifications_connected" if connected else "mcp_notifications_disconnected")
+        if connected:
+            self.stats["connects"] += 1
+            log("Subscribed to MCP notifications")
+            if self.cache is not None:
+                # Anything cached before now may have missed its invalidation
+                self.cache.invalidate()
+                self.cache.max_age = None
+        elif self.cache is not None:
+            self.cache.max_age = self.fallback_max_age
+
+    def handle(self, data: str):
+        """Apply one event's data: a JSON-RPC notification or a batch of them."""
+        try:
+            message = json.loads(data)
+        except ValueError:
+            self.stats["ignored"] += 1
+            return
+        for notification in message if isinstance(message, list) else [message]:
+            if isinstance(notification, dict):
+                self._apply(notification.get("method"), notification.get("params") or {})
+
+    def _apply(self, method: str, params: dict):
+        if method == "notifications/resources/list_changed":
+            kind, item_id = "catalog", None
+        elif method == "notifications/resources/updated":
+            kind, item_id = parse_resource_uri(params.get("uri", ""))
+        else:
+            kind, item_id = None, None
+        if kind is None:
+            self.stats["ignored"] += 1
+            return
+
+        tracer.count("mcp_notifications", kind=kind)
+        log(f"Change notification: {kind}", id=item_id)
+        if kind in ("product", "catalog"):
+            self._invalidate_catalog(item_id)
+        elif kind == "order":
+            # Order data is never cached by default; this only matters if a TTL was configured
+            self._invalidate(ORDER_TOOLS)
+        for callback in self._callbacks:
+            try:
+                callback(kind, item_id)
+            except Exception as e:
+                log(f"Notification callback failed: {e}")
+        self.stats["events"] += 1
+
+    def _invalidate_catalog(self, sku: Optional[str]):
+        if sku is not None and self.cache is not None:
+            # One product changed: its lookup, and any listing or search that may include it
+            self.cache.invalidate_call("get_product", {"sku": sku})
+            self.stats["invalidations"] += 1
+            self._invalidate(("list_products", "search_products"))
+        else:
+            self._invalidate(CATALOG_TOOLS)
+        self._schedule_index_refresh()
+
+    def _invalidate(self, tools: tuple):
+        if self.cache is None:
+            return
+        for tool_name in tools:
+            self.cache.invalidate(tool_name)
+        self.stats["invalidations"] += len(tools)
+
+    def _schedule_index_refresh(self):
+        """Refresh the search index once per burst of catalog changes."""
+        if self.search_index is None or self.mcp_client is None:
+            return
+        with self._lock:
+            if self._refresh_timer is not None and self._refresh_timer.is_alive():
+                return
+            self._refresh_timer = threading.Timer(
+                self.refresh_delay, self.search_index.refresh, args=(self.mcp_client,)
+            )
+            self._refresh_timer.daemon = True
+            self._refresh_timer.start()
@@ -0,0 +1,143 @@
+"""
+Speculative prefetch of MCP lookups
+Starts the reads a turn is likely to need while the LLM is still deciding on them.
+"""
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from src.cache import cache_key
+from src.config import PREFETCH_MAX_CALLS, PREFETCH_WORKERS
+from src.history import extract_entities
+from src.tracing import log, propagate, tracer
+
+
+def predict_calls(user_message: str) -> list:
+    """(tool_name, arguments) pairs the LLM is likely to request for this message.
+
+    Emails are not used directly: the only email-keyed tool is
+    verify_customer_pin, which must never run speculatively. Orders for a
+    verified customer are prefetched from its result instead (see observe()).
+    """
+    entities = extract_entities(user_message)
+    calls = [("get_order", {"order_id": order_id}) for order_id in entities["order_ids"]]
+    calls += [("list_orders", {"customer_id": customer_id}) for customer_id in entities["customer_ids"]]
+    calls += [("get_product", {"sku": sku}) for sku in entities["skus"]]
+    return calls
+
+
+def verified_customer_id(result: str) -> Optional[str]:
+    """Customer id from a successful verify_customer_pin result, if any."""
+    try:
+        data = json.loads(result)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or not data.get("verified"):
+        return None
+    return data.get("customer_id") or data.get("id")
+
+
+class Prefetcher:
+    """Runs speculative MCP reads on a small thread pool.
+
+    Process-wide, like the MCP client. Each chat turn gets its own
+    PrefetchTurn from `start()`; counters cover all turns.
+    """
+
+    def __init__(self, mcp_client, max_calls: int = PREFETCH_MAX_CALLS, workers: int = PREFETCH_WORKERS):
+        self.mcp_client = mcp_client
+        self.max_calls = max_calls
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self.stats = {"issued": 0, "hits": 0, "wasted": 0, "over_budget": 0}
+
+    def start(self, user_message: str) -> "PrefetchTurn":
+        turn = PrefetchTurn(self)
+        for tool_name, arguments in predict_calls(user_message):
+            turn.submit(tool_name, arguments)
+        return turn
+
+    @property
+    def hit_rate(self) -> float:
+        with self._lock:
+            done = self.stats["hits"] + self.stats["wasted"]
+            return self.stats["hits"] / done if done else 0.0
+
+    def _count(self, name: str, tool_name: str):
+        with self._lock:
+            self.stats[name] += 1
+        tracer.count(f"prefetch_{name}", tool=tool_name)
+
+
+class PrefetchTurn:
+    """The speculative calls of one chat turn.
+
+    `take()` hands a pending result to the matching real tool call, waiting
+    for it if needed (async callers use `claim()` and `settle()`).
+    `finish()` counts whatever was never asked for as wasted.
+    """
+
+    def __init__(self, prefetcher: Prefetcher):
+        self.prefetcher = prefetcher
+        self._pending = {}  # cache key -> (tool_name, future)
+        self._issued = 0
+        self._lock = threading.Lock()
+
+    def submit(self, tool_name: str, arguments: dict):
+        key = cache_key(tool_name, arguments)
+        with self._lock:
+            if key in self._pending:
+                return
+            if self._issued >= self.prefetcher.max_calls:
+                over_budget = True
+            else:
+                over_budget = False
+                self._issued += 1
+                future = self.prefetcher._executor.submit(
+                    propagate(self.prefetcher.mcp_client.call_tool), tool_name, arguments
+                )
+                self._pending[key] = (tool_name, future)
+        if over_budget:
+            self.prefetcher._count("over_budget", tool_name)
+            return
+        self.prefetcher._count("issued", tool_name)
+        log(f"Prefetching {tool_name}", args=arguments)
+
+    def take(self, tool_name: str, arguments: dict) -> Optional[str]:
+        """The prefetched result for this exact call, or None."""
+        future = self.claim(tool_name, arguments)
+        if future is None:
+            return None
+        return self.settle(tool_name, future.result())
+
+    def claim(self, tool_name: str, arguments: dict) -> Optional[Future]:
+        """Remove and return the pending future for this call, without waiting on it."""
+        with self._lock:
+            entry = self._pending.pop(cache_key(tool_name, arguments), None)
+        return entry[1] if entry is not None else None
+
+    def settle(self, tool_name: str, result: str) -> Optional[str]:
+        """Count a claimed result as a hit, or as wasted if the real call must retry."""
+        if result.startswith("Error"):
+            self.prefetcher._count("wasted", tool_name)
+            return None
+        self.prefetcher._count("hits", tool_name)
+        return result
+
+    def observe(self, tool_name: str, result: str):
+        """Speculate on follow-ups to a real tool result."""
+        if tool_name == "verify_customer_pin":
+            customer_id = verified_customer_id(result)
+            if customer_id:
+                self.submit("list_orders", {"customer_id": customer_id})
+                self.submit("get_customer", {"customer_id": customer_id})
+
+    def finish(self):
+        """Count unused speculative calls as wasted and drop queued ones."""
+        with self._lock:
+            leftovers = list(self._pending.values())
+            self._pending.clear()
+        for tool_name, future in leftovers:
+            future.cancel()
+            self.prefetcher._count("wasted", tool_name)
@@ -0,0 +1,191 @@
+"""
+Resilience primitives for MCP calls
+Jittered retries, rolling latency tracking for hedged requests, a circuit
+breaker, and single-flight coalescing of identical concurrent reads (for
+threads and for coroutines).
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from src.config import (
+    MCP_RETRY_ATTEMPTS, MCP_RETRY_BASE_DELAY, MCP_RETRY_MAX_DELAY,
+    MCP_HEDGE_MIN_DELAY, MCP_HEDGE_MIN_SAMPLES,
+    BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT
+)
+
+# Read-only tools that are safe to retry and hedge. verify_customer_pin is
+# left out so a retry can never count as an extra failed PIN attempt, and
+# create_order must never be sent twice.
+IDEMPOTENT_TOOLS = frozenset({
+    "list_products", "get_product", "search_products",
+    "get_customer", "list_orders", "get_order",
+})
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+
+    def __init__(
+        self,
+        max_attempts: int = MCP_RETRY_ATTEMPTS,
+        base_delay: float = MCP_RETRY_BASE_DELAY,
+        max_delay: float = MCP_RETRY_MAX_DELAY
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after failed attempt number `attempt` (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class LatencyTracker:
+    """Rolling per-tool latency samples, used to decide when to hedge."""
+
+    def __init__(self, window: int = 200, min_samples: int = MCP_HEDGE_MIN_SAMPLES, min_delay: float = MCP_HEDGE_MIN_DELAY):
+        self.window = window
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, tool_name: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(tool_name, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, tool_name: str, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(tool_name, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(pct / 100 * len(samples)))]
+
+    def hedge_delay(self, tool_name: str) -> Optional[float]:
+        """How long to wait before sending a duplicate request, or None to not hedge."""
+        p95 = self.percentile(tool_name, 95)
+        if p95 is None:
+            return None
+        return max(self.min_delay, p95)
+
+
+class CircuitBreaker:
+    """Fails fast after repeated transport failures.
+
+    closed -> open after `failure_threshold` consecutive failures; open ->
+    half-open after `reset_timeout` seconds, letting one probe through;
+    the probe's outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def available(self) -> bool:
+        """Whether `allow()` might let a call through now, without claiming the half-open probe."""
+        with self._lock:
+            return self.state != "open" or time.monotonic() - self._opened_at >= self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.stats["opened"] += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class SingleFlight:
+    """Shares one in-flight call between concurrent callers with the same key.
+
+    The first caller (the leader) runs the call; callers arriving while it
+    is in flight wait for and return its result instead of starting their
+    own. Nothing is remembered once the call finishes - that is the
+    cache's job.
+    """
+
+    def __init__(self):
+        self._in_flight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    def do(self, key: str, call: Callable) -> tuple:
+        """(result, shared): shared is True if the result came from another caller's call."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.stats["leaders"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return result, False
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop.
+
+    The leader's call runs as a task, so callers that joined it still get
+    the result if the leader itself is cancelled.
+    """
+
+    def __init__(self):
+        self._in_flight = {}  # key -> Task
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    async def do(self, key: str, call: Callable) -> tuple:
+        """(result, shared) of awaiting `call()`; see SingleFlight.do."""
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if shared:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["leaders"] += 1
+            task = self._in_flight[key] = asyncio.ensure_future(call())
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task), shared
@@ -0,0 +1,130 @@
+"""
+Deterministic fast path for obvious lookups
+Recognizes bare SKU and order-ID questions so they skip the tool-choice LLM call.
+"""
+import json
+import re
+import threading
+from collections import namedtuple
+from typing import Optional
+
+from src.config import FAST_PATH_THRESHOLD
+
+SKU_RE = re.compile(r"\b([A-Z]{3}-\d{4})\b", re.IGNORECASE)
+UUID_RE = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE)
+WORD_RE = re.compile(r"[a-z']+")
+
+# Words that fit a plain "look this up" question
+LOOKUP_WORDS = {
+    "a", "about", "an", "any", "can", "check", "details", "detail", "do", "does", "for",
+    "get", "give", "have", "how", "i", "info", "information", "is", "it", "know", "look",
+    "lookup", "me", "my", "of", "on", "order", "please", "product", "s", "see", "show",
+    "sku", "status", "tell", "the", "this", "up", "what", "whats", "what's", "where",
+    "which", "you", "item", "hi", "hello", "thanks", "id", "number",
+}
+# Words that mean the user wants more than a lookup
+COMPLEX_WORDS = {
+    "buy", "purchase", "cancel", "change", "update", "compare", "versus", "vs", "cheaper",
+    "alternative", "alternatives", "similar", "instead", "recommend", "customer", "pin",
+    "verify", "return", "refund", "add", "remove", "and", "or", "but", "than",
+}
+# Confidence lost for each word that is neither a lookup word nor complex
+UNKNOWN_WORD_PENALTY = 0.15
+
+Route = namedtuple("Route", ["tool_name", "arguments", "confidence"])
+
+
+class FastPathRouter:
+    """Maps a user message onto a single get_product / get_order call.
+
+    `route()` returns a Route when the message is a single SKU or order-ID
+    lookup with confidence at or above the threshold, else None. Counters
+    record how often the fast path is taken.
+    """
+
+    def __init__(self, threshold: float = FAST_PATH_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.stats = {"taken": 0, "skipped": 0, "below_threshold": 0}
+
+    def classify(self, message: str) -> Optional[Route]:
+        """Best single-lookup interpretation of `message`, ignoring the threshold."""
+        skus = {sku.upper() for sku in SKU_RE.findall(message)}
+        uuids = {uuid.lower() for uuid in UUID_RE.findall(message)}
+        if len(skus) + len(uuids) != 1:
+            return None
+
+        rest = UUID_RE.sub(" ", SKU_RE.sub(" ", message.lower()))
+        words = WORD_RE.findall(rest)
+        if any(word in COMPLEX_WORDS for word in words):
+            return None
+        unknown = [word for word in words if word not in LOOKUP_WORDS]
+        confidence = max(0.0, 1.0 - UNKNOWN_WORD_PENALTY * len(unknown))
+
+        if skus:
+            return Route("get_product", {"sku": skus.pop()}, confidence)
+        return Route("get_order", {"order_id": uuids.pop()}, confidence)
+
+    def route(self, message: str) -> Optional[Route]:
+        route = self.classify(message)
+        with self._lock:
+            if route is None:
+                self.stats["skipped"] += 1
+                return None
+            if route.confidence < self.threshold:
+                self.stats["below_threshold"] += 1
+                return None
+            self.stats["taken"] += 1
+            return route
+
+
+def _first(data: dict, *keys):
+    return next((data[key] for key in keys if data.get(key) not in (None, "")), None)
+
+
+def render_answer(route: Route, result: str) -> Optional[str]:
+    """Templated answer for a fast-path result, or None if it can't be rendered."""
+    try:
+        data = json.loads(result)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or "error" in data:
+        return None
+
+    if route.tool_name == "get_product":
+        name = _first(data, "name", "title")
+        if name is None:
+            return None
+        lines = [f"**{name}** ({_first(data, 'sku') or route.arguments['sku']})"]
+        price = _first(data, "price", "unit_price")
+        if price is not None:
+            lines.append(f"- Price: ${price} {_first(data, 'currency') or 'USD'}")
+        category = _first(data, "category")
+        if category:
+            lines.append(f"- Category: {category}")
+        stock = _first(data, "stock", "stock_quantity", "quantity_available")
+        if stock is not None:
+            lines.append(f"- In stock: {stock}")
+        description = _first(data, "description")
+        if description:
+            lines.append("")
+            lines.append(str(description))
+        return "\n".join(lines)
+
+    status = _first(data, "status")
+    if status is None:
+        return None
+    lines = [f"**Order {_first(data, 'id', 'order_id') or route.arguments['order_id']}**", f"- Status: {status}"]
+    total = _first(data, "total", "total_amount")
+    if total is not None:
+        lines.append(f"- Total: ${total} {_first(data, 'currency') or 'USD'}")
+    created = _first(data, "created_at", "order_date")
+    if created:
+        lines.append(f"- Placed: {created}")
+    items = data.get("items") or []
+    if isinstance(items, list) and items:
+        lines.append("- Items:")
+        for item in items:
+            if isinstance(item, dict):
+                lines.append(f"  - {item.get('quantity', 1)} x {_first(item, 'name', 'sku') or 'item'}")
+    return "\n".join(lines)
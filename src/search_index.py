@@ -0,0 +1,232 @@
+"""
+Local ranked product search
+BM25 over product name and description, built from a list_products snapshot.
+"""
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+# BM25 parameters and per-field weights
+K1 = 1.2
+B = 0.75
+FIELD_WEIGHTS = {"name": 2.0, "description": 1.0}
+# Score multiplier for terms matched through typo tolerance
+FUZZY_WEIGHT = 0.5
+# Shortest query term that may be corrected with one edit
+MIN_FUZZY_LENGTH = 4
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def stem(token: str) -> str:
+    """Very small suffix stripper: monitors -> monitor, printing -> print."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(("ches", "shes", "sses", "xes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    if token.endswith("ing") and len(token) > 5:
+        return token[:-3]
+    if token.endswith("ed") and len(token) > 4:
+        return token[:-2]
+    return token
+
+
+def tokenize(text: str) -> list:
+    """Lowercase, split on non-alphanumerics and stem."""
+    return [stem(token) for token in TOKEN_RE.findall((text or "").lower())]
+
+
+def _deletes(term: str) -> set:
+    """All variants of `term` with one character removed."""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if a and b differ by one insert, delete, substitution or transposition."""
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return a == b
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return (
+            len(diffs) == 2 and diffs[1] == diffs[0] + 1
+            and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]]
+        )
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    return any(longer[:i] + longer[i + 1:] == shorter for i in range(len(longer)))
+
+
+def parse_products(text: str) -> Optional[list]:
+    """Extract the product list from a list_products result text.
+
+    Returns None if the text is not a JSON product listing.
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    if isinstance(data, dict):
+        data = next((data[key] for key in ("products", "items", "data") if isinstance(data.get(key), list)), None)
+    if not isinstance(data, list):
+        return None
+    return [item for item in data if isinstance(item, dict) and item.get("sku")]
+
+
+class ProductSearchIndex:
+    """Inverted index over the product catalog, ranked with BM25.
+
+    The index is "warm" once it has been built from a catalog snapshot.
+    `update()` only re-indexes products that were added, changed or
+    removed since the previous snapshot.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._products = {}      # sku -> product dict
+        self._signatures = {}    # sku -> content hash
+        self._postings = defaultdict(dict)  # term -> {sku: {field: tf}}
+        self._lengths = {}       # sku -> {field: token count}
+        self._doc_terms = {}     # sku -> set of indexed terms
+        self._field_totals = defaultdict(int)
+        self._deletes = defaultdict(set)    # one-deletion variant -> terms
+        self.built_at: Optional[float] = None
+        self.stats = {"searches": 0, "rebuilds": 0, "docs_reindexed": 0}
+
+    @property
+    def is_warm(self) -> bool:
+        return self.built_at is not None
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def update(self, products: list):
+        """Bring the index in line with a full catalog snapshot."""
+        with self._lock:
+            incoming = {}
+            for product in products:
+                signature = hashlib.sha1(
+                    json.dumps(product, sort_keys=True, default=str).encode("utf-8")
+                ).hexdigest()
+                incoming[product["sku"]] = (product, signature)
+
+            for sku in list(self._products):
+                if sku not in incoming or incoming[sku][1] != self._signatures[sku]:
+                    self._remove(sku)
+            for sku, (product, signature) in incoming.items():
+                if sku not in self._products:
+                    self._add(product, signature)
+                    self.stats["docs_reindexed"] += 1
+
+            self.built_at = time.time()
+            self.stats["rebuilds"] += 1
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """Return up to `limit` products ranked by BM25 relevance."""
+        with self._lock:
+            self.stats["searches"] += 1
+            doc_count = len(self._products)
+            if not doc_count:
+                return []
+
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                for matched, weight in self._expand(term):
+                    postings = self._postings[matched]
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for sku, field_tfs in postings.items():
+                        for field, tf in field_tfs.items():
+                            avg_length = self._field_totals[field] / doc_count or 1
+                            norm = K1 * (1 - B + B * self._lengths[sku][field] / avg_length)
+                            scores[sku] += weight * FIELD_WEIGHTS[field] * idf * tf * (K1 + 1) / (tf + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            return [self._products[sku] for sku, _ in ranked[:limit]]
+
+    def _expand(self, term: str) -> list:
+        """Exact match, or terms one edit away when the exact term is unknown."""
+        if term in self._postings:
+            return [(term, 1.0)]
+        if len(term) < MIN_FUZZY_LENGTH:
+            return []
+        candidates = set(self._deletes.get(term, ()))
+        for variant in _deletes(term):
+            if variant in self._postings:
+                candidates.add(variant)
+            candidates.update(self._deletes.get(variant, ()))
+        return [
+            (candidate, FUZZY_WEIGHT)
+            for candidate in sorted(candidates)
+            if _within_one_edit(term, candidate)
+        ]
+
+    def _fields(self, product: dict) -> dict:
+        description = " ".join(
+            str(product.get(key) or "") for key in ("description", "category")
+        )
+        return {
+            "name": tokenize(f"{product.get('name') or ''} {product['sku']}"),
+            "description": tokenize(description),
+        }
+
+    def _add(self, product: dict, signature: str):
+        sku = product["sku"]
+        self._products[sku] = product
+        self._signatures[sku] = signature
+        self._lengths[sku] = {}
+        self._doc_terms[sku] = set()
+        for field, tokens in self._fields(product).items():
+            self._lengths[sku][field] = len(tokens)
+            self._doc_terms[sku].update(tokens)
+            self._field_totals[field] += len(tokens)
+            for token in tokens:
+                if token not in self._postings:
+                    for variant in _deletes(token):
+                        self._deletes[variant].add(token)
+                field_tfs = self._postings[token].setdefault(sku, {})
+                field_tfs[field] = field_tfs.get(field, 0) + 1
+
+    def _remove(self, sku: str):
+        for field, length in self._lengths.pop(sku).items():
+            self._field_totals[field] -= length
+        for term in self._doc_terms.pop(sku):
+            del self._postings[term][sku]
+            if not self._postings[term]:
+                del self._postings[term]
+                for variant in _deletes(term):
+                    self._deletes[variant].discard(term)
+                    if not self._deletes[variant]:
+                        del self._deletes[variant]
+        del self._products[sku]
+        del self._signatures[sku]
+
+    def refresh(self, mcp_client) -> bool:
+        """Rebuild from a fresh list_products snapshot. Returns True on success."""
+        products = parse_products(mcp_client.list_products())
+        if products is None:
+            return False
+        self.update(products)
+        return True
+
+    def start_background_refresh(self, mcp_client, interval: float) -> threading.Thread:
+        """Warm the index now and keep refreshing it every `interval` seconds."""
+        def run():
+            while True:
+                try:
+                    self.refresh(mcp_client)
+                except Exception:
+                    pass
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="search-index-refresh", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,246 @@
+"""
+Headless chat API server
+Async HTTP front end for the chat engine, for custom frontends and load balancers.
+
+Usage: python -m src.server --port 8080
+
+    POST   /sessions                  -> {"session_id": ...}
+    GET    /sessions/{id}             -> {"session_id": ..., "first_turn": n, "messages": [...]}
+           ?before=<turn>&turns=<n>   older turns, for scrolling back
+    DELETE /sessions/{id}
+    POST   /sessions/{id}/messages    {"content": "...", "stream": false} -> {"reply": "..."}
+    GET    /health
+    GET    /metrics                   Prometheus text format
+
+With "stream": true (or `Accept: text/event-stream`) the reply is sent as
+server-sent events: `token` events carrying {"text": ...} as the LLM produces
+them, then one `done` event carrying {"reply": ...}.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import (
+    OPENROUTER_API_KEY, OPENROUTER_BASE_URL, SEARCH_INDEX_ENABLED, SEARCH_INDEX_REFRESH,
+    FAST_PATH_ENABLED, PREFETCH_ENABLED, SERVER_HOST, SERVER_PORT, SESSION_IDLE_TIMEOUT,
+    MCP_NOTIFICATIONS_ENABLED
+)
+from src.async_engine import AsyncChatEngine
+from src.async_mcp_client import AsyncMCPClient
+from src.cache import ToolCache
+from src.compaction import ResultStore
+from src.conversation_store import chat_messages, open_store
+from src.customer_context import CustomerContext
+from src.mcp_client import MCPClient
+from src.prefetch import Prefetcher
+from src.router import FastPathRouter
+from src.search_index import ProductSearchIndex
+from src.tracing import log, tracer
+
+ENGINE = web.AppKey("engine", AsyncChatEngine)
+SESSIONS = web.AppKey("sessions", dict)
+EXPIRY_TASK = web.AppKey("expiry_task", asyncio.Task)
+
+
+class ChatSession:
+    """In-process state of a conversation whose history lives in the engine's store."""
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.result_store = ResultStore()
+        # Lost on restart, on purpose: verification is never read back from the store
+        self.customer_context = CustomerContext()
+        # One turn at a time per session; other sessions run concurrently
+        self.lock = asyncio.Lock()
+
+
+def build_engine() -> AsyncChatEngine:
+    """Engine wired to the configured MCP server, OpenRouter and conversation store."""
+    from openai import AsyncOpenAI
+
+    cache = ToolCache()
+    # Background work (index refresh, prefetch) runs on threads with a sync client sharing the cache
+    sync_client = MCPClient(cache=cache)
+    search_index = None
+    if SEARCH_INDEX_ENABLED:
+        search_index = ProductSearchIndex()
+        search_index.start_background_refresh(sync_client, SEARCH_INDEX_REFRESH)
+    if MCP_NOTIFICATIONS_ENABLED:
+        # Invalidates the shared cache for both clients
+        sync_client.subscribe(search_index=search_index)
+
+    return AsyncChatEngine(
+        mcp_client=AsyncMCPClient(cache=cache),
+        llm_client=AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY) if OPENROUTER_API_KEY else None,
+        search_index=search_index,
+        fast_path_router=FastPathRouter() if FAST_PATH_ENABLED else None,
+        prefetcher=Prefetcher(sync_client) if PREFETCH_ENABLED else None,
+        store=open_store()
+    )
+
+
+def _json_error(error_class, message: str):
+    return error_class(text=json.dumps({"error": message}), content_type="application/json")
+
+
+async def _session(request: web.Request) -> ChatSession:
+    session_id = request.match_info["session_id"]
+    sessions = request.app[SESSIONS]
+    if session_id not in sessions:
+        # Sessions survive restarts in the store; their in-process state is rebuilt lazily
+        if not await asyncio.to_thread(request.app[ENGINE].store.has_session, session_id):
+            raise _json_error(web.HTTPNotFound, "Unknown session")
+        sessions.setdefault(session_id, ChatSession(session_id))
+    return sessions[session_id]
+
+
+async def create_session(request: web.Request) -> web.Response:
+    session_id = await asyncio.to_thread(request.app[ENGINE].store.create_session)
+    request.app[SESSIONS][session_id] = ChatSession(session_id)
+    return web.json_response({"session_id": session_id}, status=201)
+
+
+async def get_session(request: web.Request) -> web.Response:
+    """Recent messages, or with ?before=<turn>&turns=<n> older ones (for scrolling back)."""
+    session = await _session(request)
+    store = request.app[ENGINE].store
+    if "before" in request.query:
+        try:
+            before = int(request.query["before"])
+            count = int(request.query.get("turns", "10"))
+        except ValueError:
+            raise _json_error(web.HTTPBadRequest, "before and turns must be integers")
+        records = await asyncio.to_thread(store.load_turns, session.id, before, count)
+        first_turn = max(0, before - count)
+    else:
+        first_turn, records = await asyncio.to_thread(store.recent, session.id)
+    return web.json_response({
+        "session_id": session.id,
+        "first_turn": first_turn,
+        "messages": chat_messages(records),
+    })
+
+
+async def delete_session(request: web.Request) -> web.Response:
+    session_id = request.match_info["session_id"]
+    request.app[SESSIONS].pop(session_id, None)
+    await asyncio.to_thread(request.app[ENGINE].store.delete_session, session_id)
+    return web.Response(status=204)
+
+
+async def post_message(request: web.Request) -> web.StreamResponse:
+    session = await _session(request)
+    try:
+        body = await request.json()
+    except ValueError:
+        raise _json_error(web.HTTPBadRequest, "Body must be JSON")
+    content = (body.get("content") or "").strip() if isinstance(body, dict) else ""
+    if not content:
+        raise _json_error(web.HTTPBadRequest, "content is required")
+    stream = body.get("stream") or "text/event-stream" in request.headers.get("Accept", "")
+
+    engine = request.app[ENGINE]
+    async with session.lock:
+        if not stream:
+            reply = await engine.get_bot_response(
+                content, result_store=session.result_store, session_id=session.id,
+                customer_context=session.customer_context
+            )
+            return web.json_response({"reply": reply})
+
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+        await response.prepare(request)
+        tokens = []
+        replies = engine.stream_bot_response(
+            content, result_store=session.result_store, session_id=session.id,
+            customer_context=session.customer_context
+        )
+        try:
+            async for token in replies:
+                tokens.append(token)
+                await response.write(_sse("token", {"text": token}))
+            await response.write(_sse("done", {"reply": "".join(tokens)}))
+        except ConnectionResetError:
+            log("Client disconnected mid-stream", session=session.id)
+        finally:
+            # Saves the (possibly partial) turn
+            await replies.aclose()
+        return response
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", "sessions": len(request.app[SESSIONS])})
+
+
+async def metrics(request: web.Request) -> web.Response:
+    return web.Response(text=tracer.render_prometheus(), content_type="text/plain")
+
+
+async def _expire_sessions(app: web.Application):
+    """Drop sessions idle for longer than SESSION_IDLE_TIMEOUT, checking every minute or so."""
+    interval = max(1, min(60, SESSION_IDLE_TIMEOUT // 10))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            expired = await asyncio.to_thread(app[ENGINE].store.expire_idle, SESSION_IDLE_TIMEOUT)
+        except Exception as e:
+            log(f"Session expiry failed: {e}")
+            continue
+        for session_id in expired:
+            app[SESSIONS].pop(session_id, None)
+        if expired:
+            log(f"Expired {len(expired)} idle sessions")
+
+
+async def _start_background(app: web.Application):
+    app[EXPIRY_TASK] = asyncio.ensure_future(_expire_sessions(app))
+
+
+async def _cleanup(app: web.Application):
+    app[EXPIRY_TASK].cancel()
+    await app[ENGINE].mcp_client.aclose()
+    app[ENGINE].store.close()
+
+
+def create_app(engine: AsyncChatEngine) -> web.Application:
+    """The API application; `engine.store` holds the conversations."""
+    app = web.Application()
+    app[ENGINE] = engine
+    app[SESSIONS] = {}
+    app.add_routes([
+        web.post("/sessions", create_session),
+        web.get("/sessions/{session_id}", get_session),
+        web.delete("/sessions/{session_id}", delete_session),
+        web.post("/sessions/{session_id}/messages", post_message),
+        web.get("/health", health),
+        web.get("/metrics", metrics),
+    ])
+    app.on_startup.append(_start_background)
+    app.on_cleanup.append(_cleanup)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the chat API server")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+    web.run_app(create_app(build_engine()), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
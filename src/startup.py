@@ -0,0 +1,62 @@
+"""
+Startup helpers
+Keep the first page paint cheap: heavy clients are built on first use, and
+a background thread builds them and opens the MCP connection ahead of the
+first chat turn.
+"""
+import threading
+
+from src.tracing import log, tracer
+
+
+class Lazy:
+    """A value built by `factory` on first `get()`; thread-safe, built once.
+
+    The factory should do its own heavy imports, so merely creating the
+    Lazy costs nothing.
+    """
+
+    def __init__(self, factory, name: str):
+        self.factory = factory
+        self.name = name
+        self._value = None
+        self._built = False
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def get(self):
+        if self._built:
+            return self._value
+        with self._lock:
+            if not self._built:
+                with tracer.span("startup_build", resource=self.name):
+                    self._value = self.factory()
+                self._built = True
+        return self._value
+
+
+def resolve(value):
+    """`value`, or what it builds if it is a Lazy."""
+    return value.get() if isinstance(value, Lazy) else value
+
+
+def warm_up(*resources, mcp_client=None) -> threading.Thread:
+    """Build any Lazy `resources` and open the MCP client's connection from a daemon thread."""
+    def run():
+        with tracer.span("startup_warm_up") as span:
+            for lazy in resources:
+                if not isinstance(lazy, Lazy):
+                    continue
+                try:
+                    lazy.get()
+                except Exception as e:
+                    log(f"Warm-up of {lazy.name} failed: {e}")
+            if mcp_client is not None:
+                span.set("mcp_connected", mcp_client.warm_up())
+
+    thread = threading.Thread(target=run, name="startup-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,85 @@
+"""
+Logic shared by the sync and async code paths
+Code that must run both ways (the chat engine's turn loop, the MCP
+clients' retry and batch rules) is written once, as a generator that
+yields each call doing I/O as a (function, *args) step instead of making
+it. A driver makes the call and sends its result back in (or throws its
+exception in): run_steps / stream_steps call it directly, arun_steps /
+astream_steps also await it when it returns an awaitable.
+"""
+import inspect
+
+
+def _call(step) -> tuple:
+    try:
+        return step[0](*step[1:]), None
+    except Exception as e:
+        return None, e
+
+
+async def _acall(step) -> tuple:
+    try:
+        value = step[0](*step[1:])
+        if inspect.isawaitable(value):
+            value = await value
+        return value, None
+    except Exception as e:
+        return None, e
+
+
+def run_steps(steps):
+    """Run `steps` to completion and return its return value."""
+    value, error = None, None
+    while True:
+        try:
+            step = steps.send(value) if error is None else steps.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        value, error = _call(step)
+
+
+def stream_steps(steps):
+    """Run `steps`, passing on the text tokens (str) it yields between steps."""
+    value, error = None, None
+    try:
+        while True:
+            try:
+                step = steps.send(value) if error is None else steps.throw(error)
+            except StopIteration:
+                return
+            if isinstance(step, str):
+                value, error = None, None
+                yield step
+            else:
+                value, error = _call(step)
+    finally:
+        steps.close()
+
+
+async def arun_steps(steps):
+    """Async run_steps."""
+    value, error = None, None
+    while True:
+        try:
+            step = steps.send(value) if error is None else steps.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        value, error = await _acall(step)
+
+
+async def astream_steps(steps):
+    """Async stream_steps."""
+    value, error = None, None
+    try:
+        while True:
+            try:
+                step = steps.send(value) if error is None else steps.throw(error)
+            except StopIteration:
+                return
+            if isinstance(step, str):
+                value, error = None, None
+                yield step
+            else:
+                value, error = await _acall(step)
+    finally:
+        steps.close()
@@ -0,0 +1,248 @@
+"""
+Incremental decoding of MCP tool results
+Yields the records of a list result (a JSON array inside the JSON-RPC
+envelope's result.content[0].text string) while the response body is
+still arriving, so memory is bounded by the largest record rather than
+the whole result.
+"""
+import codecs
+import json
+import re
+from typing import Iterable, Iterator
+
+# Where list results live in a tools/call response
+TEXT_PATH = ("result", "content", 0, "text")
+
+# Longest run of complete string content: plain characters and whole escapes
+_STRING_RUN = re.compile(r'(?:[^"\\]+|\\u[0-9a-fA-F]{4}|\\[^u])*')
+_STREAMED = object()
+_WHITESPACE = " \t\r\n"
+
+
+class ToolResultError(Exception):
+    """The tool call failed, or its result is not a list of records."""
+
+
+class _Reader:
+    """Characters of a stream of byte (or str) chunks, with one character of lookahead."""
+
+    def __init__(self, chunks: Iterable):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+
+    def fill(self) -> bool:
+        """Append the next chunk to the unread text; False at end of stream."""
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                self.buf = self.buf[self.pos:] + text
+                self.pos = 0
+                return True
+        return False
+
+    def peek(self) -> str:
+        if self.pos >= len(self.buf) and not self.fill():
+            return ""
+        return self.buf[self.pos]
+
+    def next(self) -> str:
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def skip_whitespace(self):
+        while self.peek() and self.buf[self.pos] in _WHITESPACE:
+            self.pos += 1
+
+    def expect(self, char: str):
+        self.skip_whitespace()
+        found = self.next()
+        if found != char:
+            raise ValueError(f"expected {char!r}, found {found!r}")
+
+    def string_segments(self) -> Iterator[str]:
+        """Decoded pieces of a JSON string whose opening quote was consumed."""
+        while True:
+            end = _STRING_RUN.match(self.buf, self.pos).end()
+            closed = end < len(self.buf) and self.buf[end] == '"'
+            if not closed and _ends_with_high_surrogate(self.buf, self.pos, end):
+                end -= 6  # never split a surrogate pair between segments
+            if end > self.pos:
+                yield json.loads(f'"{self.buf[self.pos:end]}"')
+                self.pos = end
+            if closed:
+                self.pos += 1
+                return
+            if not self.fill():
+                raise ValueError("unterminated string")
+
+
+def _ends_with_high_surrogate(buf: str, start: int, end: int) -> bool:
+    escape = buf[max(start, end - 6):end]
+    if not (len(escape) == 6 and escape[:2] == "\\u" and escape[2] in "dD" and escape[3] in "89abAB"):
+        return False
+    # It's only an escape if the backslash isn't itself escaped (an odd run of backslashes)
+    run = end - 6
+    while run > start and buf[run - 1] == "\\":
+        run -= 1
+    return (end - 6 - run) % 2 == 0
+
+
+class _ArraySplitter:
+    """Splits the text of a JSON array, fed in pieces, into decoded items."""
+
+    def __init__(self):
+        self.buf = ""
+        self.state = "start"  # start -> item -> separator -> ... -> done
+        self._decoder = json.JSONDecoder()
+        self._retry_at = 0  # don't re-try an incomplete item until the buffer has grown past this
+
+    def feed(self, text: str, final: bool = False) -> list:
+        self.buf += text
+        items = []
+        pos = 0
+        while True:
+            while pos < len(self.buf) and self.buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(self.buf) or self.state == "done":
+                break
+            char = self.buf[pos]
+            if self.state == "start":
+                if char != "[":
+                    raise ValueError("not a JSON array")
+                pos += 1
+                self.state = "first"
+            elif self.state in ("first", "item"):
+                if self.state == "first" and char == "]":
+                    pos += 1
+                    self.state = "done"
+                    continue
+                if not final and len(self.buf) < self._retry_at:
+                    break
+                try:
+                    item, end = self._decoder.raw_decode(self.buf, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    # Incomplete: try again once at least as much text again has arrived
+                    self._retry_at = len(self.buf) + max(4096, len(self.buf) - pos)
+                    break
+                if end >= len(self.buf) and not final:
+                    break  # a number may continue in the next piece
+                items.append(item)
+                pos = end
+                self._retry_at = 0
+                self.state = "separator"
+            else:
+                pos += 1
+                if char == ",":
+                    self.state = "item"
+                elif char == "]":
+                    self.state = "done"
+                else:
+                    raise ValueError(f"unexpected {char!r} in array")
+        self.buf = self.buf[pos:]
+        if final and self.state != "done":
+            raise ValueError("truncated array")
+        return items
+
+
+def iter_tool_records(chunks: Iterable) -> Iterator:
+    """Records of a tools/call response body whose result text is a JSON array.
+
+    `chunks` is the body as it arrives (bytes or str pieces). Results
+    wrapped in an object ({"orders": [...]}) are decoded whole, as are
+    error texts, which raise ToolResultError.
+    """
+    reader = _Reader(chunks)
+    try:
+        envelope = yield from _value(reader, ())
+    except ValueError as e:
+        raise ToolResultError(f"Malformed response: {e}") from e
+    if not isinstance(envelope, dict):
+        raise ToolResultError("Malformed response")
+    if "error" in envelope:
+        error = envelope["error"]
+        raise ToolResultError(error.get("message", str(error)) if isinstance(error, dict) else str(error))
+    try:
+        streamed = envelope["result"]["content"][0]["text"] is _STREAMED
+    except (KeyError, IndexError, TypeError):
+        streamed = False
+    if not streamed:
+        raise ToolResultError("No response from server")
+
+
+def _value(reader: _Reader, path: tuple):
+    """Parse one JSON value; the result text at TEXT_PATH is streamed instead of returned."""
+    reader.skip_whitespace()
+    char = reader.peek()
+    if char == "{":
+        reader.next()
+        obj = {}
+        reader.skip_whitespace()
+        if reader.peek() == "}":
+            reader.next()
+            return obj
+        while True:
+            reader.expect('"')
+            key = "".join(reader.string_segments())
+            reader.expect(":")
+            obj[key] = yield from _value(reader, path + (key,))
+            reader.skip_whitespace()
+            char = reader.next()
+            if char == "}":
+                return obj
+            if char != ",":
+                raise ValueError(f"expected ',' or '}}', found {char!r}")
+    if char == "[":
+        reader.next()
+        items = []
+        reader.skip_whitespace()
+        if reader.peek() == "]":
+            reader.next()
+            return items
+        while True:
+            items.append((yield from _value(reader, path + (len(items),))))
+            reader.skip_whitespace()
+            char = reader.next()
+            if char == "]":
+                return items
+            if char != ",":
+                raise ValueError(f"expected ',' or ']', found {char!r}")
+    if char == '"':
+        reader.next()
+        if path == TEXT_PATH:
+            yield from _records(reader)
+            return _STREAMED
+        return "".join(reader.string_segments())
+    token = []
+    while reader.peek() and reader.peek() not in ",]}" + _WHITESPACE:
+        token.append(reader.next())
+    return json.loads("".join(token))
+
+
+def _records(reader: _Reader):
+    splitter = _ArraySplitter()
+    segments = reader.string_segments()
+    for segment in segments:
+        if splitter.state == "start" and segment.strip() and segment.lstrip()[0] != "[":
+            # Not a bare array: an error message or a wrapped list; decode it whole
+            yield from _whole_text(segment + "".join(segments))
+            return
+        yield from splitter.feed(segment)
+    yield from splitter.feed("", final=True)
+
+
+def _whole_text(text: str):
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise ToolResultError(text)
+    if isinstance(data, dict):
+        for value in data.values():
+            if isinstance(value, list):
+                yield from value
+                return
+    raise ToolResultError(text[:200])
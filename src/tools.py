@@ -11,11 +11,22 @@ TOOL_DEFINITIONS = [
             "properties": {
                 "category": {
                     "type": "string",
+                    "enum": ["Monitors", "Printers", "Accessories", "Networking"],
                     "description": "Filter by category: Monitors, Printers, Accessories, or Networking"
                 },
                 "is_active": {
                     "type": "boolean",
                     "description": "Filter by active status"
+                },
+                "limit": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": "Maximum number of products to return (for paging through large results)"
+                },
+                "offset": {
+                    "type": "integer",
+                    "minimum": 0,
+                    "description": "Number of products to skip before the first one returned"
                 }
             }
         }
@@ -28,6 +39,8 @@ TOOL_DEFINITIONS = [
             "properties": {
                 "sku": {
                     "type": "string",
+                    "format": "sku",
+                    "pattern": "^[A-Z]{3}-[0-9]{4}$",
                     "description": "Product SKU code"
                 }
             },
@@ -42,6 +55,7 @@ TOOL_DEFINITIONS = [
             "properties": {
                 "query": {
                     "type": "string",
+                    "minLength": 1,
                     "description": "Search query (e.g., 'monitor', 'wireless keyboard', '27-inch')"
                 }
             },
@@ -56,6 +70,7 @@ TOOL_DEFINITIONS = [
             "properties": {
                 "customer_id": {
                     "type": "string",
+                    "format": "uuid",
                     "description": "Customer UUID"
                 }
             },
@@ -70,10 +85,12 @@ TOOL_DEFINITIONS = [
             "properties": {
                 "email": {
                     "type": "string",
+                    "format": "email",
                     "description": "Customer email address"
                 },
                 "pin": {
                     "type": "string",
+                    "pattern": "^[0-9]{4}$",
                     "description": "4-digit PIN code"
                 }
             },
@@ -88,11 +105,23 @@ TOOL_DEFINITIONS = [
             "properties": {
                 "customer_id": {
                     "type": "string",
+                    "format": "uuid",
                     "description": "Filter by customer UUID"
                 },
                 "status": {
                     "type": "string",
+                    "enum": ["draft", "submitted", "approved", "fulfilled", "cancelled"],
                     "description": "Filter by status: draft, submitted, approved, fulfilled, or cancelled"
+                },
+                "limit": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": "Maximum number of orders to return (for paging through large results)"
+                },
+                "offset": {
+                    "type": "integer",
+                    "minimum": 0,
+                    "description": "Number of orders to skip before the first one returned"
                 }
             }
         }
@@ -105,6 +134,7 @@ TOOL_DEFINITIONS = [
             "properties": {
                 "order_id": {
                     "type": "string",
+                    "format": "uuid",
                     "description": "Order UUID"
                 }
             },
@@ -119,19 +149,22 @@ TOOL_DEFINITIONS = [
             "properties": {
                 "customer_id": {
                     "type": "string",
+                    "format": "uuid",
                     "description": "Customer UUID"
                 },
                 "items": {
                     "type": "array",
                     "description": "List of items with sku, quantity, unit_price, and currency (USD)",
+                    "minItems": 1,
                     "items": {
                         "type": "object",
                         "properties": {
-                            "sku": {"type": "string"},
-                            "quantity": {"type": "integer"},
-                            "unit_price": {"type": "string"},
-                            "currency": {"type": "string"}
-                        }
+                            "sku": {"type": "string", "format": "sku", "pattern": "^[A-Z]{3}-[0-9]{4}$"},
+                            "quantity": {"type": "integer", "minimum": 1},
+                            "unit_price": {"type": "string", "format": "decimal"},
+                            "currency": {"type": "string", "enum": ["USD"]}
+                        },
+                        "required": ["sku", "quantity"]
                     }
                 }
             },
@@ -140,8 +173,48 @@ TOOL_DEFINITIONS = [
     }
 ]
 
+# Tools answered by the chatbot itself, without calling the MCP server
+LOCAL_TOOL_DEFINITIONS = [
+    {
+        "name": "get_full_tool_result",
+        "description": "Get rows or fields that were omitted from an earlier tool result. Use the result_id given in the omission note.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "result_id": {
+                    "type": "string",
+                    "description": "Result ID from the omission note (e.g., r3)"
+                },
+                "offset": {
+                    "type": "integer",
+                    "description": "Index of the first row to return"
+                }
+            },
+            "required": ["result_id"]
+        }
+    }
+]
+
+
+# String formats every provider's function schema accepts (Gemini takes no others)
+LLM_STRING_FORMATS = ("enum", "date-time")
+
+
+def _llm_schema(schema):
+    """`schema` without the validator-only hints: custom `format`s and `pattern`s."""
+    if isinstance(schema, list):
+        return [_llm_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    return {
+        # Under "properties" the keys are argument names, not schema keywords
+        key: {name: _llm_schema(sub) for name, sub in value.items()} if key == "properties" else _llm_schema(value)
+        for key, value in schema.items()
+        if key != "pattern" and not (key == "format" and value not in LLM_STRING_FORMATS)
+    }
+
 
-def get_openai_tools():
+def _openai_tools(definitions: list):
     """Convert tool definitions to OpenAI/OpenRouter format."""
     return [
         {
@@ -149,8 +222,19 @@ def get_openai_tools():
             "function": {
                 "name": tool["name"],
                 "description": tool["description"],
-                "parameters": tool["parameters"]
+                "parameters": _llm_schema(tool["parameters"])
             }
         }
-        for tool in TOOL_DEFINITIONS
+        for tool in definitions
     ]
+
+
+# Built once; passed as-is to every LLM call. The local tools are only
+# offered when the session keeps full results for them to read.
+OPENAI_TOOLS = _openai_tools(TOOL_DEFINITIONS + LOCAL_TOOL_DEFINITIONS)
+MCP_OPENAI_TOOLS = _openai_tools(TOOL_DEFINITIONS)
+
+
+def get_openai_tools(local: bool = True):
+    """Tool definitions in OpenAI/OpenRouter format, with or without the local tools."""
+    return OPENAI_TOOLS if local else MCP_OPENAI_TOOLS
@@ -0,0 +1,261 @@
+"""
+Tracing, metrics and logging
+Spans with durations and attributes, latency histograms, and a buffered
+background sink so instrumentation stays off the request path.
+"""
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from src.config import TRACE_FILE, METRICS_PORT, TRACE_QUEUE_SIZE, LOG_PREVIEW_CHARS
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation. Attributes can be added while it is open."""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "ok"
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        """Seconds between start and end (or now, if still open)."""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_dict(self) -> dict:
+        """OTLP-style JSON representation."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "status": {"code": "STATUS_CODE_ERROR" if self.status == "error" else "STATUS_CODE_OK"},
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+        }
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": value}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    return {"stringValue": json.dumps(value, default=str)}
+
+
+class Histogram:
+    """Cumulative latency histogram, Prometheus style."""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class BufferedSink:
+    """Bounded queue drained by a background thread.
+
+    `emit()` never blocks: when the queue is full the record is dropped
+    and counted, so a slow exporter can't add latency to a chat turn.
+    """
+
+    def __init__(self, exporters: list, max_size: int = TRACE_QUEUE_SIZE):
+        self.exporters = exporters
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = threading.Thread(target=self._run, name="trace-sink", daemon=True)
+        self._thread.start()
+
+    def emit(self, kind: str, record: dict):
+        try:
+            self._queue.put_nowait((kind, record))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until everything queued so far has been exported."""
+        done = threading.Event()
+        try:
+            self._queue.put(("flush", done), timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _run(self):
+        while True:
+            kind, record = self._queue.get()
+            if kind == "flush":
+                record.set()
+                continue
+            for exporter in self.exporters:
+                try:
+                    exporter.export(kind, record)
+                except Exception:
+                    pass
+
+
+class ConsoleExporter:
+    """Writes log events to stdout in the familiar `[LOG] ...` format."""
+
+    def export(self, kind: str, record: dict):
+        if kind != "log":
+            return
+        fields = " ".join(f"{key}={value}" for key, value in record["fields"].items())
+        print(f"[LOG] {record['message']}" + (f" | {fields}" if fields else ""), flush=True)
+
+
+class OTLPFileExporter:
+    """Appends finished spans to a file as OTLP-compatible JSON lines."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, kind: str, record: dict):
+        if kind != "span":
+            return
+        line = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "techgear-support-bot"}}]},
+            "scopeSpans": [{"scope": {"name": "src.tracing"}, "spans": [record]}],
+        }]}
+        with open(self.path, "a") as f:
+            f.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+
+class Tracer:
+    """Creates spans, aggregates latency histograms and counters."""
+
+    def __init__(self, sink: BufferedSink):
+        self.sink = sink
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        parent = _current_span.get()
+        span = Span(name, parent, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set("error", str(e))
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # A generator span finalized from another context
+                pass
+            span.end_ns = time.time_ns()
+            with self._lock:
+                self.histograms.setdefault(name, Histogram()).observe(span.duration)
+            self.sink.emit("span", span.to_dict())
+
+    def count(self, name: str, value: int = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def log(self, message: str, **fields):
+        span = _current_span.get()
+        if span is not None:
+            fields.setdefault("trace", span.trace_id[:8])
+        self.sink.emit("log", {"message": message, "fields": fields, "time": time.time()})
+
+    def render_prometheus(self) -> str:
+        """All histograms and counters in the Prometheus text format."""
+        lines = [
+            "# HELP chatbot_span_duration_seconds Duration of traced operations",
+            "# TYPE chatbot_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'chatbot_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'chatbot_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'chatbot_span_duration_seconds_sum{{span="{name}"}} {histogram.sum:.6f}')
+                lines.append(f'chatbot_span_duration_seconds_count{{span="{name}"}} {histogram.count}')
+            for (name, labels), value in sorted(self.counters.items()):
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f"chatbot_{name}_total{{{label_text}}} {value}")
+        lines.append(f"chatbot_trace_records_dropped_total {self.sink.dropped}")
+        return "\n".join(lines) + "\n"
+
+
+def propagate(fn):
+    """Wrap `fn` so it runs inside the caller's span context (for thread pools)."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve GET /metrics in the Prometheus text format from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            data = tracer.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def preview(text: str) -> str:
+    """Start of a payload for log output."""
+    return text if len(text) <= LOG_PREVIEW_CHARS else text[:LOG_PREVIEW_CHARS] + "..."
+
+
+_exporters = [ConsoleExporter()]
+if TRACE_FILE:
+    _exporters.append(OTLPFileExporter(TRACE_FILE))
+
+tracer = Tracer(BufferedSink(_exporters))
+log = tracer.log
@@ -0,0 +1,115 @@
+"""
+Chat transcript rendering
+Draws a session in roughly constant time per Streamlit rerun: the newest
+turn in full, the turns before it as collapsed pages of pre-rendered
+markdown, and older pages only when the user asks for them.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+import streamlit as st
+
+from src.config import TRANSCRIPT_PAGE_TURNS, TRANSCRIPT_CACHE_TURNS
+from src.conversation_store import chat_messages
+from src.history import split_turns
+
+# pages: [(first turn, end turn, markdown)] oldest first; latest: messages of the newest turn
+TranscriptWindow = namedtuple("TranscriptWindow", ["has_earlier", "pages", "latest"])
+
+
+def turn_markdown(turn: list) -> str:
+    """One turn as a single markdown block."""
+    return "\n\n".join(
+        f"**{'You' if msg['role'] == 'user' else 'Assistant'}:** {msg['content']}"
+        for msg in turn
+    )
+
+
+class TranscriptRenderer:
+    """Pre-rendered markdown of finished turns, shared by all sessions.
+
+    A stored turn never changes once a newer one exists, so its markdown
+    is built once per (session, turn) and kept in a bounded LRU. Turns
+    older than the store's hot window are read back with load_turns().
+    """
+
+    def __init__(self, store, page_turns: int = TRANSCRIPT_PAGE_TURNS, max_turns: int = TRANSCRIPT_CACHE_TURNS):
+        self.store = store
+        self.page_turns = max(1, page_turns)
+        self.max_turns = max_turns
+        self._rendered = OrderedDict()  # (session id, turn) -> markdown
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "renders": 0, "loads": 0}
+
+    def window(self, session_id: str, pages: int = 1) -> TranscriptWindow:
+        """The newest turn plus up to `pages` pages of the turns before it."""
+        first_hot, records = self.store.recent(session_id)
+        hot = split_turns(chat_messages(records))
+        if not hot:
+            return TranscriptWindow(False, [], [])
+
+        latest = first_hot + len(hot) - 1
+        start = max(0, latest - pages * self.page_turns)
+        rendered = self._render_range(session_id, start, latest, first_hot, hot)
+
+        page_list = []
+        end = latest
+        while end > start:
+            first = max(start, end - self.page_turns)
+            page_list.append((first, end, "\n\n---\n\n".join(rendered[first - start:end - start])))
+            end = first
+        page_list.reverse()
+        return TranscriptWindow(start > 0, page_list, hot[-1])
+
+    def _render_range(self, session_id: str, start: int, end: int, first_hot: int, hot: list) -> list:
+        """Markdown for turns [start, end), from the cache, the hot window or the store."""
+        rendered = [None] * (end - start)
+        missing = []
+        with self._lock:
+            for turn in range(start, end):
+                markdown = self._rendered.get((session_id, turn))
+                if markdown is not None:
+                    self._rendered.move_to_end((session_id, turn))
+                    rendered[turn - start] = markdown
+                    self.stats["hits"] += 1
+                elif turn < first_hot:
+                    missing.append(turn)
+
+        loaded = {}
+        if missing:
+            self.stats["loads"] += 1
+            first = missing[0]
+            older = self.store.load_turns(session_id, missing[-1] + 1, missing[-1] + 1 - first)
+            loaded = {first + i: turn for i, turn in enumerate(split_turns(chat_messages(older)))}
+
+        with self._lock:
+            for turn in range(start, end):
+                if rendered[turn - start] is not None:
+                    continue
+                messages = hot[turn - first_hot] if turn >= first_hot else loaded.get(turn, [])
+                markdown = turn_markdown(messages)
+                rendered[turn - start] = markdown
+                self._rendered[(session_id, turn)] = markdown
+                self.stats["renders"] += 1
+            while len(self._rendered) > self.max_turns:
+                self._rendered.popitem(last=False)
+        return rendered
+
+
+def draw_transcript(renderer: TranscriptRenderer, session_id: str, pages_key: str = "transcript_pages"):
+    """Draw the session's transcript; st.session_state[pages_key] counts the pages shown."""
+    pages = st.session_state.setdefault(pages_key, 1)
+    window = renderer.window(session_id, pages)
+
+    if window.has_earlier and st.button("⬆️ Show earlier messages"):
+        st.session_state[pages_key] = pages + 1
+        st.rerun()
+
+    for first, end, markdown in window.pages:
+        label = f"Turn {end}" if end - first == 1 else f"Turns {first + 1}–{end}"
+        with st.expander(f"💬 Earlier messages ({label})"):
+            st.markdown(markdown)
+
+    for message in window.latest:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
@@ -0,0 +1,170 @@
+"""
+Pooled HTTP transport for the MCP client
+Keeps connections to the MCP server alive between tool calls.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from src.config import MCP_POOL_SIZE, MCP_HTTP2, MCP_STREAM_CHUNK_BYTES
+
+
+class TransportTimeout(Exception):
+    """Raised when the MCP server does not answer within the timeout."""
+
+
+class TransportUnreachable(Exception):
+    """Raised when no connection to the MCP server could be opened, so nothing was sent."""
+
+
+class HTTPTransport:
+    """Thread-safe keep-alive transport shared by every MCPClient call.
+
+    Uses a pooled requests.Session by default. When `http2` is enabled and
+    httpx (with the h2 extra) is installed, an httpx.Client is used instead
+    so all calls are multiplexed over one connection per host. The HTTP
+    library is imported here rather than at module load, to keep startup
+    cheap.
+    """
+
+    def __init__(self, pool_size: int = MCP_POOL_SIZE, http2: bool = MCP_HTTP2):
+        self.pool_size = pool_size
+        self.http2 = False
+        self._lock = threading.Lock()
+        self._client = None
+        self._session = None
+        self._timeout_error = None
+        self._connect_error = None
+
+        if http2:
+            try:
+                import httpx
+                import h2  # noqa: F401 - httpx needs it for http2=True
+                self._client = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_connections=pool_size,
+                        max_keepalive_connections=pool_size
+                    )
+                )
+                self._timeout_error = httpx.TimeoutException
+                self._connect_error = (httpx.ConnectError, httpx.ConnectTimeout)
+                self.http2 = True
+            except ImportError:
+                self._client = None
+
+        if self._client is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            self._timeout_error = requests.exceptions.Timeout
+            # ConnectTimeout included: the connection never opened, so nothing was sent
+            self._connect_error = requests.exceptions.ConnectTimeout
+            self._session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                pool_block=False
+            )
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+    def post(self, url: str, json: object, headers: dict, timeout):
+        """POST a JSON body and return the response object.
+
+        `timeout` is either seconds or a (connect, read) pair.
+        """
+        client = self._client if self._client is not None else self._session
+        if self._client is not None and isinstance(timeout, tuple):
+            import httpx
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        try:
+            return client.post(url, json=json, headers=headers, timeout=timeout)
+        except Exception as e:
+            if self._unreachable(e):
+                raise TransportUnreachable(str(e)) from e
+            if isinstance(e, self._timeout_error):
+                raise TransportTimeout(str(e)) from e
+            raise
+
+    def _unreachable(self, error: Exception) -> bool:
+        """True if `error` means the connection was never opened (refused, unresolvable, connect timeout)."""
+        if isinstance(error, self._connect_error):
+            return True
+        if self._client is None:
+            import requests
+            from urllib3.exceptions import NewConnectionError
+
+            # requests wraps urllib3's NewConnectionError (connection refused, DNS failure)
+            # in a ConnectionError, the same type it uses for a connection dropped mid-request
+            reason = getattr(error.args[0], "reason", None) if error.args else None
+            return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+        return False
+
+    @contextmanager
+    def post_stream(self, url: str, json: object, headers: dict, timeout):
+        """POST a JSON body and yield (status code, iterator of body chunks).
+
+        The body is read MCP_STREAM_CHUNK_BYTES at a time as the chunks
+        are consumed, never all at once; the connection goes back to the
+        pool when the block exits.
+        """
+        try:
+            if self._client is not None:
+                if isinstance(timeout, tuple):
+                    import httpx
+                    timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+                with self._client.stream("POST", url, json=json, headers=headers, timeout=timeout) as response:
+                    yield response.status_code, response.iter_bytes(MCP_STREAM_CHUNK_BYTES)
+            else:
+                response = self._session.post(url, json=json, headers=headers, timeout=timeout, stream=True)
+                try:
+                    yield response.status_code, self._chunks(response)
+                finally:
+                    response.close()
+        except self._timeout_error as e:
+            raise TransportTimeout(str(e)) from e
+
+    def _chunks(self, response) -> Iterator[bytes]:
+        import requests
+
+        try:
+            yield from response.iter_content(MCP_STREAM_CHUNK_BYTES)
+        except requests.exceptions.ConnectionError as e:
+            # requests reports a read timeout mid-body as a ConnectionError
+            if "timed out" in str(e).lower():
+                raise TransportTimeout(str(e)) from e
+            raise
+
+    def connect(self, url: str, timeout) -> bool:
+        """Open a pooled connection to `url`'s host (a HEAD request); False if unreachable."""
+        client = self._client if self._client is not None else self._session
+        if self._client is not None and isinstance(timeout, tuple):
+            import httpx
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        try:
+            client.head(url, timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        """Close all pooled connections."""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+            if self._session is not None:
+                self._session.close()
+
+
+_shared_transport: Optional[HTTPTransport] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_transport() -> HTTPTransport:
+    """Return the process-wide transport, creating it on first use."""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is None:
+            _shared_transport = HTTPTransport()
+        return _shared_transport
@@ -0,0 +1,214 @@
+"""
+Tool argument validation
+Checks and normalizes the arguments the LLM passes to each tool against the
+JSON schemas in TOOL_DEFINITIONS, so calls the MCP server would reject are
+answered locally (with an error the model can correct from) instead of
+costing a round trip.
+"""
+import json
+import math
+import re
+import threading
+from typing import Callable, Optional
+
+from src.tools import TOOL_DEFINITIONS
+from src.tracing import log, tracer
+
+EMAIL_RE = re.compile(r"^[\w.+-]+@[\w-]+(\.[\w-]+)+$")
+UUID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+DECIMAL_RE = re.compile(r"^\d+(\.\d+)?$")
+# Loose SKU spellings: "mon0054", "MON 54", "mon-54"
+LOOSE_SKU_RE = re.compile(r"^([A-Za-z]{3})[\s_-]?(\d{1,4})$")
+
+# What a value of each "format" should look like, for error messages
+FORMAT_EXAMPLES = {
+    "sku": "a SKU like MON-0054",
+    "uuid": "a UUID like 6632c0ed-3b1f-4c2e-9a8d-1f2e3d4c5b6a",
+    "email": "an email address",
+    "decimal": "a decimal amount like 199.99",
+}
+
+
+class ToolArgumentError(ValueError):
+    """A tool call whose arguments can't be valid, whatever the server holds."""
+
+
+def decode_arguments(raw: Optional[str]):
+    """The arguments of an LLM tool call, or None if they aren't valid JSON."""
+    try:
+        return json.loads(raw or "{}")
+    except ValueError:
+        return None
+
+
+def _normalize_format(value: str, fmt: Optional[str]) -> str:
+    if fmt == "sku":
+        match = LOOSE_SKU_RE.match(value)
+        return f"{match.group(1).upper()}-{int(match.group(2)):04d}" if match else value.upper()
+    if fmt == "uuid":
+        return value.lower()
+    return value
+
+
+def _format_ok(value: str, fmt: Optional[str]) -> bool:
+    if fmt == "uuid":
+        return bool(UUID_RE.match(value))
+    if fmt == "email":
+        return bool(EMAIL_RE.match(value))
+    if fmt == "decimal":
+        return bool(DECIMAL_RE.match(value))
+    return True
+
+
+def _compile(schema: dict, path: str) -> Callable:
+    """A function that returns the normalized value, or raises ToolArgumentError."""
+    kind = schema.get("type")
+
+    if kind == "object":
+        fields = {}
+        for key, sub in schema.get("properties", {}).items():
+            check = _compile(sub, key if not path else f"{path}.{key}")
+            if check is not None:
+                fields[key] = check
+        required = schema.get("required", [])
+
+        def check_object(value):
+            if not isinstance(value, dict):
+                raise ToolArgumentError(f"{path or 'arguments'} must be a JSON object")
+            result = {}
+            for key, item in value.items():
+                if item is None or (key not in required and item == ""):
+                    continue  # unset optional argument
+                result[key] = fields[key](item) if key in fields else item
+            missing = [key for key in required if result.get(key) in (None, "", [])]
+            if missing:
+                names = ", ".join(key if not path else f"{path}.{key}" for key in missing)
+                raise ToolArgumentError(f"missing required argument(s): {names}")
+            return result
+        return check_object
+
+    if kind == "array":
+        check_item = _compile(schema.get("items", {}), f"{path}[]")
+        min_items = schema.get("minItems", 0)
+
+        def check_array(value):
+            if isinstance(value, dict):
+                value = [value]  # a single item passed on its own
+            if not isinstance(value, list):
+                raise ToolArgumentError(f"{path} must be a list")
+            if len(value) < min_items:
+                raise ToolArgumentError(f"{path} needs at least {min_items} item(s)")
+            return [check_item(item) if check_item else item for item in value]
+        return check_array
+
+    if kind in ("integer", "number"):
+        minimum = schema.get("minimum")
+
+        def check_number(value):
+            number = value
+            if isinstance(value, str):
+                try:
+                    number = float(value.strip())
+                except ValueError:
+                    number = None
+            if isinstance(number, bool) or not isinstance(number, (int, float)) or not math.isfinite(number):
+                raise ToolArgumentError(f"{path} must be a number, got {value!r}")
+            if kind == "integer":
+                if number != int(number):
+                    raise ToolArgumentError(f"{path} must be a whole number, got {value!r}")
+                number = int(number)
+            if minimum is not None and number < minimum:
+                raise ToolArgumentError(f"{path} must be at least {minimum}, got {value!r}")
+            return number
+        return check_number
+
+    if kind == "boolean":
+        def check_boolean(value):
+            if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+                return value.strip().lower() == "true"
+            if not isinstance(value, bool):
+                raise ToolArgumentError(f"{path} must be true or false, got {value!r}")
+            return value
+        return check_boolean
+
+    if kind == "string":
+        fmt = schema.get("format")
+        pattern = re.compile(schema["pattern"]) if "pattern" in schema else None
+        choices = {choice.lower(): choice for choice in schema.get("enum", [])}
+        min_length = schema.get("minLength", 0)
+
+        def check_string(value):
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                raise ToolArgumentError(f"{path} must be a string, got {value!r}")
+            if isinstance(value, str):
+                text = value.strip()
+            elif fmt == "decimal":
+                text = f"{value:.2f}"  # a price sent as a number
+            else:
+                text = str(value)
+            text = _normalize_format(text, fmt)
+            if choices:
+                if text.lower() not in choices:
+                    raise ToolArgumentError(f"{path} must be one of {', '.join(choices.values())}, got {value!r}")
+                text = choices[text.lower()]
+            if len(text) < min_length:
+                raise ToolArgumentError(f"{path} must not be empty")
+            if (pattern and not pattern.match(text)) or not _format_ok(text, fmt):
+                expected = FORMAT_EXAMPLES.get(fmt) or f"a value matching {pattern.pattern} ({schema.get('description', '')})"
+                raise ToolArgumentError(f"{path} must be {expected}, got {value!r}")
+            return text
+        return check_string
+
+    return None
+
+
+class ToolValidator:
+    """Argument checks for each tool, compiled once from its JSON schema.
+
+    `validate()` returns the normalized arguments (trimmed strings,
+    upper-case SKUs, lower-case UUIDs, canonical enum spelling, numbers
+    from strings, prices as decimal strings) or raises ToolArgumentError
+    for a call the server could only reject. Tools without a schema pass
+    through unchanged. Every rejection is an MCP round trip (and usually
+    an LLM iteration spent reading the server's error) saved; `stats`
+    counts them.
+    """
+
+    def __init__(self, definitions: list = TOOL_DEFINITIONS):
+        self._checks = {tool["name"]: _compile(tool["parameters"], "") for tool in definitions}
+        self.stats = {"checked": 0, "normalized": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def validate(self, tool_name: str, arguments) -> dict:
+        check = self._checks.get(tool_name)
+        if check is None:
+            return arguments if isinstance(arguments, dict) else {}
+        try:
+            normalized = check(arguments)
+        except ToolArgumentError:
+            self._count("rejected", tool_name)
+            raise
+        self._count("normalized" if normalized != arguments else "checked", tool_name)
+        return normalized
+
+    def _count(self, outcome: str, tool_name: str):
+        with self._lock:
+            self.stats["checked"] += 1
+            if outcome != "checked":
+                self.stats[outcome] += 1
+        if outcome != "checked":
+            tracer.count(f"tool_args_{outcome}", tool=tool_name)
+
+    @property
+    def round_trips_saved(self) -> int:
+        """MCP calls not made because the arguments could never have worked."""
+        return self.stats["rejected"]
+
+    def error_result(self, tool_name: str, error: ToolArgumentError) -> str:
+        """The tool result the model gets instead of a server error."""
+        log(f"Rejected {tool_name} call locally: {error}", saved=self.round_trips_saved)
+        return f"Error: invalid arguments for {tool_name}: {error}. Correct the arguments and call {tool_name} again."
+
+
+# Compiled once; shared by every engine
+TOOL_VALIDATOR = ToolValidator()
@@ -0,0 +1,75 @@
+import asyncio
+
+from openai import AsyncOpenAI, OpenAI
+
+from bench.llm_stub import LLMStubServer
+from bench.mcp_stub import MCPStubServer
+from src.async_engine import AsyncChatEngine
+from src.async_mcp_client import AsyncMCPClient
+from src.engine import ChatEngine
+from src.mcp_client import MCPClient
+from src.transport import HTTPTransport
+
+SCRIPT = [
+    {"match": "compare", "steps": [
+        {"tool_calls": [
+            {"name": "get_product", "arguments": {"sku": "MON-0001"}},
+            {"name": "get_product", "arguments": {"sku": "MON-0002"}},
+        ]},
+        {"content": "MON-0001 is the cheaper one."},
+    ]},
+    {"match": "hello", "steps": [{"content": "Hi there, how can I help?"}]},
+]
+
+
+def test_async_engine_runs_the_same_turn_logic():
+    mcp = MCPStubServer().start()
+    llm = LLMStubServer(SCRIPT).start()
+
+    async def main(engine):
+        reply = await engine.get_bot_response("Please compare MON-0001 and MON-0002")
+        streamed = "".join([token async for token in engine.stream_bot_response("compare them again")])
+        await engine.mcp_client.aclose()
+        return reply, streamed
+
+    try:
+        engine = ChatEngine(
+            mcp_client=MCPClient(server_url=mcp.url, transport=HTTPTransport()),
+            llm_client=OpenAI(base_url=llm.base_url, api_key="test", max_retries=0)
+        )
+        expected = (
+            engine.get_bot_response("Please compare MON-0001 and MON-0002"),
+            "".join(engine.stream_bot_response("compare them again"))
+        )
+        assert expected[0] == "MON-0001 is the cheaper one."
+        requests = mcp.stats["http_requests"]
+
+        engine = AsyncChatEngine(
+            mcp_client=AsyncMCPClient(server_url=mcp.url),
+            llm_client=AsyncOpenAI(base_url=llm.base_url, api_key="test", max_retries=0)
+        )
+        assert asyncio.run(main(engine)) == expected
+        assert requests == 2 and mcp.stats["http_requests"] == 2 * requests
+    finally:
+        mcp.stop()
+        llm.stop()
+
+
+def test_async_client_coalesces_identical_reads():
+    mcp = MCPStubServer().start()
+
+    async def main():
+        client = AsyncMCPClient(server_url=mcp.url, hedge=False)
+        results = await asyncio.gather(*(client.get_product("MON-0001") for _ in range(10)))
+        await asyncio.gather(*(client.create_order("c1", []) for _ in range(2)))
+        await client.aclose()
+        return results, client.flights.stats
+
+    try:
+        results, stats = asyncio.run(main())
+        assert len(set(results)) == 1 and "MON-0001" in results[0]
+        assert mcp.stats["tool_calls"]["get_product"] == 1
+        assert mcp.stats["tool_calls"]["create_order"] == 2
+        assert stats == {"leaders": 1, "coalesced": 9}
+    finally:
+        mcp.stop()
@@ -0,0 +1,224 @@
+import io
+import json
+import socket
+
+import pytest
+
+from bench.mcp_stub import MCPStubServer
+from src.bulk_orders import BulkOrderImporter, OrderLedger, read_orders
+from src.mcp_client import MCPClient
+from src.resilience import RetryPolicy
+from src.transport import HTTPTransport
+
+
+def _in_stock(stub: MCPStubServer, count: int) -> list:
+    return [p for p in stub.catalog if p["stock"] >= 5][:count]
+
+
+def test_csv_rows_with_one_ref_are_one_order(tmp_path):
+    path = tmp_path / "orders.csv"
+    path.write_text(
+        "ref,customer_id,sku,quantity,unit_price\n"
+        "A-1,c1,mon-1,2,\n"
+        "A-1,c1,PRI-0002,1,99.50\n"
+        "A-2,c2,ACC-0003,1,\n"
+        ",c3,NET-0004,4,\n"
+    )
+    orders = list(read_orders(str(path)))
+    assert [(o.ref, o.customer_id, len(o.items)) for o in orders] == [("A-1", "c1", 2), ("A-2", "c2", 1), ("line-5", "c3", 1)]
+    assert orders[0].items[1] == {"sku": "PRI-0002", "quantity": "1", "unit_price": "99.50"}
+
+    path = tmp_path / "orders.jsonl"
+    path.write_text('{"ref": "B-1", "customer_id": "c1", "items": []}\n\n{not json\n')
+    orders = list(read_orders(str(path)))
+    assert orders[0].ref == "B-1" and orders[1].error.startswith("invalid JSON")
+
+
+def test_import_validates_against_the_catalog_and_never_orders_twice(tmp_path):
+    stub = MCPStubServer().start()
+    client = MCPClient(server_url=stub.url, transport=HTTPTransport(), coalesce=False)
+    customer = stub.customers[0]["id"]
+    first, second = _in_stock(stub, 2)
+    path = tmp_path / "orders.jsonl"
+    path.write_text("\n".join(json.dumps(order) for order in [
+        {"ref": f"ok-{i}", "customer_id": customer, "items": [{"sku": first["sku"], "quantity": 1}]} for i in range(10)
+    ] + [
+        {"ref": "priced", "customer_id": customer, "items": [{"sku": second["sku"], "quantity": 2, "unit_price": second["price"]}]},
+        {"ref": "bad-price", "customer_id": customer, "items": [{"sku": second["sku"], "quantity": 1, "unit_price": "0.01"}]},
+        {"ref": "bad-sku", "customer_id": customer, "items": [{"sku": "ZZZ-9999", "quantity": 1}]},
+        {"ref": "bad-qty", "customer_id": customer, "items": [{"sku": first["sku"], "quantity": 0}]},
+    ]))
+    ledger_path = str(tmp_path / "ledger.db")
+    try:
+        results = io.StringIO()
+        ledger = OrderLedger(ledger_path)
+        summary = BulkOrderImporter(client, ledger, concurrency=4).run(read_orders(str(path)), results)
+        ledger.close()
+        records = {r["ref"]: r for r in map(json.loads, results.getvalue().splitlines()) if "ref" in r}
+        assert summary["created"] == 11 and summary["rejected"] == 3 and summary["failed"] == 0
+        assert "costs" in records["bad-price"]["error"] and "unknown SKU" in records["bad-sku"]["error"]
+        assert "at least 1" in records["bad-qty"]["error"]
+        assert stub.stats["tool_calls"]["get_product"] == 3
+        assert json.loads(results.getvalue().splitlines()[-1])["summary"]["orders"] == 14
+        placed = stub.stats["tool_calls"]["create_order"]
+        assert placed == 11
+
+        # Re-running the same file places nothing new
+        ledger = OrderLedger(ledger_path)
+        rerun = BulkOrderImporter(client, ledger, concurrency=4).run(read_orders(str(path)))
+        ledger.close()
+        assert rerun["duplicate"] == 11 and rerun["created"] == 0
+        assert stub.stats["tool_calls"]["create_order"] == placed
+    finally:
+        stub.stop()
+
+
+class LostResponseClient:
+    """create_order creates the order but loses the first response, like a timeout would."""
+
+    def __init__(self, stub: MCPStubServer):
+        self.client = MCPClient(server_url=stub.url, transport=HTTPTransport(), coalesce=False)
+        self.keys = []
+
+    def call_tools_batch(self, calls):
+        return self.client.call_tools_batch(calls)
+
+    def list_tools(self):
+        return self.client.list_tools()
+
+    def create_order(self, customer_id, items, idempotency_key=None):
+        self.keys.append(idempotency_key)
+        result = self.client.create_order(customer_id, items, idempotency_key=idempotency_key)
+        return "Error: Request timed out" if len(self.keys) == 1 else result
+
+
+def test_retries_reuse_the_idempotency_key(tmp_path):
+    stub = MCPStubServer().start()
+    client = LostResponseClient(stub)
+    product = _in_stock(stub, 1)[0]
+    path = tmp_path / "orders.csv"
+    path.write_text(f"ref,customer_id,sku,quantity\nR-1,{stub.customers[0]['id']},{product['sku']},1\n")
+    orders_before = len(stub.orders)
+    try:
+        ledger = OrderLedger(":memory:")
+        importer = BulkOrderImporter(client, ledger, retry_policy=RetryPolicy(base_delay=0.01))
+        assert importer.run(read_orders(str(path)))["created"] == 1
+        assert len(client.keys) == 2 and client.keys[0] == client.keys[1]
+        assert len(stub.orders) == orders_before + 1
+        assert ledger.status(client.keys[0]) == "created"
+    finally:
+        stub.stop()
+
+
+def _one_order(stub: MCPStubServer, tmp_path) -> str:
+    product = _in_stock(stub, 1)[0]
+    path = tmp_path / "orders.csv"
+    path.write_text(f"ref,customer_id,sku,quantity\nR-1,{stub.customers[0]['id']},{product['sku']},1\n")
+    return str(path)
+
+
+def test_unconfirmed_orders_are_not_resent_without_server_idempotency(tmp_path):
+    stub = MCPStubServer(honour_idempotency_keys=False).start()
+    client = LostResponseClient(stub)
+    path = _one_order(stub, tmp_path)
+    ledger_path = str(tmp_path / "ledger.db")
+    orders_before = len(stub.orders)
+    try:
+        ledger = OrderLedger(ledger_path)
+        results = io.StringIO()
+        summary = BulkOrderImporter(client, ledger, retry_policy=RetryPolicy(base_delay=0.01)).run(read_orders(path), results)
+        assert summary["unknown"] == 1 and summary["created"] == 0
+        # Sent once, and without the key the server doesn't advertise
+        assert client.keys == [None]
+        assert ledger.status(json.loads(results.getvalue().splitlines()[0])["idempotency_key"]) == "unknown"
+        ledger.close()
+
+        # The order did go through; a re-run must not place it again
+        ledger = OrderLedger(ledger_path)
+        rerun = BulkOrderImporter(client, ledger).run(read_orders(path))
+        ledger.close()
+        assert rerun["unknown"] == 1 and len(client.keys) == 1
+        assert len(stub.orders) == orders_before + 1
+    finally:
+        stub.stop()
+
+
+class UnreachableOrdersClient:
+    """Reads go to the stub; create_order goes to a port nothing listens on."""
+
+    def __init__(self, stub: MCPStubServer):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.reads = MCPClient(server_url=stub.url, transport=HTTPTransport(), coalesce=False)
+        self.writes = MCPClient(server_url=f"http://127.0.0.1:{port}/mcp", transport=HTTPTransport())
+        self.attempts = 0
+
+    def call_tools_batch(self, calls):
+        return self.reads.call_tools_batch(calls)
+
+    def create_order(self, customer_id, items, idempotency_key=None):
+        self.attempts += 1
+        return self.writes.create_order(customer_id, items, idempotency_key=idempotency_key)
+
+
+def test_orders_that_never_reached_the_server_are_retried_and_failed(tmp_path):
+    stub = MCPStubServer(honour_idempotency_keys=False).start()
+    client = UnreachableOrdersClient(stub)
+    try:
+        ledger = OrderLedger(":memory:")
+        importer = BulkOrderImporter(
+            client, ledger, max_attempts=3, retry_policy=RetryPolicy(base_delay=0.01), idempotency_keys=False
+        )
+        results = io.StringIO()
+        assert importer.run(read_orders(_one_order(stub, tmp_path)), results)["failed"] == 1
+        assert client.attempts == 3
+        record = json.loads(results.getvalue().splitlines()[0])
+        assert record["error"].startswith("Error: Could not connect") and ledger.status(record["idempotency_key"]) == "failed"
+    finally:
+        stub.stop()
+
+
+class BrokenCatalogClient(LostResponseClient):
+    def call_tools_batch(self, calls):
+        raise RuntimeError("catalog exploded")
+
+
+def test_unexpected_errors_fail_the_order_not_the_import(tmp_path):
+    stub = MCPStubServer().start()
+    client = BrokenCatalogClient(stub)
+    try:
+        ledger = OrderLedger(":memory:")
+        results = io.StringIO()
+        summary = BulkOrderImporter(client, ledger).run(read_orders(_one_order(stub, tmp_path)), results)
+        record = json.loads(results.getvalue().splitlines()[0])
+        assert summary["failed"] == 1 and record["error"] == "RuntimeError: catalog exploded"
+        assert ledger.status(record["idempotency_key"]) == "failed"
+    finally:
+        stub.stop()
+
+
+class RefusingClient(LostResponseClient):
+    """create_order is answered with a JSON-RPC error object."""
+
+    def create_order(self, customer_id, items, idempotency_key=None):
+        self.keys.append(idempotency_key)
+        return MCPClient._result_text({"jsonrpc": "2.0", "id": 1, "error": {"code": -32602, "message": "Invalid params"}})
+
+
+@pytest.mark.parametrize("idempotency_keys", [True, False])
+def test_server_errors_reject_the_order_without_retrying(tmp_path, idempotency_keys):
+    stub = MCPStubServer().start()
+    client = RefusingClient(stub)
+    try:
+        ledger = OrderLedger(":memory:")
+        results = io.StringIO()
+        importer = BulkOrderImporter(
+            client, ledger, retry_policy=RetryPolicy(base_delay=0.01), idempotency_keys=idempotency_keys
+        )
+        assert importer.run(read_orders(_one_order(stub, tmp_path)), results)["rejected"] == 1
+        record = json.loads(results.getvalue().splitlines()[0])
+        assert len(client.keys) == 1 and "Invalid params" in record["error"]
+        assert ledger.status(record["idempotency_key"]) == "rejected"
+    finally:
+        stub.stop()
@@ -0,0 +1,69 @@
+import time
+
+from src.cache import ToolCache
+
+
+def test_hit_and_miss_counters():
+    cache = ToolCache(ttls={"get_product": 60})
+    assert cache.get("get_product", {"sku": "MON-0056"}) is None
+    cache.put("get_product", {"sku": "MON-0056"}, '{"sku": "MON-0056"}')
+    assert cache.get("get_product", {"sku": "MON-0056"}) == '{"sku": "MON-0056"}'
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+
+def test_never_caches_customer_or_order_tools():
+    cache = ToolCache(ttls={"get_product": 60})
+    for tool in ("get_customer", "verify_customer_pin", "get_order", "list_orders"):
+        cache.put(tool, {"id": "x"}, "secret")
+        assert cache.get(tool, {"id": "x"}) is None
+    assert len(cache) == 0
+
+
+def test_entries_expire():
+    cache = ToolCache(ttls={"list_products": 0.01})
+    cache.put("list_products", {}, "[]")
+    time.sleep(0.02)
+    assert cache.get("list_products", {}) is None
+    assert cache.stats["expirations"] == 1
+
+
+def test_lru_eviction_by_count_and_bytes():
+    cache = ToolCache(ttls={"get_product": 60}, max_entries=2, max_bytes=1000)
+    cache.put("get_product", {"sku": "A"}, "a")
+    cache.put("get_product", {"sku": "B"}, "b")
+    cache.get("get_product", {"sku": "A"})
+    cache.put("get_product", {"sku": "C"}, "c")
+    assert cache.get("get_product", {"sku": "B"}) is None
+    assert cache.get("get_product", {"sku": "A"}) == "a"
+
+    small = ToolCache(ttls={"get_product": 60}, max_entries=10, max_bytes=10)
+    small.put("get_product", {"sku": "A"}, "x" * 6)
+    small.put("get_product", {"sku": "B"}, "y" * 6)
+    assert len(small) == 1
+    assert small.size_bytes == 6
+    assert small.stats["evictions"] == 1
+
+
+def test_create_order_invalidates_catalog():
+    cache = ToolCache(ttls={"get_product": 60, "list_products": 60})
+    cache.put("get_product", {"sku": "A"}, "a")
+    cache.put("list_products", {}, "[]")
+    cache.invalidate_after("create_order")
+    assert len(cache) == 0
+    assert cache.stats["invalidations"] == 2
+
+
+def test_errors_are_not_cached():
+    cache = ToolCache(ttls={"get_product": 60})
+    cache.put("get_product", {"sku": "A"}, "Error: Request timed out")
+    assert cache.get("get_product", {"sku": "A"}) is None
+
+
+def test_stale_entries_survive_expiry():
+    cache = ToolCache(ttls={"get_product": 0.01})
+    cache.put("get_product", {"sku": "MON-0056"}, '{"sku": "MON-0056"}')
+    time.sleep(0.02)
+    assert cache.get("get_product", {"sku": "MON-0056"}) is None
+    assert cache.get_stale("get_product", {"sku": "MON-0056"}) == '{"sku": "MON-0056"}'
+    assert cache.stats["stale_hits"] == 1
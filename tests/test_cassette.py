@@ -0,0 +1,139 @@
+import gzip
+
+import pytest
+from openai import OpenAI
+
+from bench.llm_stub import LLMStubServer
+from bench.mcp_stub import MCPStubServer
+from src.cassette import REDACTED_EMAIL, Cassette, _redact_pieces
+from src.engine import ChatEngine
+from src.mcp_client import MCPClient
+from src.model_router import ModelRouter
+from src.transport import HTTPTransport
+from src.validation import ToolValidator
+
+SCRIPT = [
+    {"match": "compare", "steps": [
+        {"tool_calls": [
+            {"name": "get_product", "arguments": {"sku": "MON-0001"}},
+            {"name": "get_product", "arguments": {"sku": "MON-0002"}},
+        ]},
+        {"content": "MON-0001 is the cheaper one."},
+    ]},
+    {"match": "hello", "steps": [{"content": "Hi there, how can I help?"}]},
+]
+
+
+def _engine(mcp_client, llm_client, **kwargs) -> ChatEngine:
+    return ChatEngine(mcp_client=mcp_client, llm_client=llm_client, validator=ToolValidator(), **kwargs)
+
+
+def test_recorded_turns_replay_offline(tmp_path):
+    path = str(tmp_path / "turns.jsonl.gz")
+    mcp = MCPStubServer().start()
+    llm = LLMStubServer(SCRIPT).start()
+    try:
+        with Cassette(path, mode="record") as cassette:
+            engine = _engine(
+                cassette.wrap_mcp(MCPClient(server_url=mcp.url, transport=HTTPTransport())),
+                cassette.wrap_llm(OpenAI(base_url=llm.base_url, api_key="test", max_retries=0))
+            )
+            compared = engine.get_bot_response("Please compare MON-0001 and MON-0002", [])
+            streamed = "".join(engine.stream_bot_response("hello", [{"role": "user", "content": "hi"}]))
+    finally:
+        mcp.stop()
+        llm.stop()
+
+    cassette = Cassette(path, mode="replay", speed=0, strict=True)
+    turns = cassette.turns()
+    assert [turn["user_message"] for turn in turns] == ["Please compare MON-0001 and MON-0002", "hello"]
+    assert turns[1]["chat_history"] == [{"role": "user", "content": "hi"}]
+    assert turns[0]["reply"] == compared
+
+    # The stubs are gone: everything comes from the cassette
+    engine = _engine(
+        cassette.wrap_mcp(MCPClient(server_url="http://cassette.invalid/mcp", transport=HTTPTransport())),
+        cassette.wrap_llm()
+    )
+    assert engine.get_bot_response(turns[0]["user_message"], turns[0]["chat_history"]) == compared
+    assert "".join(engine.stream_bot_response(turns[1]["user_message"], turns[1]["chat_history"])) == streamed
+    assert cassette.stats == {"mcp": 1, "llm": 3, "misses": 0}
+
+
+def test_failed_over_attempts_fold_into_one_turn(tmp_path):
+    path = str(tmp_path / "turns.jsonl")
+    llm = LLMStubServer(SCRIPT, failing_models={"primary": 503}).start()
+    try:
+        with Cassette(path, mode="record") as cassette:
+            engine = _engine(
+                None, cassette.wrap_llm(OpenAI(base_url=llm.base_url, api_key="test", max_retries=0)),
+                model_router=ModelRouter(default_model="primary", routes="", fallbacks=["backup"])
+            )
+            assert engine.get_bot_response("hello", []) == "Hi there, how can I help?"
+    finally:
+        llm.stop()
+
+    cassette = Cassette(path, mode="replay", speed=0)
+    assert len(cassette.turns()) == 1
+    # Replayed without any fallback model configured: the recorded failure only costs its time
+    engine = _engine(None, cassette.wrap_llm(), model_router=ModelRouter(default_model="primary", routes="", fallbacks=[]))
+    assert engine.get_bot_response("hello", []) == "Hi there, how can I help?"
+
+
+def test_unrecorded_calls_are_misses(tmp_path):
+    path = str(tmp_path / "empty.jsonl")
+    Cassette(path, mode="record").close()
+    client = Cassette(path, mode="replay").wrap_mcp(MCPClient(server_url="http://cassette.invalid/mcp", transport=HTTPTransport()))
+    assert client.get_product("MON-0001").startswith("Error: No recorded response")
+
+    strict = Cassette(path, mode="replay", strict=True)
+    client = strict.wrap_mcp(MCPClient(server_url="http://cassette.invalid/mcp", transport=HTTPTransport()))
+    with pytest.raises(KeyError):
+        client.get_product("MON-0001")
+    assert strict.stats["misses"] == 1
+
+
+VERIFY_SCRIPT = [
+    {"match": "verify", "steps": [
+        {"tool_calls": [{"name": "verify_customer_pin", "arguments": {"email": "customer1@example.com", "pin": "1000"}}]},
+        {"content": "Thanks, customer1@example.com is verified."},
+    ]},
+]
+
+
+def test_secrets_are_redacted_and_replays_match_the_redacted_form(tmp_path):
+    path = str(tmp_path / "secrets.jsonl.gz")
+    mcp = MCPStubServer().start()
+    llm = LLMStubServer(VERIFY_SCRIPT).start()
+    try:
+        with Cassette(path, mode="record") as cassette:
+            engine = _engine(
+                cassette.wrap_mcp(MCPClient(server_url=mcp.url, transport=HTTPTransport())),
+                cassette.wrap_llm(OpenAI(base_url=llm.base_url, api_key="test", max_retries=0))
+            )
+            reply = "".join(engine.stream_bot_response("Please verify me: customer1@example.com, PIN 1000", []))
+    finally:
+        mcp.stop()
+        llm.stop()
+    assert "customer1@example.com" in reply
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        recorded = f.read()
+    # The PIN shows up quoted (alone or in escaped tool call arguments) or after "PIN"
+    assert "customer1@example.com" not in recorded and "PIN 1000" not in recorded
+    assert '"1000"' not in recorded and '\\"1000\\"' not in recorded
+    assert REDACTED_EMAIL in recorded
+
+    cassette = Cassette(path, mode="replay", speed=0, strict=True)
+    turn = cassette.turns()[0]
+    assert turn["user_message"] == f"Please verify me: {REDACTED_EMAIL}, PIN 0000"
+    engine = _engine(cassette.wrap_mcp(MCPClient(server_url="http://cassette.invalid/mcp", transport=HTTPTransport())), cassette.wrap_llm())
+    assert "".join(engine.stream_bot_response(turn["user_message"], turn["chat_history"])) == turn["reply"]
+    assert cassette.stats["misses"] == 0
+
+
+def test_secrets_split_across_streamed_fragments_are_redacted():
+    pieces = ['{"email": "ada@exa', 'mple.com", "pi', 'n": "12', '34"}']
+    redacted = _redact_pieces(pieces)
+    assert len(redacted) == len(pieces)
+    assert "".join(redacted) == f'{{"email": "{REDACTED_EMAIL}", "pin": "0000"}}'
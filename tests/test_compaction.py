@@ -0,0 +1,102 @@
+import json
+from types import SimpleNamespace
+
+from src.compaction import FULL_RESULT_TOOL, ResultStore, compact_tool_result
+from src.config import COMPACT_MAX_ROWS
+from src.engine import ChatEngine
+
+
+def products(count):
+    return [
+        {"sku": f"MON-{i:04d}", "name": f"Monitor {i}", "price": "199.00", "stock": 5,
+         "description": "A long marketing description " * 10, "specs": {"hz": 144}}
+        for i in range(count)
+    ]
+
+
+def test_projects_fields_and_caps_rows():
+    store = ResultStore()
+    raw = json.dumps(products(COMPACT_MAX_ROWS + 5))
+    compacted = json.loads(compact_tool_result("list_products", raw, store))
+    assert len(compacted) == COMPACT_MAX_ROWS + 1
+    assert set(compacted[0]) == {"sku", "name", "price", "stock"}
+    assert compacted[-1]["note"].startswith("5 more omitted")
+    assert "result_id=r1" in compacted[-1]["note"]
+    assert store.get("r1") == raw
+
+
+def test_wrapped_rows_keep_wrapper():
+    raw = json.dumps({"products": products(2), "total": 2})
+    compacted = json.loads(compact_tool_result("search_products", raw))
+    assert compacted["total"] == 2
+    assert "description" not in compacted["products"][0]
+
+
+def test_small_results_pass_through():
+    raw = json.dumps({"sku": "MON-0056", "name": "Monitor"})
+    assert json.loads(compact_tool_result("get_product", raw)) == json.loads(raw)
+    assert compact_tool_result("get_order", "Order not found") == "Order not found"
+
+
+def test_store_pages_full_result():
+    store = ResultStore()
+    raw = json.dumps(products(COMPACT_MAX_ROWS + 5))
+    compact_tool_result("list_products", raw, store)
+    page = json.loads(store.read("r1", offset=COMPACT_MAX_ROWS))
+    assert len(page["rows"]) == 5
+    assert "description" in page["rows"][0]
+    assert store.read("r9").startswith("Error")
+
+
+def test_store_is_bounded():
+    store = ResultStore(size=2)
+    for text in ("a", "b", "c"):
+        store.put(text)
+    assert store.get("r1") is None
+    assert store.get("r3") == "c"
+
+
+def test_only_list_tools_are_cut_by_rows():
+    order = {"id": "order-1", "status": "pending", "items": [{"sku": f"MON-{i:04d}", "quantity": 1} for i in range(COMPACT_MAX_ROWS + 5)]}
+    assert json.loads(compact_tool_result("get_order", json.dumps(order))) == order
+
+    store = ResultStore()
+    big = {"id": "order-2", "items": [{"sku": f"MON-{i:04d}", "description": "x" * 200} for i in range(40)]}
+    compacted = compact_tool_result("get_order", json.dumps(big), store)
+    assert "more characters omitted" in compacted
+    # Read back as text, not as a page of line items
+    assert store.read("r1").startswith('{"id"')
+
+
+def test_full_result_reads_check_the_offset():
+    store = ResultStore()
+    compact_tool_result("list_products", json.dumps(products(COMPACT_MAX_ROWS + 5)), store)
+
+    def read(**args):
+        return ChatEngine._read_full_result({"function": {"arguments": json.dumps(args)}}, store)
+
+    assert read(result_id="r1", offset="next").startswith("Error: offset")
+    assert read(result_id="r1", offset=-1).startswith("Error: offset")
+    assert len(json.loads(read(result_id="r1", offset=str(COMPACT_MAX_ROWS)))["rows"]) == 5
+
+
+class RecordingLLM:
+    """Answers every completion with plain text, keeping the tools it was offered."""
+
+    def __init__(self):
+        self.tools = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, tools, **kwargs):
+        self.tools.append([tool["function"]["name"] for tool in tools])
+        message = SimpleNamespace(content="ok", tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_full_result_tool_is_offered_only_with_a_store():
+    llm = RecordingLLM()
+    engine = ChatEngine(mcp_client=None, llm_client=llm)
+    engine.get_bot_response("hello")
+    engine.get_bot_response("hello", result_store=ResultStore())
+    assert FULL_RESULT_TOOL not in llm.tools[0]
+    assert FULL_RESULT_TOOL in llm.tools[1]
@@ -0,0 +1,113 @@
+import time
+
+from src.conversation_store import (
+    MemoryConversationStore, SQLiteConversationStore, decode_message, encode_message, open_store
+)
+from src.history import HistoryManager
+
+
+def _turn(n: int) -> list:
+    return [
+        {"role": "user", "content": f"question {n}"},
+        {"role": "assistant", "content": None, "tool_calls": [{"id": f"call_{n}", "type": "function"}]},
+        {"role": "tool", "tool_call_id": f"call_{n}", "content": "result"},
+        {"role": "assistant", "content": f"answer {n}"},
+    ]
+
+
+def test_large_messages_are_compressed():
+    message = {"role": "tool", "tool_call_id": "call_1", "content": "x" * 5000}
+    codec, data = encode_message(message)
+    assert codec == 1
+    assert len(data) < 500
+    assert decode_message(codec, data) == message
+
+    codec, data = encode_message({"role": "user", "content": "hi", "extra": "dropped"})
+    assert codec == 0
+    assert decode_message(codec, data) == {"role": "user", "content": "hi"}
+
+
+def test_hot_window_is_bounded():
+    store = MemoryConversationStore(hot_turns=3)
+    session_id = store.create_session()
+    for n in range(10):
+        store.append(session_id, _turn(n))
+
+    assert store.turn_count(session_id) == 10
+    first_turn, messages = store.recent(session_id)
+    assert first_turn == 7
+    assert len(messages) == 12
+    assert messages[0]["content"] == "question 7"
+    assert messages[-1]["content"] == "answer 9"
+
+
+def test_load_turns_reads_older_turns():
+    store = MemoryConversationStore(hot_turns=2)
+    session_id = store.create_session()
+    for n in range(6):
+        store.append(session_id, _turn(n))
+
+    messages = store.load_turns(session_id, before_turn=4, count=2)
+    assert [m["content"] for m in messages if m["role"] == "user"] == ["question 2", "question 3"]
+    assert store.load_turns(session_id, before_turn=1, count=5)[0]["content"] == "question 0"
+
+
+def test_hot_sessions_are_evicted_but_still_readable():
+    store = MemoryConversationStore(hot_turns=5, hot_sessions=2)
+    sessions = [store.create_session() for _ in range(3)]
+    for session_id in sessions:
+        store.append(session_id, _turn(0))
+        store.recent(session_id)
+
+    assert len(store._hot) == 2
+    assert store.recent(sessions[0])[1][0]["content"] == "question 0"
+
+
+def test_expire_idle_deletes_sessions():
+    store = MemoryConversationStore()
+    old = store.create_session()
+    store.append(old, _turn(0))
+    time.sleep(0.02)
+    fresh = store.create_session()
+
+    assert store.expire_idle(0.01) == [old]
+    assert not store.has_session(old)
+    assert store.has_session(fresh)
+
+
+def test_sqlite_store_survives_reopen(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    store = SQLiteConversationStore(path, hot_turns=2)
+    session_id = store.create_session()
+    for n in range(4):
+        store.append(session_id, _turn(n))
+    store.set_state(session_id, {"history": {"folded_turns": 1}})
+    store.close()
+
+    store = open_store(f"sqlite:///{path}")
+    assert isinstance(store, SQLiteConversationStore)
+    store.hot_turns = 2
+    assert store.turn_count(session_id) == 4
+    first_turn, messages = store.recent(session_id)
+    assert first_turn == 2
+    assert messages[0]["content"] == "question 2"
+    assert messages[2]["tool_call_id"] == "call_2"
+    assert store.get_state(session_id) == {"history": {"folded_turns": 1}}
+    store.delete_session(session_id)
+    assert not store.has_session(session_id)
+    store.close()
+
+
+def test_history_state_round_trips_through_partial_history():
+    history = HistoryManager(token_budget=10_000, keep_turns=2)
+    chat = []
+    for n in range(6):
+        chat += [{"role": "user", "content": f"order ORD-100{n}"}, {"role": "assistant", "content": "ok"}]
+    history.build_messages("system", chat, "next")
+
+    restored = HistoryManager.from_dict(history.to_dict(), token_budget=10_000, keep_turns=2)
+    # Only the last three turns are handed back, as read from the store's hot window
+    messages = restored.build_messages("system", chat[6:], "next", first_turn=3)
+    assert restored.folded_turns == history.folded_turns == 4
+    assert messages[1]["content"] == history.summary_text()
+    assert [m["content"] for m in messages[2:]] == ["order ORD-1004", "ok", "order ORD-1005", "ok", "next"]
@@ -0,0 +1,107 @@
+import json
+
+from src.conversation_store import open_store
+from src.customer_context import CustomerContext, VerifiedCustomer
+from src.engine import ChatEngine
+from src.history import HistoryManager
+from src.steps import run_steps
+
+CUSTOMER_ID = "7a6b5c4d-3e2f-4a1b-9c8d-7e6f5a4b3c2d"
+PROFILE = json.dumps({"id": CUSTOMER_ID, "name": "Ada Lovelace", "email": "ada@example.com", "pin": "1234"})
+ORDERS = json.dumps([
+    {"id": f"order-{i}", "status": "pending", "total": f"{i}0.00", "currency": "USD",
+     "created_at": f"2026-10-0{i}T10:00:00Z", "items": [{"sku": "MON-0054"}]}
+    for i in range(1, 8)
+])
+
+
+class FakeMCPClient:
+    def __init__(self):
+        self.calls = []
+        self.batches = 0
+
+    def call_tool(self, tool_name, arguments=None):
+        self.calls.append((tool_name, arguments))
+        if tool_name == "verify_customer_pin":
+            return json.dumps({"verified": True, "customer_id": CUSTOMER_ID})
+        if tool_name == "get_customer":
+            return PROFILE
+        if tool_name == "list_orders":
+            return ORDERS
+        return json.dumps({"id": "order-new", "customer_id": CUSTOMER_ID, "status": "pending", "total": "5.00"})
+
+    def call_tools_batch(self, calls):
+        self.batches += 1
+        return [self.call_tool(*call) for call in calls]
+
+
+def _tool_call(name: str, arguments: dict) -> dict:
+    return {"id": f"call_{name}", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+def test_summary_is_compact_and_expires():
+    customer = VerifiedCustomer.from_results(CUSTOMER_ID, PROFILE, ORDERS, ttl=60, recent_orders=3)
+    assert [order["id"] for order in customer.orders] == ["order-7", "order-6", "order-5"]
+    summary = customer.summary()
+    assert "Ada Lovelace" in summary and "order-7 | pending | 70.00 USD | 2026-10-07" in summary
+    assert "1234" not in summary and "MON-0054" not in summary
+
+    assert not customer.expired() and customer.expired(now=customer.verified_at + 61)
+
+    errored = VerifiedCustomer.from_results(CUSTOMER_ID, "Error: timed out", None)
+    assert errored.profile == {} and "no orders" in errored.summary()
+
+
+def test_history_keeps_the_customer_until_it_expires():
+    history = HistoryManager()
+    history.customer = VerifiedCustomer.from_results(CUSTOMER_ID, PROFILE, ORDERS)
+    messages = history.build_messages("You are a bot.", [], "Where is my last order?")
+    assert CUSTOMER_ID in messages[1]["content"] and "order-7" in messages[1]["content"]
+
+    # Verification lives only in the session that did it, never in stored state
+    assert "customer" not in history.to_dict()
+    assert HistoryManager.from_dict(history.to_dict()).customer is None
+
+    history.customer.expires_at = 0
+    assert len(history.build_messages("You are a bot.", [], "hi")) == 2
+    assert history.customer is None
+
+
+def test_verification_preloads_profile_and_orders_in_one_burst():
+    mcp_client = FakeMCPClient()
+    engine = ChatEngine(mcp_client=mcp_client, llm_client=None)
+    history = HistoryManager()
+    messages = []
+    run_steps(engine._append_tool_results(
+        messages, [_tool_call("verify_customer_pin", {"email": "ada@example.com", "pin": "1234"})], history=history
+    ))
+
+    assert mcp_client.batches == 1
+    assert [name for name, _ in mcp_client.calls] == ["verify_customer_pin", "get_customer", "list_orders"]
+    assert history.customer.customer_id == CUSTOMER_ID
+    assert "Ada Lovelace" in messages[-1]["content"]
+
+    run_steps(engine._append_tool_results(messages, [_tool_call("create_order", {
+        "customer_id": CUSTOMER_ID, "items": [{"sku": "MON-0054", "quantity": 1, "unit_price": "5.00", "currency": "USD"}]
+    })], history=history))
+    assert history.customer.orders[0]["id"] == "order-new"
+
+
+def test_a_resumed_session_id_does_not_resume_verification():
+    engine = ChatEngine(mcp_client=FakeMCPClient(), llm_client=None, store=open_store("memory://"))
+    session_id = engine.store.create_session()
+    context = CustomerContext()
+    history = HistoryManager()
+    messages = []
+    run_steps(engine._append_tool_results(
+        messages, [_tool_call("verify_customer_pin", {"email": "ada@example.com", "pin": "1234"})], history=history
+    ))
+    engine.save_turn(session_id, history, [{"role": "user", "content": "hi"}], context)
+    assert context.customer.customer_id == CUSTOMER_ID
+
+    # The same browser session keeps its verified customer; a new one with only the session id does not
+    _, same, _ = engine.load_session(session_id, None, None, context)
+    assert same.customer is context.customer
+    _, resumed, _ = engine.load_session(session_id, None, None, CustomerContext())
+    assert resumed.customer is None
+    assert engine.load_session(session_id, None, None)[1].customer is None
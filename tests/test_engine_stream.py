@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+from src.conversation_store import open_store
+from src.engine import PREAMBLE_SEPARATOR, ChatEngine, add_delta
+from src.model_router import ModelRouter
+
+
+def _chunk(content=None, tool_calls=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+
+def _tool_delta(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+# Two calls interleaved by index, with names and arguments split across chunks
+TOOL_CALL_CHUNKS = [
+    _chunk("Let me "),
+    _chunk("check."),
+    _chunk(tool_calls=[_tool_delta(0, id="call_a", name="get_", arguments="")]),
+    _chunk(tool_calls=[_tool_delta(1, id="call_b", name="get_order", arguments='{"order_')]),
+    _chunk(tool_calls=[_tool_delta(0, name="product", arguments='{"sku": ')]),
+    _chunk(tool_calls=[_tool_delta(1, arguments='id": "o-1"}')]),
+    _chunk(tool_calls=[_tool_delta(0, arguments='"MON-0001"}')]),
+    SimpleNamespace(choices=[]),
+]
+
+
+class ScriptedStreamLLM:
+    """Streams one scripted list of chunks per completion call."""
+
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        return iter(self.streams.pop(0))
+
+
+class FakeMCPClient:
+    def __init__(self):
+        self.calls = []
+
+    def call_tools_batch(self, calls):
+        self.calls.extend(calls)
+        return [f"result of {name}" for name, _ in calls]
+
+
+def test_tool_call_deltas_are_assembled_by_index():
+    tool_calls = {}
+    text = [add_delta(chunk, tool_calls) for chunk in TOOL_CALL_CHUNKS]
+    assert "".join(token for token in text if token) == "Let me check."
+    assert tool_calls == {
+        0: {"id": "call_a", "type": "function", "function": {"name": "get_product", "arguments": '{"sku": "MON-0001"}'}},
+        1: {"id": "call_b", "type": "function", "function": {"name": "get_order", "arguments": '{"order_id": "o-1"}'}},
+    }
+
+
+def test_text_before_tool_calls_is_kept_apart_from_the_answer():
+    mcp_client = FakeMCPClient()
+    engine = ChatEngine(
+        mcp_client=mcp_client,
+        llm_client=ScriptedStreamLLM(TOOL_CALL_CHUNKS, [_chunk("Order o-1 "), _chunk("has shipped.")]),
+        validator=None,
+        model_router=ModelRouter(default_model="m", routes="", fallbacks=[]),
+        store=open_store("memory://")
+    )
+    session_id = engine.store.create_session()
+
+    streamed = "".join(engine.stream_bot_response("where is o-1?", session_id=session_id))
+    _, turn = engine.store.recent(session_id)
+    assert streamed == "Let me check." + PREAMBLE_SEPARATOR + "Order o-1 has shipped."
+    assert mcp_client.calls == [("get_product", {"sku": "MON-0001"}), ("get_order", {"order_id": "o-1"})]
+    # The preamble stays with its tool calls; the reply is the answer alone
+    assert turn[1]["content"] == "Let me check." and len(turn[1]["tool_calls"]) == 2
+    assert turn[-1] == {"role": "assistant", "content": "Order o-1 has shipped."}
+
+
+class ClosableStreamLLM:
+    """Streams one text answer and records whether the stream was closed."""
+
+    def __init__(self):
+        self.closed = False
+        self.chat = SimpleNamespace(completions=self)
+        self.streams = []  # kept alive, so only an explicit close() closes them
+
+    def create(self, **kwargs):
+        self.streams.append(self._chunks())
+        return self.streams[-1]
+
+    def _chunks(self):
+        try:
+            yield _chunk("Order o-1 ")
+            yield _chunk("has shipped.")
+        finally:
+            self.closed = True
+
+
+def test_a_stream_abandoned_mid_answer_is_closed():
+    llm = ClosableStreamLLM()
+    engine = ChatEngine(
+        mcp_client=FakeMCPClient(), llm_client=llm, validator=None,
+        model_router=ModelRouter(default_model="m", routes="", fallbacks=[]), store=open_store("memory://")
+    )
+    tokens = engine.stream_bot_response("where is o-1?", session_id=engine.store.create_session())
+    assert next(tokens) == "Order o-1 " and not llm.closed
+    tokens.close()
+    assert llm.closed
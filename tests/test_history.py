@@ -0,0 +1,80 @@
+from src.history import HistoryManager, split_turns
+
+ORDER_ID = "6632c0ed-46c0-4a09-9077-024ee81d6424"
+CUSTOMER_ID = "0b3c7d1e-1111-4a09-9077-024ee81d0000"
+
+
+def make_history(turns):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"question {i} " + "x" * 200})
+        history.append({"role": "assistant", "content": f"answer {i} " + "y" * 200})
+    return history
+
+
+def test_split_turns():
+    assert len(split_turns(make_history(3))) == 3
+
+
+def test_short_history_is_sent_verbatim():
+    manager = HistoryManager(token_budget=10000, keep_turns=6)
+    messages = manager.build_messages("system", make_history(2), "hi")
+    assert len(messages) == 1 + 4 + 1
+    assert manager.summary_lines == []
+
+
+def test_older_turns_fold_into_summary():
+    manager = HistoryManager(token_budget=10000, keep_turns=2)
+    messages = manager.build_messages("system", make_history(5), "hi")
+    assert messages[1]["role"] == "system"
+    assert "question 0" in messages[1]["content"]
+    assert len(messages) == 1 + 1 + 4 + 1
+    assert manager.folded_turns == 3
+
+
+def test_summary_is_extended_not_regenerated():
+    manager = HistoryManager(token_budget=10000, keep_turns=2)
+    history = make_history(4)
+    manager.build_messages("system", history, "hi")
+    first_lines = list(manager.summary_lines)
+    history += make_history(1)
+    manager.build_messages("system", history, "hi")
+    assert manager.summary_lines[:len(first_lines)] == first_lines
+    assert len(manager.summary_lines) == len(first_lines) + 1
+
+
+def test_token_budget_shrinks_window():
+    # Each turn is ~112 tokens; with the prompt (~9) and the summary allowance
+    # (~64), a 400-token budget fits 2 of the 6 turns keep_turns would allow
+    manager = HistoryManager(token_budget=400, keep_turns=6)
+    messages = manager.build_messages("system", make_history(6), "hi")
+    verbatim = [m for m in messages if m["role"] in ("user", "assistant")][:-1]
+    assert [m["content"].split(" ")[:2] for m in verbatim] == [
+        ["question", "4"], ["answer", "4"], ["question", "5"], ["answer", "5"]
+    ]
+    assert manager.folded_turns == 4
+    summary = messages[1]["content"]
+    assert all(f"question {i}" in summary and f"answer {i}" in summary for i in range(4))
+    assert "question 4" not in summary
+
+
+def test_key_facts_survive_summary_truncation():
+    manager = HistoryManager(token_budget=10000, keep_turns=1, summary_lines=1)
+    history = [
+        {"role": "user", "content": f"My customer id is {CUSTOMER_ID}"},
+        {"role": "assistant", "content": "Thanks, you are verified."},
+        {"role": "user", "content": f"Where is order {ORDER_ID}? It had MON-0056"},
+        {"role": "assistant", "content": "It shipped."},
+    ] + make_history(3)
+    manager.build_messages("system", history, "hi")
+    assert manager.facts["customer_ids"] == [CUSTOMER_ID]
+    assert manager.facts["order_ids"] == [ORDER_ID]
+    assert manager.facts["skus"] == ["MON-0056"]
+    assert ORDER_ID in manager.summary_text()
+
+
+def test_cleared_history_resets_summary():
+    manager = HistoryManager(token_budget=10000, keep_turns=1)
+    manager.build_messages("system", make_history(4), "hi")
+    manager.build_messages("system", [], "hi")
+    assert manager.summary_lines == []
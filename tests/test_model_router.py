@@ -0,0 +1,169 @@
+import asyncio
+import time
+
+import pytest
+from openai import AsyncOpenAI, OpenAI
+
+from bench.llm_stub import LLMStubServer
+from src.engine import ChatEngine
+from src.model_router import ModelRouter, parse_routes, turn_features
+
+SCRIPT = [{"match": "hello", "steps": [{"content": "Hi there, how can I help?"}]}]
+
+
+def _user(text: str) -> list:
+    return [{"role": "system", "content": "You are a bot."}, {"role": "user", "content": text}]
+
+
+def test_routes_by_turn_features():
+    router = ModelRouter(
+        default_model="main", routes="write=careful,long=big-context,chat=cheap,followup=fast", fallbacks=[],
+        long_history=6
+    )
+    assert router.choose(_user("hello!")) == "cheap"
+    assert router.choose(_user("Where is order 6632c0ed?")) == "main"
+    assert router.choose(_user("I want to buy two MON-0054 monitors")) == "careful"
+    assert router.choose(_user("hi") * 4) == "big-context"
+    after_tools = _user("Price of MON-0054?") + [
+        {"role": "assistant", "content": None, "tool_calls": [{"id": "c1", "function": {"name": "get_product", "arguments": "{}"}}]},
+        {"role": "tool", "tool_call_id": "c1", "content": "{}"},
+    ]
+    assert turn_features(after_tools) == {"followup"}
+    assert router.choose(after_tools) == "fast"
+    with pytest.raises(ValueError):
+        parse_routes("sometimes=model")
+
+
+def test_slow_first_byte_fails_over():
+    stub = LLMStubServer(SCRIPT, model_latency={"slow-model": 1.0}).start()
+    client = OpenAI(base_url=stub.base_url, api_key="test", max_retries=0)
+    router = ModelRouter(default_model="slow-model", routes="", fallbacks=["fast-model"], ttfb_deadline=0.2)
+    try:
+        start = time.monotonic()
+        model, response = router.complete(client, _user("hello"))
+        assert model == "fast-model"
+        assert response.choices[0].message.content == "Hi there, how can I help?"
+        assert time.monotonic() - start < 0.9
+
+        model, stream = router.complete(client, _user("hello"), stream=True)
+        assert model == "fast-model"
+        assert "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices).strip() == \
+            "Hi there, how can I help?"
+        assert router.stats["failovers"] == 2
+        assert router.health()["fast-model"]["error_rate"] == 0.0
+    finally:
+        stub.stop()
+
+
+def test_failing_model_is_skipped_once_its_circuit_opens():
+    stub = LLMStubServer(SCRIPT, failing_models={"primary": 503}).start()
+    client = OpenAI(base_url=stub.base_url, api_key="test", max_retries=0)
+    router = ModelRouter(default_model="primary", routes="", fallbacks=["backup"], failure_threshold=2)
+    try:
+        for _ in range(4):
+            assert router.complete(client, _user("hello"))[0] == "backup"
+        assert stub.stats["models"] == {"primary": 2, "backup": 4}
+        assert router.health()["primary"]["circuit"] == "open"
+
+        # Errors another model can't fix are raised, not failed over
+        stub.failing_models = {"backup": 400}
+        bad_request = ModelRouter(default_model="backup", routes="", fallbacks=["primary"])
+        with pytest.raises(Exception) as error:
+            bad_request.complete(client, _user("hello"))
+        assert getattr(error.value, "status_code", None) == 400
+    finally:
+        stub.stop()
+
+
+def test_async_stream_fails_over_on_deadline():
+    stub = LLMStubServer(SCRIPT, model_latency={"slow-model": 1.0}).start()
+    router = ModelRouter(default_model="slow-model", routes="", fallbacks=["fast-model"], ttfb_deadline=0.2)
+
+    async def main():
+        client = AsyncOpenAI(base_url=stub.base_url, api_key="test", max_retries=0)
+        model, stream = await router.acomplete(client, _user("hello"), stream=True)
+        text = "".join([chunk.choices[0].delta.content or "" async for chunk in stream if chunk.choices])
+        await client.close()
+        return model, text
+
+    try:
+        model, text = asyncio.run(main())
+        assert model == "fast-model"
+        assert text.strip() == "Hi there, how can I help?"
+    finally:
+        stub.stop()
+
+
+def test_engine_answers_through_the_backup_model():
+    stub = LLMStubServer(SCRIPT, failing_models={"google/gemini-2.0-flash-001": 429}).start()
+    engine = ChatEngine(
+        mcp_client=None,
+        llm_client=OpenAI(base_url=stub.base_url, api_key="test", max_retries=0),
+        model_router=ModelRouter(default_model="google/gemini-2.0-flash-001", routes="", fallbacks=["backup"])
+    )
+    try:
+        assert engine.get_bot_response("hello") == "Hi there, how can I help?"
+        assert "".join(engine.stream_bot_response("hello")).strip() == "Hi there, how can I help?"
+    finally:
+        stub.stop()
+
+
+def test_a_pause_mid_stream_is_not_a_missed_deadline():
+    stub = LLMStubServer(SCRIPT, token_delay=0.25).start()
+    client = OpenAI(base_url=stub.base_url, api_key="test", max_retries=0)
+    router = ModelRouter(default_model="primary", routes="", fallbacks=["backup"], ttfb_deadline=0.15)
+    try:
+        model, stream = router.complete(client, _user("hello"), stream=True)
+        assert "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices).strip() == \
+            "Hi there, how can I help?"
+        assert model == "primary" and router.stats["failovers"] == 0
+    finally:
+        stub.stop()
+
+
+class ClosableStreamLLM:
+    """create() returns a stream of two chunks that records whether it was closed."""
+
+    def __init__(self):
+        self.closed = False
+        self.chat = self.completions = self
+
+    def create(self, **kwargs):
+        return self._chunks()
+
+    def _chunks(self):
+        try:
+            yield "first"
+            yield "second"
+        finally:
+            self.closed = True
+
+    async def _achunks(self):
+        try:
+            yield "first"
+            yield "second"
+        finally:
+            self.closed = True
+
+
+class ClosableAsyncStreamLLM(ClosableStreamLLM):
+    async def create(self, **kwargs):
+        return self._achunks()
+
+
+def test_closing_a_started_stream_closes_the_model_stream():
+    router = ModelRouter(default_model="primary", routes="", fallbacks=["backup"], ttfb_deadline=1.0)
+    client = ClosableStreamLLM()
+    _, stream = router.complete(client, _user("hello"), stream=True)
+    assert next(stream) == "first" and not client.closed
+    stream.close()
+    assert client.closed
+
+    async def main(client):
+        _, stream = await router.acomplete(client, _user("hello"), stream=True)
+        assert await stream.__anext__() == "first" and not client.closed
+        await stream.close()
+
+    client = ClosableAsyncStreamLLM()
+    asyncio.run(main(client))
+    assert client.closed
@@ -0,0 +1,81 @@
+import json
+import time
+
+from bench.mcp_stub import MCPStubServer
+from src.cache import ToolCache
+from src.mcp_client import MCPClient
+from src.notifications import NotificationListener, iter_sse, parse_resource_uri
+from src.transport import HTTPTransport
+
+
+def _wait_for(condition, timeout: float = 3.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_parses_event_stream():
+    lines = [": connected", "", "event: message", "data: {\"a\":", "data: 1}", "", "data: x", ""]
+    assert list(iter_sse(lines)) == [("message", "{\"a\":\n1}"), ("message", "x")]
+
+
+def test_resource_uris():
+    assert parse_resource_uri("product://MON-0054") == ("product", "MON-0054")
+    assert parse_resource_uri("order://6632c0ed") == ("order", "6632c0ed")
+    assert parse_resource_uri("catalog://products") == ("catalog", None)
+    assert parse_resource_uri("customer://c1")[0] is None
+
+
+def test_product_update_invalidates_related_entries():
+    cache = ToolCache()
+    for tool, args in [
+        ("get_product", {"sku": "MON-0001"}), ("get_product", {"sku": "MON-0002"}),
+        ("list_products", {}), ("search_products", {"query": "monitor"}),
+    ]:
+        cache.put(tool, args, "[]")
+    listener = NotificationListener("http://mcp.test", cache=cache)
+    changes = []
+    listener.add_callback(lambda kind, item_id: changes.append((kind, item_id)))
+
+    listener.handle(json.dumps({"method": "notifications/resources/updated", "params": {"uri": "product://MON-0001"}}))
+    assert cache.get("get_product", {"sku": "MON-0001"}) is None
+    assert cache.get("list_products", {}) is None
+    assert cache.get("search_products", {"query": "monitor"}) is None
+    assert len(cache) == 1
+    listener.handle(json.dumps({"method": "notifications/resources/updated", "params": {"uri": "order://o1"}}))
+    listener.handle(json.dumps({"method": "notifications/progress", "params": {}}))
+    assert changes == [("product", "MON-0001"), ("order", "o1")]
+    assert listener.stats["ignored"] == 1
+
+
+def test_ttls_are_capped_until_subscribed():
+    cache = ToolCache(ttls={"list_products": 3600})
+    NotificationListener("http://mcp.test", cache=cache, fallback_max_age=0.01)
+    cache.put("list_products", {}, "[]")
+    time.sleep(0.02)
+    assert cache.get("list_products", {}) is None
+
+
+def test_stale_stock_is_dropped_on_push():
+    stub = MCPStubServer(sse_keepalive=0.2).start()
+    client = MCPClient(server_url=stub.url, transport=HTTPTransport(), cache=ToolCache())
+    try:
+        listener = client.subscribe()
+        assert client.subscribe() is listener
+        assert _wait_for(lambda: listener.connected)
+        assert json.loads(client.get_product("MON-0001"))["stock"] > 0
+
+        stub.update_product("MON-0001", stock=0)
+        assert _wait_for(lambda: listener.stats["events"] == 1)
+        assert json.loads(client.get_product("MON-0001"))["stock"] == 0
+
+        # A dropped stream caps TTLs, then reconnects
+        stub.disconnect_subscribers()
+        assert _wait_for(lambda: listener.stats["connects"] == 2)
+        assert client.cache.max_age is None
+    finally:
+        client.notifications.stop()
+        stub.stop()
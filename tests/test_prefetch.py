@@ -0,0 +1,57 @@
+import json
+import threading
+
+from src.prefetch import Prefetcher, predict_calls
+
+ORDER_ID = "3f2b8c1e-9a4d-4e7b-8c2d-1a2b3c4d5e6f"
+CUSTOMER_ID = "7a6b5c4d-3e2f-4a1b-9c8d-7e6f5a4b3c2d"
+
+
+class FakeMCPClient:
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def call_tool(self, tool_name, arguments=None):
+        with self._lock:
+            self.calls.append((tool_name, arguments))
+        return json.dumps({"tool": tool_name, "arguments": arguments})
+
+
+def test_predicts_lookups_from_entities():
+    calls = predict_calls(f"Where is order {ORDER_ID}? Also is MON-0056 in stock? I'm bob@example.com")
+    assert calls == [("get_order", {"order_id": ORDER_ID}), ("get_product", {"sku": "MON-0056"})]
+    assert predict_calls(f"customer {CUSTOMER_ID}") == [("list_orders", {"customer_id": CUSTOMER_ID})]
+
+
+def test_matching_call_is_handed_over():
+    client = FakeMCPClient()
+    prefetcher = Prefetcher(client)
+    turn = prefetcher.start(f"Status of order {ORDER_ID}?")
+    assert turn.take("get_order", {"order_id": ORDER_ID}) == client.call_tool("get_order", {"order_id": ORDER_ID})
+    assert turn.take("get_order", {"order_id": ORDER_ID}) is None
+    turn.finish()
+    assert prefetcher.stats["hits"] == 1
+    assert prefetcher.stats["wasted"] == 0
+
+
+def test_budget_and_wasted_calls():
+    prefetcher = Prefetcher(FakeMCPClient(), max_calls=2)
+    turn = prefetcher.start("Compare MON-0001, MON-0002 and MON-0003")
+    turn.take("get_product", {"sku": "MON-0001"})
+    turn.finish()
+    assert prefetcher.stats["issued"] == 2
+    assert prefetcher.stats["over_budget"] == 1
+    assert prefetcher.stats["wasted"] == 1
+    assert prefetcher.hit_rate == 0.5
+
+
+def test_verified_customer_orders_are_prefetched():
+    client = FakeMCPClient()
+    prefetcher = Prefetcher(client)
+    turn = prefetcher.start("I'm bob@example.com, PIN 1234")
+    assert prefetcher.stats["issued"] == 0
+    turn.observe("verify_customer_pin", json.dumps({"verified": True, "customer_id": CUSTOMER_ID}))
+    assert turn.take("list_orders", {"customer_id": CUSTOMER_ID}) is not None
+    turn.finish()
+    assert prefetcher.stats == {"issued": 2, "hits": 1, "wasted": 1, "over_budget": 0}
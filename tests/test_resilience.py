@@ -0,0 +1,265 @@
+import threading
+import time
+
+from src.mcp_client import MCPClient
+from src.resilience import IDEMPOTENT_TOOLS, CircuitBreaker, LatencyTracker, RetryPolicy, SingleFlight
+
+
+def test_writes_and_pin_checks_are_never_retried():
+    assert "create_order" not in IDEMPOTENT_TOOLS
+    assert "verify_customer_pin" not in IDEMPOTENT_TOOLS
+    assert "get_order" in IDEMPOTENT_TOOLS
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(max_attempts=5, base_delay=0.1, max_delay=0.5)
+    for attempt in range(6):
+        delay = policy.delay(attempt)
+        assert 0 <= delay <= min(0.5, 0.1 * 2 ** attempt)
+
+
+def test_hedge_delay_needs_enough_samples():
+    tracker = LatencyTracker(min_samples=10, min_delay=0.01)
+    for _ in range(9):
+        tracker.record("get_order", 0.1)
+    assert tracker.hedge_delay("get_order") is None
+    tracker.record("get_order", 2.0)
+    assert tracker.hedge_delay("get_order") == 2.0
+    assert tracker.hedge_delay("get_product") is None
+
+
+def test_breaker_opens_and_probes_after_timeout():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()        # single half-open probe
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats["opened"] == 2
+
+
+class SlowTransport:
+    """Answers every tools/call after a delay, counting requests."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def post(self, url, json, headers, timeout):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.delay)
+        return _Response({"jsonrpc": "2.0", "id": json["id"], "result": {"content": [{"text": json["params"]["name"]}]}})
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, body):
+        self._body = body
+        self.content = b"{}"
+
+    def json(self):
+        if isinstance(self._body, Exception):
+            raise self._body
+        return self._body
+
+
+def _run_concurrently(fn, count: int) -> list:
+    results = [None] * count
+
+    def run(i):
+        results[i] = fn()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_single_flight_shares_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    def call():
+        calls.append(1)
+        time.sleep(0.05)
+        return "result"
+
+    results = _run_concurrently(lambda: flights.do("key", call), 10)
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 9
+    assert all(result == "result" for result, _ in results)
+    assert flights.stats == {"leaders": 1, "coalesced": 9}
+    # Finished calls are not remembered
+    assert flights.do("key", lambda: "again") == ("again", False)
+
+
+def test_single_flight_shares_exceptions():
+    flights = SingleFlight()
+
+    def call():
+        time.sleep(0.05)
+        raise ValueError("boom")
+
+    def run():
+        try:
+            flights.do("key", call)
+        except ValueError as e:
+            return str(e)
+
+    assert _run_concurrently(run, 4) == ["boom"] * 4
+
+
+def test_client_coalesces_identical_reads_only():
+    transport = SlowTransport()
+    client = MCPClient(server_url="http://mcp.test", transport=transport, hedge=False)
+
+    results = _run_concurrently(lambda: client.list_products(category="Monitors"), 20)
+    assert results == ["list_products"] * 20
+    assert transport.requests == 1
+    assert client.flights.stats["coalesced"] == 19
+
+    _run_concurrently(lambda: client.get_product("MON-0001"), 3)
+    _run_concurrently(lambda: client.get_product("MON-0002"), 3)
+    assert transport.requests == 3
+
+    # Writes and PIN checks are never shared
+    _run_concurrently(lambda: client.create_order("c1", [{"sku": "MON-0001", "quantity": 1}]), 3)
+    _run_concurrently(lambda: client.verify_customer_pin("a@b.c", "1234"), 3)
+    assert transport.requests == 9
+
+
+class FlakyTransport:
+    """Refuses connections while `down`, otherwise answers single and batched tools/call requests."""
+
+    def __init__(self):
+        self.down = True
+        self.requests = 0
+
+    def post(self, url, json, headers, timeout):
+        self.requests += 1
+        if self.down:
+            raise ConnectionError("connection refused")
+        if isinstance(json, list):
+            return _Response([self._answer(item) for item in json])
+        return _Response(self._answer(json))
+
+    @staticmethod
+    def _answer(request):
+        return {"jsonrpc": "2.0", "id": request["id"], "result": {"content": [{"text": request["params"]["arguments"]["sku"]}]}}
+
+
+def _flaky_client():
+    transport = FlakyTransport()
+    client = MCPClient(
+        server_url="http://mcp.test",
+        transport=transport,
+        retry_policy=RetryPolicy(max_attempts=1),
+        breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05),
+        hedge=False,
+        coalesce=False
+    )
+    return client, transport
+
+
+def test_single_calls_close_the_breaker_after_a_probe():
+    client, transport = _flaky_client()
+    assert client.get_product("MON-0001").startswith("Error")
+    assert client.breaker.state == "open"
+    assert "circuit open" in client.get_product("MON-0001")
+    assert transport.requests == 1
+
+    time.sleep(0.06)
+    assert client.get_product("MON-0001").startswith("Error")   # failed probe re-opens
+    assert client.breaker.state == "open"
+
+    time.sleep(0.06)
+    transport.down = False
+    assert client.get_product("MON-0001") == "MON-0001"
+    assert client.breaker.state == "closed"
+
+
+def test_batches_close_the_breaker_after_a_probe():
+    client, transport = _flaky_client()
+    calls = [("get_product", {"sku": "MON-0001"}), ("get_product", {"sku": "MON-0002"})]
+    assert all(result.startswith("Error") for result in client.call_tools_batch(calls))
+    assert client.breaker.state == "open"
+
+    # A batch lost in transit takes the half-open probe and must give it back
+    time.sleep(0.06)
+    assert all(result.startswith("Error") for result in client.call_tools_batch(calls))
+    assert client.breaker.state == "open"
+
+    time.sleep(0.06)
+    transport.down = False
+    assert client.call_tools_batch(calls) == ["MON-0001", "MON-0002"]
+    assert client.breaker.state == "closed"
+    assert client.batch_supported is True
+
+
+class BatchTransport(FlakyTransport):
+    """Answers batches in reverse order, or rejects them like a server without batch support."""
+
+    def __init__(self, batch_status: int = 200):
+        super().__init__()
+        self.down = False
+        self.batch_status = batch_status
+        self.batches = 0
+
+    def post(self, url, json, headers, timeout):
+        if not isinstance(json, list):
+            return super().post(url, json, headers, timeout)
+        self.batches += 1
+        if self.batch_status == 200:
+            return _Response([self._answer(item) for item in reversed(json)])
+        response = _Response({"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}})
+        if self.batch_status == 404:
+            response = _Response(ValueError("not JSON"))
+        response.status_code = self.batch_status
+        return response
+
+
+CALLS = [("get_product", {"sku": f"MON-000{i}"}) for i in range(1, 4)]
+
+
+def _batch_client(transport) -> MCPClient:
+    return MCPClient(server_url="http://mcp.test", transport=transport, hedge=False, coalesce=False)
+
+
+def test_batch_responses_are_matched_by_id():
+    transport = BatchTransport()
+    client = _batch_client(transport)
+    assert client.call_tools_batch(CALLS) == ["MON-0001", "MON-0002", "MON-0003"]
+    assert transport.batches == 1 and transport.requests == 0
+    assert client.batch_supported is True
+
+
+def test_only_a_rejected_batch_disables_batching():
+    transport = BatchTransport(batch_status=400)
+    client = _batch_client(transport)
+    assert client.call_tools_batch(CALLS) == ["MON-0001", "MON-0002", "MON-0003"]
+    assert client.batch_supported is False
+    assert transport.requests == 3
+    client.call_tools_batch(CALLS)
+    assert transport.batches == 1
+
+    # An error page or a refused connection fails the calls, not the feature
+    for status in (404, 503):
+        client = _batch_client(BatchTransport(batch_status=status))
+        assert all(result.startswith("Error") for result in client.call_tools_batch([("create_order", {}), ("create_order", {})]))
+        assert client.batch_supported is not False
@@ -0,0 +1,46 @@
+import json
+
+from src.router import FastPathRouter, render_answer
+
+ORDER_ID = "6632c0ed-46c0-4a09-9077-024ee81d6424"
+
+
+def test_routes_sku_and_order_lookups():
+    router = FastPathRouter(threshold=0.8)
+    route = router.route("Tell me about product mon-0056")
+    assert route.tool_name == "get_product"
+    assert route.arguments == {"sku": "MON-0056"}
+    route = router.route(f"What's the status of order {ORDER_ID}?")
+    assert route.tool_name == "get_order"
+    assert route.arguments == {"order_id": ORDER_ID}
+    assert router.route(ORDER_ID).confidence == 1.0
+    assert router.stats["taken"] == 3
+
+
+def test_skips_ambiguous_or_complex_messages():
+    router = FastPathRouter(threshold=0.8)
+    assert router.route("Compare MON-0056 and MON-0054") is None
+    assert router.route("I want to buy MON-0056") is None
+    assert router.route(f"Show customer {ORDER_ID}") is None
+    assert router.route("What monitors do you have?") is None
+    assert router.stats == {"taken": 0, "skipped": 4, "below_threshold": 0}
+
+
+def test_threshold_applies():
+    router = FastPathRouter(threshold=0.8)
+    assert router.route("Is MON-0056 good enough for photo editing work") is None
+    assert router.stats["below_threshold"] == 1
+
+
+def test_render_answer():
+    router = FastPathRouter()
+    product = router.classify("MON-0056")
+    text = render_answer(product, json.dumps({"sku": "MON-0056", "name": "ProGamer 32", "price": "399.00", "stock": 4}))
+    assert "**ProGamer 32** (MON-0056)" in text
+    assert "$399.00" in text
+    assert render_answer(product, "Product not found") is None
+
+    order = router.classify(ORDER_ID)
+    text = render_answer(order, json.dumps({"id": ORDER_ID, "status": "submitted", "items": [{"sku": "MON-0056", "quantity": 2}]}))
+    assert "Status: submitted" in text
+    assert "2 x MON-0056" in text
@@ -0,0 +1,54 @@
+import json
+
+from src.search_index import ProductSearchIndex, parse_products, stem, tokenize
+
+CATALOG = [
+    {"sku": "MON-0054", "name": "UltraView 27-inch 4K Monitor", "description": "IPS panel with USB-C", "category": "Monitors"},
+    {"sku": "MON-0056", "name": "ProGamer 32 Curved Monitor", "description": "165Hz gaming display", "category": "Monitors"},
+    {"sku": "ACC-0201", "name": "Wireless Keyboard", "description": "Slim keyboard with long battery life", "category": "Accessories"},
+    {"sku": "PRI-0101", "name": "LaserJet Printer", "description": "Monochrome laser printing", "category": "Printers"},
+]
+
+
+def build():
+    index = ProductSearchIndex()
+    index.update(CATALOG)
+    return index
+
+
+def test_tokenize_and_stem():
+    assert stem("monitors") == "monitor"
+    assert stem("accessories") == "accessory"
+    assert tokenize("27-inch Monitors") == ["27", "inch", "monitor"]
+
+
+def test_parse_products_accepts_list_or_wrapper():
+    assert parse_products(json.dumps(CATALOG)) == CATALOG
+    assert parse_products(json.dumps({"products": CATALOG})) == CATALOG
+    assert parse_products("Error: Request timed out") is None
+
+
+def test_ranks_name_matches_first():
+    index = build()
+    assert not ProductSearchIndex().is_warm
+    assert index.is_warm
+    results = index.search("wireless keyboard")
+    assert results[0]["sku"] == "ACC-0201"
+    assert {p["sku"] for p in index.search("monitors")} == {"MON-0054", "MON-0056"}
+
+
+def test_typo_tolerance():
+    index = build()
+    assert index.search("keybaord")[0]["sku"] == "ACC-0201"
+    assert index.search("printr")[0]["sku"] == "PRI-0101"
+
+
+def test_incremental_update():
+    index = build()
+    changed = [dict(p) for p in CATALOG[1:]]
+    changed[0]["name"] = "ProGamer 32 Curved Display"
+    index.update(changed)
+    assert len(index) == 3
+    assert index.stats["docs_reindexed"] == len(CATALOG) + 1
+    assert [p["sku"] for p in index.search("ultraview")] == []
+    assert index.search("curved display")[0]["name"] == "ProGamer 32 Curved Display"
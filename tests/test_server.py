@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("aiohttp")
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.conversation_store import MemoryConversationStore, chat_messages
+from src.server import create_app
+
+
+class FakeMCPClient:
+    async def aclose(self):
+        pass
+
+
+class FakeEngine:
+    mcp_client = FakeMCPClient()
+
+    def __init__(self):
+        self.store = MemoryConversationStore()
+        self.turns = []
+
+    async def get_bot_response(self, user_message, chat_history=None, history=None, result_store=None, session_id=None, customer_context=None):
+        self.turns.append((user_message, chat_messages(self.store.recent(session_id)[1])))
+        reply = f"echo: {user_message}"
+        self.store.append(session_id, [{"role": "user", "content": user_message}, {"role": "assistant", "content": reply}])
+        return reply
+
+    async def stream_bot_response(self, user_message, chat_history=None, history=None, result_store=None, session_id=None, customer_context=None):
+        for token in ("echo: ", user_message):
+            yield token
+        self.store.append(session_id, [{"role": "user", "content": user_message}, {"role": "assistant", "content": "echo: " + user_message}])
+
+
+def run(test):
+    async def main():
+        engine = FakeEngine()
+        async with TestClient(TestServer(create_app(engine))) as client:
+            await test(client, engine)
+    asyncio.run(main())
+
+
+def test_session_round_trip():
+    async def test(client, engine):
+        response = await client.post("/sessions")
+        session_id = (await response.json())["session_id"]
+
+        response = await client.post(f"/sessions/{session_id}/messages", json={"content": "hi"})
+        assert (await response.json()) == {"reply": "echo: hi"}
+        await client.post(f"/sessions/{session_id}/messages", json={"content": "again"})
+        assert engine.turns[1][1] == [
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": "echo: hi"},
+        ]
+
+        response = await client.get(f"/sessions/{session_id}")
+        assert len((await response.json())["messages"]) == 4
+        response = await client.get(f"/sessions/{session_id}?before=1&turns=5")
+        assert (await response.json())["messages"] == engine.turns[1][1]
+        await client.delete(f"/sessions/{session_id}")
+        assert (await client.get(f"/sessions/{session_id}")).status == 404
+    run(test)
+
+
+def test_streamed_reply_is_sent_as_sse():
+    async def test(client, engine):
+        session_id = (await (await client.post("/sessions")).json())["session_id"]
+        response = await client.post(f"/sessions/{session_id}/messages", json={"content": "hi", "stream": True})
+        assert response.headers["Content-Type"].startswith("text/event-stream")
+        events = [
+            (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+            for block in (await response.text()).strip().split("\n\n")
+        ]
+        assert events == [("token", {"text": "echo: "}), ("token", {"text": "hi"}), ("done", {"reply": "echo: hi"})]
+    run(test)
+
+
+def test_rejects_empty_messages():
+    async def test(client, engine):
+        session_id = (await (await client.post("/sessions")).json())["session_id"]
+        assert (await client.post(f"/sessions/{session_id}/messages", json={"content": " "})).status == 400
+        assert (await client.post("/sessions/missing/messages", json={"content": "hi"})).status == 404
+    run(test)
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from src.engine import ChatEngine
+from src.startup import Lazy, warm_up
+from src.tools import OPENAI_TOOLS, get_openai_tools
+
+
+def test_lazy_builds_once_across_threads():
+    builds = []
+
+    def factory():
+        time.sleep(0.01)
+        builds.append(1)
+        return object()
+
+    lazy = Lazy(factory, "client")
+    assert not lazy.built
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(lazy.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert lazy.built
+    assert all(value is values[0] for value in values)
+
+
+def test_engine_builds_llm_client_on_first_use():
+    lazy = Lazy(lambda: "client", "llm_client")
+    engine = ChatEngine(mcp_client=None, llm_client=lazy)
+    assert not lazy.built
+    assert engine.llm_client == "client"
+    assert lazy.built
+
+
+def test_warm_up_builds_clients_and_connects():
+    class FakeMCPClient:
+        warmed = False
+
+        def warm_up(self):
+            self.warmed = True
+            return True
+
+    lazy = Lazy(lambda: "client", "llm_client")
+    failing = Lazy(lambda: 1 / 0, "broken")
+    mcp_client = FakeMCPClient()
+    warm_up(lazy, failing, None, mcp_client=mcp_client).join(timeout=5)
+
+    assert lazy.built
+    assert not failing.built
+    assert mcp_client.warmed
+
+
+def test_tool_schema_is_built_once():
+    assert get_openai_tools() is OPENAI_TOOLS
+    assert OPENAI_TOOLS[0]["function"]["name"] == "list_products"
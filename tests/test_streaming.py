@@ -0,0 +1,95 @@
+import json
+import tracemalloc
+
+import pytest
+
+from bench.mcp_stub import MCPStubServer
+from src.mcp_client import MCPClient
+from src.streaming import ToolResultError, iter_tool_records
+from src.transport import HTTPTransport
+
+
+def _envelope(text: str) -> bytes:
+    return json.dumps({"jsonrpc": "2.0", "id": 1, "result": {"content": [{"type": "text", "text": text}]}}).encode()
+
+
+def _chunked(body: bytes, size: int) -> list:
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def test_decodes_records_across_any_chunking():
+    # Escaped quotes and backslashes, multi-byte UTF-8 and surrogate pairs split at every offset
+    records = [{"id": i, "note": f"\"{i}\" é 😀 \\ \\😀", "total": i * 1.5} for i in range(50)]
+    body = _envelope(json.dumps(records))
+    for size in (1, 2, 3, 5, 7, 64, len(body)):
+        assert list(iter_tool_records(_chunked(body, size))) == records
+
+
+def test_wrapped_and_failed_results():
+    wrapped = _envelope(json.dumps({"orders": [{"id": "o1"}], "total": 1}))
+    assert list(iter_tool_records([wrapped])) == [{"id": "o1"}]
+    assert list(iter_tool_records([_envelope("[]")])) == []
+
+    error = json.dumps({"jsonrpc": "2.0", "id": 1, "error": {"code": -32602, "message": "Unknown tool"}}).encode()
+    for body, message in [(error, "Unknown tool"), (_envelope("Order not found"), "Order not found")]:
+        with pytest.raises(ToolResultError, match=message):
+            list(iter_tool_records([body]))
+    with pytest.raises(ToolResultError, match="Malformed"):
+        list(iter_tool_records([_envelope(json.dumps([{"id": 1}] * 10))[:60]]))
+
+
+def test_memory_is_bounded_by_one_record():
+    record = json.dumps({"id": "6632c0ed", "status": "submitted", "total": "129.99", "note": "x" * 200})
+
+    def body():
+        # ~5 MB of envelope, produced lazily so only the decoder's buffers count
+        yield b'{"jsonrpc": "2.0", "id": 1, "result": {"content": [{"type": "text", "text": "['
+        escaped = json.dumps(record)[1:-1].encode()
+        for i in range(20000):
+            yield (b", " if i else b"") + escaped
+        yield b']"}]}}'
+
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in iter_tool_records(body()))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert count == 20000
+    assert peak < 256 * 1024
+
+
+def test_iter_orders_pages_through_the_server():
+    stub = MCPStubServer().start()
+    client = MCPClient(server_url=stub.url, transport=HTTPTransport(), coalesce=False)
+    try:
+        everything = json.loads(client.list_orders())
+        assert len(everything) == 100
+        assert json.loads(client.list_orders(limit=5, offset=10)) == everything[10:15]
+
+        stub.reset_stats()
+        assert list(client.iter_orders(page_size=30)) == everything
+        assert stub.stats["tool_calls"]["list_orders"] == 4  # 30 + 30 + 30 + 10
+
+        customer_id = everything[0]["customer_id"]
+        assert [o["id"] for o in client.iter_orders(customer_id=customer_id, page_size=2)] == [
+            o["id"] for o in everything if o["customer_id"] == customer_id
+        ]
+        assert len(list(client.iter_products(category="Printers"))) == 25
+    finally:
+        stub.stop()
+
+
+def test_server_without_pagination_is_read_once():
+    stub = MCPStubServer().start()
+    stub.TOOLS = dict(stub.TOOLS, list_orders=lambda self, args: json.dumps(self.orders[:20]))
+    client = MCPClient(server_url=stub.url, transport=HTTPTransport(), coalesce=False)
+    try:
+        # The limit is ignored: one oversized page, and nothing more is requested
+        assert len(list(client.iter_orders(page_size=5))) == 20
+
+        # The offset is ignored: the repeated first page ends the iteration
+        stub.TOOLS = dict(stub.TOOLS, list_orders=lambda self, args: json.dumps(self.orders[:args["limit"]]))
+        assert len(list(client.iter_orders(page_size=5))) == 5
+    finally:
+        stub.stop()
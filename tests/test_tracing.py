@@ -0,0 +1,65 @@
+import json
+import threading
+import time
+
+from src.tracing import BufferedSink, OTLPFileExporter, Tracer
+
+
+class ListExporter:
+    def __init__(self):
+        self.records = []
+
+    def export(self, kind, record):
+        self.records.append((kind, record))
+
+
+def test_nested_spans_share_trace_and_record_attributes():
+    exporter = ListExporter()
+    tracer = Tracer(BufferedSink([exporter]))
+    with tracer.span("turn") as turn:
+        with tracer.span("llm_call", iteration=0) as call:
+            call.set("tool_calls", 2)
+        turn.set("iterations", 1)
+    tracer.sink.flush()
+
+    spans = {record["name"]: record for kind, record in exporter.records if kind == "span"}
+    assert spans["llm_call"]["traceId"] == spans["turn"]["traceId"]
+    assert spans["llm_call"]["parentSpanId"] == spans["turn"]["spanId"]
+    assert {"key": "tool_calls", "value": {"intValue": 2}} in spans["llm_call"]["attributes"]
+
+
+def test_prometheus_histograms():
+    tracer = Tracer(BufferedSink([]))
+    with tracer.span("mcp_call"):
+        pass
+    tracer.count("fast_path_taken", tool="get_product")
+    text = tracer.render_prometheus()
+    assert 'chatbot_span_duration_seconds_bucket{span="mcp_call",le="+Inf"} 1' in text
+    assert 'chatbot_span_duration_seconds_count{span="mcp_call"} 1' in text
+    assert 'chatbot_fast_path_taken_total{tool="get_product"} 1' in text
+
+
+def test_sink_drops_instead_of_blocking():
+    release = threading.Event()
+
+    class SlowExporter:
+        def export(self, kind, record):
+            release.wait()
+
+    sink = BufferedSink([SlowExporter()], max_size=2)
+    start = time.perf_counter()
+    for i in range(10):
+        sink.emit("log", {"message": str(i)})
+    assert time.perf_counter() - start < 0.1
+    assert sink.dropped > 0
+    release.set()
+
+
+def test_otlp_file_exporter(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    tracer = Tracer(BufferedSink([OTLPFileExporter(str(path))]))
+    with tracer.span("turn"):
+        pass
+    tracer.sink.flush()
+    line = json.loads(path.read_text().splitlines()[0])
+    assert line["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] == "turn"
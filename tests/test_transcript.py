@@ -0,0 +1,62 @@
+from src.conversation_store import MemoryConversationStore
+from src.transcript import TranscriptRenderer, turn_markdown
+
+
+def _session(store, turns: int) -> str:
+    session_id = store.create_session()
+    for n in range(turns):
+        store.append(session_id, [
+            {"role": "user", "content": f"question {n}"},
+            {"role": "tool", "tool_call_id": f"call_{n}", "content": "hidden"},
+            {"role": "assistant", "content": f"answer {n}"},
+        ])
+    return session_id
+
+
+def test_newest_turn_in_full_and_one_page_collapsed():
+    store = MemoryConversationStore()
+    session_id = _session(store, 25)
+    window = TranscriptRenderer(store, page_turns=10).window(session_id)
+
+    assert window.has_earlier
+    assert [m["content"] for m in window.latest] == ["question 24", "answer 24"]
+    assert [(first, end) for first, end, _ in window.pages] == [(14, 24)]
+    markdown = window.pages[0][2]
+    assert markdown.startswith("**You:** question 14")
+    assert "hidden" not in markdown
+
+
+def test_earlier_pages_come_from_the_store():
+    store = MemoryConversationStore(hot_turns=5)
+    session_id = _session(store, 25)
+    renderer = TranscriptRenderer(store, page_turns=10)
+    window = renderer.window(session_id, pages=3)
+
+    assert not window.has_earlier
+    assert [(first, end) for first, end, _ in window.pages] == [(0, 4), (4, 14), (14, 24)]
+    assert window.pages[0][2] == "\n\n---\n\n".join(
+        turn_markdown([{"role": "user", "content": f"question {n}"}, {"role": "assistant", "content": f"answer {n}"}])
+        for n in range(4)
+    )
+    assert renderer.stats["loads"] == 1
+
+
+def test_finished_turns_are_rendered_once():
+    store = MemoryConversationStore()
+    session_id = _session(store, 5)
+    renderer = TranscriptRenderer(store, page_turns=10)
+    renderer.window(session_id)
+    assert renderer.stats["renders"] == 4
+
+    new_turn = [{"role": "user", "content": "question 5"}, {"role": "assistant", "content": "answer 5"}]
+    store.append(session_id, new_turn)
+    window = renderer.window(session_id)
+    assert renderer.stats["renders"] == 5
+    assert renderer.stats["hits"] == 4
+    assert window.latest == new_turn
+
+
+def test_empty_session():
+    store = MemoryConversationStore()
+    window = TranscriptRenderer(store).window(store.create_session())
+    assert window == (False, [], [])
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from src.engine import ChatEngine
+from src.tools import LLM_STRING_FORMATS, MCP_OPENAI_TOOLS, OPENAI_TOOLS, TOOL_DEFINITIONS
+from src.validation import ToolArgumentError, ToolValidator
+
+CUSTOMER_ID = "7a6b5c4d-3e2f-4a1b-9c8d-7e6f5a4b3c2d"
+
+
+class FakeMCPClient:
+    def __init__(self):
+        self.calls = []
+
+    def call_tool(self, tool_name, arguments=None):
+        self.calls.append((tool_name, arguments))
+        return json.dumps({"tool": tool_name})
+
+    def call_tools_batch(self, calls):
+        return [self.call_tool(*call) for call in calls]
+
+
+def _tool_call(name: str, arguments: str) -> dict:
+    return {"id": f"call_{name}", "function": {"name": name, "arguments": arguments}}
+
+
+def test_arguments_are_normalized():
+    validator = ToolValidator()
+    assert validator.validate("get_product", {"sku": " mon-54 "}) == {"sku": "MON-0054"}
+    assert validator.validate("list_orders", {"customer_id": CUSTOMER_ID.upper(), "status": "Approved", "limit": "20"}) == {
+        "customer_id": CUSTOMER_ID, "status": "approved", "limit": 20
+    }
+    assert validator.validate("create_order", {
+        "customer_id": CUSTOMER_ID,
+        "items": {"sku": "pri0101", "quantity": 2.0, "unit_price": 149.5, "currency": "usd"},
+    })["items"] == [{"sku": "PRI-0101", "quantity": 2, "unit_price": "149.50", "currency": "USD"}]
+    assert validator.validate("verify_customer_pin", {"email": "a@example.com", "pin": 1234})["pin"] == "1234"
+    assert validator.stats == {"checked": 4, "normalized": 4, "rejected": 0}
+
+
+@pytest.mark.parametrize("tool_name, arguments, message", [
+    ("get_customer", {}, "missing required argument"),
+    ("get_order", {"order_id": "12345"}, "order_id must be a UUID"),
+    ("get_product", {"sku": "monitor"}, "sku must be a SKU"),
+    ("list_orders", {"status": "shipped"}, "status must be one of"),
+    ("create_order", {"customer_id": CUSTOMER_ID, "items": [{"sku": "MON-0001", "quantity": 0}]}, "quantity must be at least 1"),
+    ("create_order", {"customer_id": CUSTOMER_ID, "items": [{"sku": "MON-0001", "quantity": 1.5}]}, "whole number"),
+    ("search_products", {"query": " "}, "must not be empty"),
+    ("get_product", None, "JSON object"),
+])
+def test_impossible_calls_are_rejected(tool_name, arguments, message):
+    validator = ToolValidator()
+    with pytest.raises(ToolArgumentError, match=message):
+        validator.validate(tool_name, arguments)
+    assert validator.round_trips_saved == 1
+
+
+def test_engine_answers_invalid_calls_without_the_server():
+    mcp_client = FakeMCPClient()
+    engine = ChatEngine(mcp_client=mcp_client, llm_client=None, validator=ToolValidator())
+    results = engine.execute_tool_calls([
+        _tool_call("get_product", '{"sku": "mon-0054"}'),
+        _tool_call("get_order", '{"order_id": "not-an-id"}'),
+        _tool_call("get_customer", '{"customer_id": '),
+    ])
+
+    assert mcp_client.calls == [("get_product", {"sku": "MON-0054"})]
+    assert results[1].startswith("Error: invalid arguments for get_order: order_id must be a UUID")
+    assert results[2].startswith("Error: invalid arguments for get_customer")
+    assert engine.validator.round_trips_saved == 2
+
+
+def _schema_keywords(schema, keyword: str) -> list:
+    if isinstance(schema, list):
+        return [found for item in schema for found in _schema_keywords(item, keyword)]
+    if not isinstance(schema, dict):
+        return []
+    found = [schema[keyword]] if keyword in schema else []
+    return found + [value for item in schema.values() for value in _schema_keywords(item, keyword)]
+
+
+def test_llm_schemas_carry_no_validator_only_hints():
+    # The validator still sees them...
+    assert "sku" in _schema_keywords(TOOL_DEFINITIONS, "format")
+    # ...the LLM only gets formats every provider accepts, and no patterns
+    for tools in (OPENAI_TOOLS, MCP_OPENAI_TOOLS):
+        assert all(fmt in LLM_STRING_FORMATS for fmt in _schema_keywords(tools, "format"))
+        assert _schema_keywords(tools, "pattern") == []
+    get_product = next(tool for tool in OPENAI_TOOLS if tool["function"]["name"] == "get_product")
+    assert get_product["function"]["parameters"]["properties"]["sku"]["type"] == "string"